@@ -0,0 +1,86 @@
+"""
+BinaryGcode - compact records for hosts that stream a lot of G-code.
+
+A record takes the place of a line and needs no text parsing:
+
+    magic     1 byte   0xA5, which never starts a line of G-code
+    letter    1 byte   G, M or T
+    number    uint16   so G1 is letter "G" and number 1
+    mask      uint16   bit i set if LETTERS[i] has a value
+    line      uint32   line number, 0 for none
+    values    float32  one per bit set in mask, in the order of LETTERS
+    crc       uint32   CRC32 of all of the above
+
+All little endian. Records and ASCII lines can be mixed on a channel
+that takes them, see [System] binary_gcode.
+
+License: GNU GPL v3: http://www.gnu.org/copyleft/gpl.html
+
+ Redeem is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ Redeem is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with Redeem.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import struct
+import zlib
+from Gcode import Gcode
+
+MAGIC = "\xa5"
+LETTERS = "XYZEHABCFQSP"
+HEADER = struct.Struct("<ccHHI")
+CRC = struct.Struct("<I")
+MAX_RECORD_SIZE = HEADER.size + 4 * len(LETTERS) + CRC.size
+
+_values = [struct.Struct("<" + "f" * n) for n in range(len(LETTERS) + 1)]
+_letters = {}  # mask -> the letters it has values for
+
+
+def letters_of(mask):
+    letters = _letters.get(mask)
+    if letters is None:
+        letters = "".join(l for i, l in enumerate(LETTERS) if mask >> i & 1)
+        _letters[mask] = letters
+    return letters
+
+
+def record_size(data, pos=0):
+    """ The size of the record at pos in data, None if its header isn't all there """
+    if len(data) - pos < HEADER.size:
+        return None
+    mask = struct.unpack_from("<H", data, pos + 4)[0]
+    return HEADER.size + 4 * len(letters_of(mask & (1 << len(LETTERS)) - 1)) + CRC.size
+
+
+def encode(code, values, line_number=0):
+    """ The record for code, like "G1", with values, a dict like {"X": 10.0} """
+    letters = "".join(l for l in LETTERS if l in values)
+    if len(letters) != len(values):
+        raise ValueError("No binary form for " + ", ".join(sorted(set(values) - set(letters))))
+    mask = sum(1 << LETTERS.index(l) for l in letters)
+    record = HEADER.pack(MAGIC, code[0], int(code[1:]), mask, line_number) + \
+        _values[len(letters)].pack(*[values[l] for l in letters])
+    return record + CRC.pack(zlib.crc32(record) & 0xffffffff)
+
+
+def decode(record, prot):
+    """ The Gcode for record, as record_size() long """
+    _, letter, number, mask, line_number = HEADER.unpack_from(record)
+    body = len(record) - CRC.size
+    if CRC.unpack_from(record, body)[0] != zlib.crc32(record[:body]) & 0xffffffff:
+        return Gcode({"message": "", "prot": prot, "line_number": line_number,
+                      "checksum_failed": True})
+    letters = letters_of(mask)
+    values = _values[len(letters)].unpack_from(record, HEADER.size)
+    tokens = [l + "{:.7g}".format(v) for l, v in zip(letters, values)]
+    code = letter + str(number)
+    return Gcode({"message": " ".join([code] + tokens), "prot": prot,
+                  "code": code, "tokens": tokens, "line_number": line_number})
@@ -32,7 +32,6 @@ import copy
 import logging
 
 import numpy as np
-from scipy.optimize import leastsq as least_squares
 
 def calculate_probe_points(max_radius, radius_steps=2, angle_steps=6):
     """
@@ -371,6 +370,8 @@ def _calibrate_delta_parameters(pts, num_factors, delta_params):
 
     raw_params = delta_params.to_raw_params(num_factors)
 
+    # scipy is slow to import, so only when calibrating
+    from scipy.optimize import leastsq as least_squares
     new_raw_params = least_squares(_expected_residuals, raw_params, args=(pts, delta_params, probe_motor_positions))[0]
 
     return AutoCalibrationDeltaParameters.from_base_and_raw_params(delta_params, new_raw_params)
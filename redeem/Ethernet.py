@@ -21,89 +21,118 @@ License: GNU GPL v3: http://www.gnu.org/copyleft/gpl.html
  along with Redeem.  If not, see <http://www.gnu.org/licenses/>.
 """
 
-from threading import Thread
 import socket
 import logging
-from Gcode import Gcode
+from Reactor import Channel, READ_SIZE, WOULD_BLOCK
 
-size = 1024 
+
+class EthernetClient(Channel):
+    """ A host connected over TCP. Its lines are queued with a prot of its
+    own, so the replies go back to it and not to the other clients. """
+    uploads = True
+
+    def __init__(self, server, connection, address, prot):
+        self.server = server
+        self.connection = connection
+        self.address = address
+        Channel.__init__(self, server.printer, connection.fileno(), prot)
+        self.binary = server.printer.binary_gcode
+
+    def read(self):
+        try:
+            data = self.connection.recv(READ_SIZE)
+        except socket.error as e:
+            if e.errno in WOULD_BLOCK:
+                return ""
+            logging.error("Ethernet " + str(e))
+            return None
+        return data or None
+
+    def write(self, data):
+        try:
+            return self.connection.send(data)
+        except socket.error as e:
+            if e.errno in WOULD_BLOCK:
+                return 0
+            raise
+
+    def on_hangup(self):
+        self.server.disconnect(self)
+
+    def close(self):
+        if self.upload is not None:
+            self.upload.abort()
+            self.upload = None
+        if self.reactor:
+            self.reactor.remove(self)
+        try:
+            self.connection.shutdown(socket.SHUT_RDWR)
+        except socket.error:
+            pass  # already disconnected
+        self.connection.close()
+        self.fd = None
 
 
 class Ethernet:
-    def __init__(self, printer):
+    lines = ()  # the listening socket only has connections to accept
+
+    def __init__(self, printer, host='', port=50000):
         self.printer = printer
         self.s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        host = ''
-        port = 50000
-        backlog = 5       
+        self.s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        backlog = 5
         for i in range(10):
-            try: 
+            try:
                 self.s.bind((host, port))
                 break
             except socket.error:
-                port += 1    
+                port += 1
+        self.port = self.s.getsockname()[1]
 
-        logging.info("Ethernet bound to port " + str(port))
+        logging.info("Ethernet bound to " + (host or "*") + ":" + str(self.port))
         self.s.listen(backlog)
-        self.client = None
-        self.running = True
-        self.t = Thread(target=self.get_message, name="Ethernet")
-        self.t.start()
-
-    def get_message(self):
-        """Loop that gets messages and pushes them on the queue"""
-        while self.running:
-            #logging.info("Ethernet listening")
-            self.s.settimeout(1.0)
-            try:
-                self.client, self.address = self.s.accept()
-            except IOError as e:
-                continue
-            logging.info("Ethernet connection accepted")
-            self.s.settimeout(1.0)
-            while self.running:
-                line = self.read_line()
-                if line is None:
-                    break
-                message = line.strip("\n")
-                if len(message) > 0:
-                    g = Gcode({"message": message, "prot": "Eth"})
-                    self.printer.processor.enqueue(g)
+        self.s.setblocking(0)
+        self.clients = {}   # prot -> EthernetClient
+        self.connections = 0
+        printer.reactor.add(self)
 
-    def send_message(self, message):
-        """Send a message"""
-        #logging.debug("Eth: "+str(message))
-        if message[-1] != "\n":
-            message += "\n"
+    def fileno(self):
+        return self.s.fileno()
+
+    def is_held(self):
+        return False
+
+    def has_output(self):
+        return False
+
+    def on_readable(self):
         try:
-            if self.client:
-                self.client.send(message)
-        except socket.error as (value, message):
-            logging.error("Ethernet " + message)
-
-    def read_line(self):
-        """read a line from a socket"""
-        chars = []
-        while self.running:
-            try:
-                char = self.client.recv(1)
-            except socket.error as (value, message):
-                logging.error("Ethernet " + message)
-                char = ""
-            if char == "":
-                logging.warning("Ethernet: Connection reset by peer.")
-                self.client.close()
-                break
-            chars.append(char)
-            if char == "\n":
-                return "".join(chars)
+            connection, address = self.s.accept()
+        except socket.error:
+            return
+        connection.setblocking(0)
+        connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.connections += 1
+        client = EthernetClient(self, connection, address, "Eth" + str(self.connections))
+        self.clients[client.prot] = client
+        self.printer.comms[client.prot] = client
+        self.printer.reactor.add(client)
+        logging.info("Ethernet connection accepted from " + str(address[0]) + " as " + client.prot)
+
+    def disconnect(self, client):
+        logging.info("Ethernet: " + client.prot + " disconnected")
+        self.clients.pop(client.prot, None)
+        self.printer.comms.pop(client.prot, None)
+        client.close()
+
+    def send_message(self, message):
+        """Send a message to every client"""
+        for client in self.clients.values():
+            client.send_message(message)
 
     def close(self):
         """Stop receiving messages"""
-        self.running = False
-        if self.client is not None:
-            self.client.shutdown(socket.SHUT_RDWR)
-            self.client.close()
-        self.s.shutdown(socket.SHUT_RDWR)
+        self.printer.reactor.remove(self)
+        for client in self.clients.values():
+            self.disconnect(client)
         self.s.close()
-        self.t.join()
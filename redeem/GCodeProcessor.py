@@ -21,34 +21,140 @@ License: GNU GPL v3: http://www.gnu.org/copyleft/gpl.html
  along with Redeem.  If not, see <http://www.gnu.org/licenses/>.
 """
 
+import os
 import sys
+import glob
+import json
 import traceback
 import inspect
 import logging
 import re
 import importlib
-from threading import Event
+import time
+from threading import Event, RLock
 from six import iteritems
 from gcodes import GCodeCommand
 import Sync
+from Scheduler import MOTION, BUFFERED, UNBUFFERED
 try:
     from Gcode import Gcode
 except ImportError:
     from redeem.Gcode import Gcode
 
 
+# Cache of which class handles each G-code, kept next to the handlers
+REGISTRY_FILE = "registry.json"
+
+
+class GCodeRegistry(dict):
+    """
+    Maps each G-code to its handler. A handler is kept as the names of its
+    module and class until it is first looked up, then imported from the
+    gcodes package and instantiated, so only the commands in use are loaded.
+    """
+
+    def __init__(self, printer, package):
+        dict.__init__(self)
+        self.printer = printer
+        self.package = package
+        self.lock = RLock()
+
+    def register(self, code, module_name, class_name):
+        dict.__setitem__(self, code, (module_name, class_name))
+
+    def is_loaded(self, code):
+        return not isinstance(dict.__getitem__(self, code), tuple)
+
+    def __getitem__(self, code):
+        handler = dict.__getitem__(self, code)
+        if isinstance(handler, tuple):
+            handler = self._load(code)
+        return handler
+
+    def _load(self, code):
+        with self.lock:
+            handler = dict.__getitem__(self, code)
+            if isinstance(handler, tuple):  # not loaded by another thread meanwhile
+                module_name, class_name = handler
+                logging.debug("Loading GCode handler " + code + "...")
+                module = importlib.import_module(self.package + "." + module_name)
+                handler = getattr(module, class_name)(self.printer)
+                dict.__setitem__(self, code, handler)
+        return handler
+
+    def get(self, code, default=None):
+        return self[code] if code in self else default
+
+    def iteritems(self):
+        for code in self.keys():
+            yield code, self[code]
+
+    def itervalues(self):
+        for code in self.keys():
+            yield self[code]
+
+    def items(self):
+        return list(self.iteritems())
+
+    def values(self):
+        return list(self.itervalues())
+
+
 class GCodeProcessor:
     def __init__(self, printer):
         self.printer = printer
 
         self.sync_event_needed = False
+        # The task the next move has to wait for, if any
+        self.motion_after = None
+
+        # prot -> number of the last line queued, to spot missing lines with early_ok
+        self.last_line = {}
+
+        # code -> (count, max latency, last latency) for commands taking the real-time lane
+        self.realtime_latency = {}
 
-        self.gcodes = {}
         try:
             module = __import__("gcodes", locals(), globals())
         except ImportError:
             module = importlib.import_module("redeem.gcodes")
-        self.load_classes_in_module(module)
+        self.gcodes = GCodeRegistry(printer, module.__name__)
+        self.load_registry(module)
+
+    def load_registry(self, package):
+        """
+        Fill in which class handles each G-code from the cache, or, if a
+        handler file changed since it was written, by importing every handler
+        module once and caching what they define.
+        """
+        directory = os.path.dirname(package.__file__)
+        path = os.path.join(directory, REGISTRY_FILE)
+        files = sorted(glob.glob(os.path.join(directory, "*.py")))
+        signature = [[os.path.basename(f), os.path.getmtime(f), os.path.getsize(f)] for f in files]
+
+        try:
+            with open(path) as cache:
+                cached = json.load(cache)
+            if cached["signature"] == signature:
+                for code, (module_name, class_name) in iteritems(cached["handlers"]):
+                    self.gcodes.register(str(code), str(module_name), str(class_name))
+                return
+        except (IOError, ValueError, KeyError, TypeError):
+            pass
+
+        for f in files:
+            module_name = os.path.splitext(os.path.basename(f))[0]
+            if module_name not in ("__init__", "GCodeCommand"):
+                self.load_classes_in_module(
+                    importlib.import_module(package.__name__ + "." + module_name))
+
+        handlers = dict((code, dict.__getitem__(self.gcodes, code)) for code in self.gcodes)
+        try:
+            with open(path + ".tmp", "w") as cache:
+                json.dump({"signature": signature, "handlers": handlers}, cache)
+            os.rename(path + ".tmp", path)
+        except (IOError, OSError) as e:
+            logging.debug("Could not cache the G-code registry: " + str(e))
 
     def load_classes_in_module(self, module):
         for module_name, obj in inspect.getmembers(module):
@@ -61,8 +167,7 @@ class GCodeProcessor:
                     issubclass(obj, GCodeCommand.GCodeCommand) and \
                     module_name != 'GCodeCommand' and \
                     module_name != 'ToolChange':
-                logging.debug("Loading GCode handler " + module_name + "...")
-                self.gcodes[module_name] = obj(self.printer)
+                self.gcodes.register(module_name, obj.__module__.split(".")[-1], obj.__name__)
 
     def override_command(self, gcode, gcodeClassInstance):
         """
@@ -102,6 +207,12 @@ class GCodeProcessor:
     def is_async(self, gcode):
         return gcode.command.is_async()
 
+    def is_timed(self, gcode):
+        return gcode.command.is_timed()
+
+    def is_realtime(self, gcode):
+        return gcode.command.is_realtime() and not gcode.is_info_command()
+
     def synchronize(self, gcode):
         try:
             gcode.command.on_sync(gcode)
@@ -126,39 +237,110 @@ class GCodeProcessor:
         return gcode
 
     def enqueue(self, gcode):
+        if self.printer.early_ok and not self._check_line(gcode):
+            return
+
         self.resolve(gcode)
 
-        # If an M116 is running, peek at the incoming Gcode
-        if self.peek(gcode):
+        # Real-time commands skip the queues and run on the receiving thread
+        if self.is_realtime(gcode):
+            self.execute(gcode)
+            self.printer.reply(gcode)
+            self._record_realtime_latency(gcode)
             return
 
-        if self.is_async(gcode):
+        scheduler = self.printer.scheduler
+        # Set before it is queued, so its own reply leaves the ok out
+        gcode.acknowledged = self.printer.early_ok
+
+        if self.is_timed(gcode) and self.sync_event_needed:
+            # Keep it in line with the moves rather than syncing the queues
+            gcode.command = Sync.TimedEvent(self.printer, gcode.command)
+            self._submit_motion(gcode)
+
+        elif self.is_async(gcode):
             self.sync_event_needed = True
-            self.printer.async_commands.put(gcode)
+            self._submit_motion(gcode)
 
         elif self.is_buffered(gcode):
-            # if we previously queued an async code, we need to queue an event to get back into sync
+            # if we previously queued an async code, it has to wait for the moves before it
+            moves_done = None
             if self.sync_event_needed:
                 logging.info("adding sync before " + gcode.message)
-                self._make_buffered_queue_wait_for_async_queue()
+                sync_point = Gcode({"message": "SyncPoint", "prot": "internal"})
+                sync_point.command = Sync.SyncPoint(self.printer)
+                moves_done = self._submit_motion(sync_point)
                 self.sync_event_needed = False
 
-            self.printer.commands.put(gcode)
-
-            if self.is_sync(gcode):
-                # Yes, it goes into both queues!
-                self.printer.sync_commands.put(gcode)
+            scheduler.submit(gcode, BUFFERED, after=[moves_done])
         else:
-            self.printer.unbuffered_commands.put(gcode)
+            scheduler.submit(gcode, UNBUFFERED)
+
+        # Waits and planner reconfiguration have to finish before more moves are queued
+        if gcode.code() in ["M109", "M190", "M92", "M201", "M665", "M909"]:
+            self.motion_after = gcode.task
+
+        if gcode.acknowledged:
+            self._acknowledge(gcode)
+
+    def _check_line(self, gcode):
+        """ Numbered lines have to follow each other. One that skips a number or
+        failed its checksum is dropped and asked for again. True if it can be queued. """
+        last = self.last_line.get(gcode.prot, 0)
+        if gcode.checksum_failed:
+            error = "checksum mismatch"
+        elif gcode.code() == "M110":
+            self.last_line[gcode.prot] = gcode.get_int_by_letter(
+                "N", gcode.line_number if gcode.is_crc() else 0)
+            return True
+        elif not gcode.is_crc():
+            return True
+        elif gcode.line_number != last + 1:
+            error = "Line Number is not Last Line Number+1"
+        else:
+            self.last_line[gcode.prot] = gcode.line_number
+            return True
 
-        if gcode.code() in ["M109", "M190"]:
-            self._make_async_queue_wait_for_buffered_queue()
+        logging.warning("Asking for line " + str(last + 1) + " again: " + error)
+        self.printer.send_message(gcode.prot, "Error:{}, Last Line: {}".format(error, last))
+        self.printer.send_message(gcode.prot, "Resend: {}".format(last + 1))
+        self.printer.send_message(gcode.prot, "ok")
+        return False
 
-    def peek(self, gcode):
-        if self.printer.running_M116 and gcode.code() == "M108":
-            self.execute(gcode)
+    def _acknowledge(self, gcode):
+        """ Send the ok for a queued line, with the moves and commands that still fit """
+        answer = "ok"
+        if gcode.is_crc():
+            answer += " N{}".format(gcode.line_number)
+        answer += " P{} B{}".format(self.printer.path_planner.get_free_move_slots(),
+                                     self.printer.scheduler.get_free_slots())
+        self.printer.send_message(gcode.prot, answer)
+
+    def has_room_for(self, gcode):
+        """ True if enqueue can take gcode without waiting for room in a lane """
+        command = self.gcodes.get(gcode.code())
+        if command is None or command.is_realtime() and not gcode.is_info_command():
             return True
-        return False
+        if command.is_timed() and self.sync_event_needed or command.is_async():
+            lanes = (MOTION, )
+        elif command.is_buffered():
+            lanes = (MOTION, BUFFERED) if self.sync_event_needed else (BUFFERED, )
+        else:
+            lanes = (UNBUFFERED, )
+        return self.printer.scheduler.get_free_slots(lanes) > 0
+
+    def _submit_motion(self, gcode):
+        task = self.printer.scheduler.submit(gcode, MOTION, after=[self.motion_after])
+        self.motion_after = None
+        return task
+
+    def _record_realtime_latency(self, gcode):
+        latency = time.time() - gcode.received
+        code = gcode.code()
+        count, worst, _ = self.realtime_latency.get(code, (0, 0.0, 0.0))
+        self.realtime_latency[code] = (count + 1, max(worst, latency), latency)
+        logging.debug("Real-time " + code + " took effect after " +
+                      "{:.3f}".format(latency * 1000.0) + " ms")
 
     def get_long_description(self, gcode):
         val = gcode.code()[:-1]
@@ -181,43 +363,6 @@ class GCodeProcessor:
                 gcodes.append(Gcode({"message": str, "prot": "Test"}))
         return gcodes
 
-    def _make_buffered_queue_wait_for_async_queue(self):
-        logging.info("queueing buffered-to-async sync event")
-        state = Sync.SyncState()
-        buffered = Sync.SyncBufferedToAsync_Buffered(self.printer, state)
-        async = Sync.SyncBufferedToAsync_Async(self.printer, state)
-
-        buffered_gcode = Gcode(
-            {"message": "SyncBufferedToAsync_Buffered", "prot": "internal"})
-        buffered_gcode.command = buffered
-
-        async_gcode = Gcode(
-            {"message": "SyncBufferedToAsync_Async", "prot": "internal"})
-        async_gcode.command = async
-
-        self.printer.commands.put(buffered_gcode)
-        self.printer.sync_commands.put(async_gcode)
-        self.printer.async_commands.put(async_gcode)
-        logging.info("done queueing buffered-to-async sync event")
-
-    def _make_async_queue_wait_for_buffered_queue(self):
-        logging.info("queueing async-to-buffered sync event")
-        state = Sync.SyncState()
-        buffered = Sync.SyncAsyncToBuffered_Buffered(self.printer, state)
-        async = Sync.SyncAsyncToBuffered_Async(self.printer, state)
-
-        buffered_gcode = Gcode(
-            {"message": "SyncAsyncToBuffered_Buffered", "prot": "internal"})
-        buffered_gcode.command = buffered
-
-        async_gcode = Gcode(
-            {"message": "SyncAsyncToBuffered_Async", "prot": "internal"})
-        async_gcode.command = async
-
-        self.printer.async_commands.put(async_gcode)
-        self.printer.commands.put(buffered_gcode)
-        logging.info("done queueing async-to-buffered sync event")
-
 
 if __name__ == '__main__':
     logging.basicConfig(level=logging.DEBUG,
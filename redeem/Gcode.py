@@ -24,6 +24,7 @@ License: GNU GPL v3: http://www.gnu.org/copyleft/gpl.html
 
 import logging
 import re
+import time
 
 
 class Gcode:
@@ -32,6 +33,7 @@ class Gcode:
 
     def __init__(self, packet):
         """ Init; parse the token """
+        self.received = time.time()
         try:
             self.message = packet["message"].strip().split(";")[0]
             self.message = self.message.strip(' \t\n\r')
@@ -40,7 +42,19 @@ class Gcode:
             if self.prot is None:
                 self.prot = self.parent.prot if self.parent else "None"
             self.has_crc = False
+            self.checksum_failed = False
+            self.acknowledged = False  # the ok was sent when it was queued
             self.answer = "ok"
+            if "line_number" in packet:
+                # Already split, as decoded from a binary record
+                self.line_number = packet["line_number"]
+                self.checksum_failed = packet.get("checksum_failed", False)
+                self.has_crc = self.line_number > 0
+                self.gcode = packet.get("code", "No-Gcode")
+                self.tokens = packet.get("tokens", [])
+                if self.has_crc and not self.checksum_failed:
+                    Gcode.line_number += 1
+                return
             if len(self.message) == 0:
                 #logging.debug("Empty message")
                 self.gcode = "No-Gcode"
@@ -71,9 +85,10 @@ class Gcode:
                 line_num = re.findall(r"\d+", self.tokens[0])[0]
                 cmd = packet["message"].split("*")[0]       # message
                 csc = int(packet["message"].split("*")[1].split(";")[0])  # checksum to compare with
+                self.line_number = int(line_num)  # Set the line number
                 if int(csc) != self._getCS(cmd):
+                    self.checksum_failed = True
                     raise ValueError('GCODE message failed CRC check')
-                self.line_number = int(line_num)  # Set the line number
                 Gcode.line_number += 1  # Increase the global counter
                 self.has_crc = True
                 self.tokens.pop(0) # remove the line number token
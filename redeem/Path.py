@@ -22,7 +22,6 @@ License: GNU GPL v3: http://www.gnu.org/copyleft/gpl.html
 """
 
 import numpy as np
-import sympy as sp
 import logging
 
 
@@ -137,6 +136,8 @@ class Path:
     def _find_circle_center(self, start0, start1, end0, end1, radius):
         """each circle defines all possible coordinates the arc center could be
         the two circles intersect at the possible centers of the arc radius"""
+        # sympy takes seconds to import and is only needed for R-form arcs
+        import sympy as sp
         c1 = sp.Circle(sp.Point(start0, start1), abs(radius))
         c2 = sp.Circle(sp.Point(end0, end1), abs(radius))
 
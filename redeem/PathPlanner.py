@@ -100,13 +100,27 @@ class PathPlanner:
             return
 
         self.native_planner.initPRU(fw0, fw1)
+        self._configure_native_planner()
+        self.native_planner.setState(self.prev.end_pos)
+        self.printer.plugins.path_planner_initialized(self)
+        self.native_planner.runThread()
         
+        logging.info("PathPlanner initialized")
+
+    def _configure_native_planner(self):
         self.native_planner.setAxisStepsPerMeter(tuple(self.printer.steps_pr_meter))
         self.native_planner.setMaxSpeeds(tuple(self.printer.max_speeds))	
         self.native_planner.setAcceleration(tuple(self.printer.acceleration))
         self.native_planner.setMaxSpeedJumps(tuple(self.printer.max_speed_jumps))
         self.native_planner.setPrintMoveBufferWait(int(self.printer.print_move_buffer_wait))
         self.native_planner.setMaxBufferedMoveTime(int(self.printer.max_buffered_move_time))
+        self.native_planner.setStepWorkers(int(self.printer.step_workers))
+        if self.printer.realtime:
+            self.native_planner.setRealTime(int(self.printer.realtime_planner_priority),
+                                            int(self.printer.realtime_pru_priority),
+                                            int(self.printer.realtime_cpu),
+                                            bool(self.printer.realtime_lock_memory))
+        self.native_planner.setSpeedFactor(self.printer.speed_factor)
         self.native_planner.setSoftEndstopsMin(tuple(self.printer.soft_min))
         self.native_planner.setSoftEndstopsMax(tuple(self.printer.soft_max))
         self.native_planner.setSoftEndstopsMax(tuple(self.printer.soft_max))
@@ -117,13 +131,9 @@ class PathPlanner:
         self.native_planner.delta_bot.setAngularError(Delta.A_angular, Delta.B_angular, Delta.C_angular)
         self.configure_slaves()
         self.native_planner.setBacklashCompensation(tuple(self.printer.backlash_compensation));
-        self.native_planner.setState(self.prev.end_pos)
-        self.printer.plugins.path_planner_initialized(self)
-        self.native_planner.runThread()
-        
-        logging.info("PathPlanner initialized")
 
     def configure_slaves(self):
+        self.native_planner.clearSlaves()
         self.native_planner.enableSlaves(self.printer.has_slaves)
         if self.printer.has_slaves:
             for master in Printer.AXES:
@@ -138,6 +148,17 @@ class PathPlanner:
         self.native_planner.stopThread(True)        
         self._init_path_planner()
 
+    def reconfigure(self):
+        """ Apply changed steps/m, speeds, accelerations, delta geometry, slaves or 
+        backlash to the running planner. Unlike restart, the PRU keeps running """
+        self.wait_until_done()
+        pos = self.native_planner.getState()
+        self._configure_native_planner()
+        # The position in steps depends on the new settings. getState has bed
+        # compensation and babysteps in it already, so they aren't added again.
+        self.native_planner.setCompensatedState(pos)
+        logging.debug("PathPlanner reconfigured")
+
     def update_steps_pr_meter(self):
         """ Update steps pr meter from the path """
         self.native_planner.setAxisStepsPerMeter(tuple(self.printer.steps_pr_meter))
@@ -181,6 +202,39 @@ class PathPlanner:
        """ Returns True if a sync event has been queued. False on failure.(use wait_until_done() instead) """
        return self.native_planner.queueSyncEvent(isBlocking)
 
+    def get_speed_ratio(self):
+        """ Planned speed of the running move over its commanded speed, 0 when idle """
+        return self.native_planner.getSpeedRatio()
+
+    def get_stats(self):
+        """ Allocation counters of the native planner's step buffer pool and
+        how quickly its run thread reacts to new moves """
+        reused, missed, retained, dropped, pooled = self.native_planner.getStepBufferStats()
+        wakeups, mean, worst, jitter = self.native_planner.getReactionStats()
+        return {
+            "step_buffers_reused": reused,
+            "step_buffers_missed": missed,
+            "step_buffers_retained": retained,
+            "step_buffers_dropped": dropped,
+            "step_buffers_pooled": pooled,
+            "reaction_count": int(wakeups),
+            "reaction_mean_us": mean,
+            "reaction_max_us": worst,
+            "reaction_jitter_us": jitter
+        }
+
+    def get_free_move_slots(self):
+        """ Moves that can be queued before queueing one blocks """
+        return self.native_planner.getFreeMoveSlots()
+
+    def queue_timed_event(self):
+        """ Returns a ticket for the point in the stream after the moves queued so far """
+        return self.native_planner.queueTimedEvent()
+
+    def wait_until_timed_event(self, ticket):
+        """ Blocks until the moves before the ticket are stepped out. False on timeout """
+        return self.native_planner.waitUntilTimedEvent(ticket, 1000)
+
     def force_exit(self):
         self.native_planner.stopThread(True)
 
@@ -205,6 +259,16 @@ class PathPlanner:
         self.native_planner.resume()
         logging.info("PathPlanner: resume")
 
+    def _homing_speed(self, path, speeds):
+        """ Speed and acceleration for a homing move where no axis goes
+        faster than its own speed, so the move takes as long as the
+        slowest axis needs. The native planner limits the acceleration
+        of each axis to its own, so the highest one is requested. """
+        length = np.linalg.norm([path[a] for a in path])
+        time = max(abs(path[a])/speeds[a] for a in path)
+        accel = max(self.printer.acceleration[Printer.axis_to_index(a)] for a in path)
+        return length/time, accel
+
     def _home_internal(self, axis):
         """ Private method for homing a set or a single axis """
         logging.debug("homing internal " + str(axis))
@@ -216,13 +280,18 @@ class PathPlanner:
         path_center = {}
         path_zero = {}
 
-        speed = self.printer.home_speed[0] # TODO: speed for each axis
-        accel = self.printer.acceleration[0] # TODO: accel for each axis
+        search_speeds = {}
+        fine_search_speeds = {}
 
         for a in axis:
             if not self.printer.steppers[a].has_endstop:
                 logging.debug("Skipping homing for " + str(a))
                 continue
+            if self.printer.home_speed[Printer.axis_to_index(a)] == 0 or \
+                    self.printer.home_backoff_speed[Printer.axis_to_index(a)] == 0:
+                logging.warning("Skipping homing for " + str(a) + ", its home_speed or "
+                                "home_backoff_speed is 0")
+                continue
             logging.debug("Doing homing for " + str(a))
             if self.printer.home_speed[Printer.axis_to_index(a)] < 0:
                 # Search to positive ends
@@ -237,40 +306,50 @@ class PathPlanner:
             path_backoff[a] = backoff_length;
             path_fine_search[a] = -backoff_length * 1.2;
             
-            speed = min(abs(speed), abs(self.printer.home_speed[Printer.axis_to_index(a)]))
-            accel = min(accel, self.printer.acceleration[Printer.axis_to_index(a)])
-            fine_search_speed =  min(abs(speed), abs(self.printer.home_backoff_speed[Printer.axis_to_index(a)]))
+            search_speeds[a] = abs(self.printer.home_speed[Printer.axis_to_index(a)])
+            fine_search_speeds[a] = min(search_speeds[a], abs(self.printer.home_backoff_speed[Printer.axis_to_index(a)]))
             path_zero[a] = 0
-                    
+
+        if not path_search:
+            return path_center, 0
+
+        speed, accel = self._homing_speed(path_search, search_speeds)
+        backoff_speed, _ = self._homing_speed(path_backoff, search_speeds)
+        fine_search_speed, _ = self._homing_speed(path_fine_search, fine_search_speeds)
+
         logging.debug("Search: %s at %s m/s, %s m/s^2" % (path_search, speed, accel))
         logging.debug("Backoff to: %s" % path_backoff)
         logging.debug("Fine search: %s" % path_fine_search)
         logging.debug("Center: %s" % path_center)
 
+        # The search moves are cancelable, the PRU stops each axis on its own
+        # endstop and skips the rest of the move once all of them are hit.
+        # G92 only resets the planner state, so nothing here has to wait
+        # for the PRU until the fine search is done.
+
         # Set position to zero
         p = G92Path(path_zero)
         self.add_path(p)
-        self.wait_until_done()
         
         # Move until endstop is hit
         p = RelativePath(path_search, speed, accel, True, False, True, False)
         self.add_path(p)
-        self.wait_until_done()
-        logging.debug("Coarse search done!")
 
         # Reset position to offset
         p = G92Path(path_center)
         self.add_path(p)
-        self.wait_until_done()
 
         # Back off a bit
-        p = RelativePath(path_backoff, speed, accel, True, False, True, False)
+        p = RelativePath(path_backoff, backoff_speed, accel, True, False, True, False)
         self.add_path(p)
 
         # Hit the endstop slowly
         p = RelativePath(path_fine_search, fine_search_speed, accel, True, False, True, False)
         self.add_path(p)
+
+        # Drain before any homing-only endstops are disarmed
         self.wait_until_done()
+        logging.debug("Search done!")
 
         # Reset (final) position to offset
         p = G92Path(path_center)
@@ -321,11 +400,16 @@ class PathPlanner:
         self.printer.homing(True)
 
         # Home axis for core X,Y and H-Belt independently to avoid hardware
-        # damages.
+        # damages. The other axes are not coupled, so they can go along
+        # with the first one.
         if self.printer.axis_config == Printer.AXIS_CONFIG_CORE_XY or \
                         self.printer.axis_config == Printer.AXIS_CONFIG_H_BELT:
-            for a in axis:
-                self._home_internal(a)
+            coupled = [a for a in axis if a in ("X", "Y")]
+            others = [a for a in axis if a not in ("X", "Y")]
+            groups = [[a] for a in coupled] or [[]]
+            groups[0] += others
+            for group in groups:
+                self._home_internal(group)
         # For delta, switch to cartesian when homing
         elif self.printer.axis_config == Printer.AXIS_CONFIG_DELTA:
             if 0 < len({"X", "Y", "Z"}.intersection(set(axis))) < 3:
@@ -369,7 +453,34 @@ class PathPlanner:
             
         return
 
-    def probe(self, z, speed, accel):
+    def _probe_move(self, z_dist, speed, accel):
+        """ Move down at most z_dist until the probe triggers,
+        return how far the head actually moved """
+        # add a relative move to the path planner
+        # this tells the head to move down a set distance
+        # the probe end-stop should be triggered during this move
+        path = RelativePath({"Z": -z_dist}, speed, accel,
+                            cancelable=True, 
+                            use_bed_matrix=True, 
+                            use_backlash_compensation=True, 
+                            enable_soft_endstops=False,
+                            is_probe=True)
+        self.add_path(path)
+        # The distance is only known once the PRU has run the move. queueMove
+        # happens to wait for that today, but don't depend on it.
+        self.wait_until_done()
+
+        dist = self.native_planner.getLastProbeDistance()
+        logging.debug("Probe distance : "+str(dist))
+        return dist
+
+    def probe(self, z, speed, accel, samples=1, fast_speed=0.0, retract=0.001,
+              tolerance=0.0, retries=0, method="median"):
+        """ Probe down at most z from the current position and return the
+        Z of the bed. With a fast_speed the bed is found at that speed first,
+        then 'samples' taps are made at speed with a retract in between.
+        If the taps spread more than tolerance they are done over. """
+        # Drain before arming any homing-only endstops
         self.wait_until_done()
         
         # Reset babystepping
@@ -379,36 +490,48 @@ class PathPlanner:
         
         # save the starting position
         start_pos   = self.get_current_pos(ideal=True)
-        start_state = self.native_planner.getState()
 
         # calculate how many steps the requested z movement will require
         steps = np.ceil(z*self.printer.steps_pr_meter[2])
         z_dist = steps/self.printer.steps_pr_meter[2]
         logging.debug("Steps total: "+str(steps))
-        
-        # select the relative end point
-        # this is not axis_config dependent as we are not swapping 
-        # axis_config like we do when homing
-        end   = {"Z":-z_dist}
+        retract = np.ceil(retract*self.printer.steps_pr_meter[2])/self.printer.steps_pr_meter[2]
 
         # tell the printer we are now in homing mode (updates firmware if required)        
         self.printer.homing(True)
-        
-        # add a relative move to the path planner
-        # this tells the head to move down a set distance
-        # the probe end-stop should be triggered during this move
-        path = RelativePath(end, speed, accel, 
-                            cancelable=True, 
-                            use_bed_matrix=True, 
-                            use_backlash_compensation=True, 
-                            enable_soft_endstops=False,
-                            is_probe=True)
-        self.add_path(path)
-        self.wait_until_done()
 
-        z_dist = self.native_planner.getLastProbeDistance()
-        logging.debug("Probe distance : "+str(z_dist))
-        
+        # How far below the starting position the head is.
+        # This is not axis_config dependent as we are not swapping 
+        # axis_config like we do when homing
+        depth = 0.0
+        if fast_speed:
+            depth += self._probe_move(z_dist, fast_speed, accel)
+
+        for attempt in range(retries+1):
+            taps = []
+            for tap in range(samples):
+                if depth > 0.0:
+                    lift = min(retract, depth)
+                    path = RelativePath({"Z": lift}, fast_speed or speed, accel,
+                                        cancelable=True,
+                                        use_bed_matrix=True,
+                                        use_backlash_compensation=True,
+                                        enable_soft_endstops=False)
+                    self.add_path(path)
+                    depth -= lift
+                depth += self._probe_move(z_dist-depth, speed, accel)
+                taps.append(depth)
+            spread = max(taps)-min(taps)
+            if spread <= tolerance:
+                break
+            logging.warning("Probe taps spread {} mm, {}".format(
+                spread*1000, "retrying" if attempt < retries else "using them anyway"))
+
+        if method == "mean":
+            z_dist = np.mean(taps)
+        else:
+            z_dist = np.median(taps)
+
         # the path planner has kept track of our position - ask it to move back
         path = AbsolutePath(start_pos, speed, accel, 
                             cancelable=True, 
@@ -422,7 +545,55 @@ class PathPlanner:
         self.printer.homing(False)
         
         return -z_dist+start_pos["Z"]
-        
+
+    def probe_points(self, points, z, speed, accel, travel_speed, travel_accel):
+        """ Probe a list of points ({"X", "Y", "Z"} in m, probe offset applied)
+        as one sequence. Homing mode stays on and the travel between points
+        is queued without draining, so only the probe moves themselves wait
+        for the PRU. Points are visited in nearest-neighbour order from the
+        current position, distances are returned in the order given. """
+        self.wait_until_done()
+
+        # Reset babystepping
+        self.printer.offset_z = 0.0
+
+        self.printer.ensure_steppers_enabled()
+
+        steps = np.ceil(z*self.printer.steps_pr_meter[2])
+        z_dist = steps/self.printer.steps_pr_meter[2]
+
+        # The travel moves are not cancelable, so the armed probe
+        # endstop can only ever stop the probe moves.
+        self.printer.homing(True)
+
+        pos = self.get_current_pos(ideal=True)
+        remaining = list(range(len(points)))
+        distances = [None]*len(points)
+        while remaining:
+            index = min(remaining, key=lambda i: np.hypot(
+                points[i]["X"]-pos["X"], points[i]["Y"]-pos["Y"]))
+            remaining.remove(index)
+            point = points[index]
+
+            self.add_path(AbsolutePath(
+                {"X": point["X"], "Y": point["Y"], "Z": point["Z"]},
+                travel_speed, travel_accel))
+
+            distances[index] = point["Z"]-self._probe_move(z_dist, speed, accel)
+
+            # Lift straight up before travelling on
+            self.add_path(AbsolutePath({"Z": point["Z"]}, speed, accel,
+                                       cancelable=True,
+                                       use_bed_matrix=True,
+                                       use_backlash_compensation=True,
+                                       enable_soft_endstops=False))
+            pos = point
+
+        self.wait_until_done()
+        self.printer.homing(False)
+
+        return distances
+
     def autocalibrate_delta_printer(self, num_factors,
                                     simulate_only,
                                     probe_points, print_head_zs):
@@ -76,6 +76,20 @@ class Printer:
         self.move_cache_size        = 128
         self.print_move_buffer_wait = 250
         self.max_buffered_move_time = 1000
+        self.step_workers = -1
+
+        # SCHED_FIFO priorities of the motion threads, see [System] realtime
+        self.realtime = False
+        self.realtime_planner_priority = 50
+        self.realtime_pru_priority = 60
+        self.realtime_executor_priority = 40
+        self.realtime_cpu = -1
+        self.realtime_lock_memory = True
+
+        # Acknowledge lines once queued, see [System] early_ok
+        self.early_ok = False
+        # Take binary records on USB and Ethernet, see [System] binary_gcode
+        self.binary_gcode = False
 
         self.probe_points  = []
         self.probe_heights = [0, 0, 0]
@@ -135,8 +149,12 @@ class Printer:
 
     def reply(self, gcode):
         """ Send a reply through the proper channel """
-        if gcode.get_answer() is not None:
-            self.send_message(gcode.prot, gcode.get_answer())
+        answer = gcode.get_answer()
+        if answer is not None and gcode.acknowledged and answer.startswith("ok"):
+            # The ok was sent when the line was queued, only the rest is left
+            answer = answer[2:].strip()
+        if answer:
+            self.send_message(gcode.prot, answer)
 
     def send_message(self, prot, msg):
         """ Send a message back to host """
@@ -144,11 +162,11 @@ class Printer:
             return
 
         if "\n" in msg:
-            for m in msg.split("\n"):
-                if len(m) > 0:
-                    self.comms[prot].send_message(m)
-        else:
-            self.comms[prot].send_message(msg)
+            # One message, so the lines go out in a single write
+            msg = "\n".join(m for m in msg.split("\n") if len(m) > 0)
+            if not msg:
+                return
+        self.comms[prot].send_message(msg)
 
     def homing(self, is_homing):
         """
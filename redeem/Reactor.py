@@ -0,0 +1,367 @@
+"""
+Reactor - one thread that reads the lines the hosts send over every
+channel and writes the replies back, without blocking on any of them.
+
+License: GNU GPL v3: http://www.gnu.org/copyleft/gpl.html
+
+ Redeem is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ Redeem is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with Redeem.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+from threading import Thread, Lock
+from collections import deque
+import errno
+import fcntl
+import logging
+import os
+import select
+from Gcode import Gcode
+import BinaryGcode
+
+READ_SIZE = 65536       # bytes read from a channel at a time
+MAX_LINE_LENGTH = 4096  # longer lines are dropped
+MAX_OUTPUT = 65536      # reply bytes kept for a host that isn't reading them
+RETRY_INTERVAL = 0.005  # how often held channels are looked at again
+
+# errors that only mean "not now"
+WOULD_BLOCK = (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR)
+
+
+def set_nonblocking(fd):
+    flags = fcntl.fcntl(fd, fcntl.F_GETFL)
+    fcntl.fcntl(fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+
+
+class Channel(object):
+    """ A connection to a host. Its lines are queued with its prot as they
+    arrive. Its replies are queued and written by the reactor, as far as the
+    host takes them, with the rest kept until it can take more. """
+    binary = False   # also takes binary records, see BinaryGcode
+    uploads = False  # takes files sent after M28
+
+    def __init__(self, printer, fd, prot):
+        self.printer = printer
+        self.fd = fd
+        self.prot = prot
+        self.reactor = None
+        self.send_response = True
+        self.input = ""
+        self.discarding = False  # dropping input up to the next line or record, see resync
+        self.lines = deque()     # received, waiting for room in the command queues
+        self.upload = None       # the file being received, if any
+        self.output = deque()    # replies waiting for the reactor to write them
+        self.output_size = 0
+        self.output_lock = Lock()
+        self.reset_stats()
+        set_nonblocking(fd)
+
+    def reset_stats(self):
+        self.messages = 0
+        self.writes = 0
+        self.dropped = 0
+
+    def get_stats(self):
+        return {
+            "messages": self.messages,
+            "writes": self.writes,
+            "dropped": self.dropped,
+            "queued": self.output_size,
+        }
+
+    def fileno(self):
+        return self.fd
+
+    def is_held(self):
+        """ Not read while its lines wait for room, or its upload for the disk """
+        return bool(self.lines) or self.upload is not None and self.upload.is_full()
+
+    def read(self):
+        """ The bytes available, "" if there are none, None once the host is gone """
+        try:
+            data = os.read(self.fd, READ_SIZE)
+        except OSError as e:
+            if e.errno in WOULD_BLOCK:
+                return ""
+            logging.warning(self.prot + ": " + str(e))
+            return None
+        return data or None
+
+    def write(self, data):
+        """ Write as much of data as the host takes without blocking, returns how much """
+        try:
+            return os.write(self.fd, data)
+        except OSError as e:
+            if e.errno in WOULD_BLOCK:
+                return 0
+            raise
+
+    def on_readable(self):
+        if self.fd is None:
+            return  # closed since the loop selected it
+        data = self.read()
+        if data is None:
+            self.on_hangup()
+            return
+        if self.upload is not None:
+            data = self.upload.feed(data)
+            if data is None:
+                return
+            self.upload = None
+        if self.discarding:
+            start = self.resync(data, 0)
+            if start is None:
+                return
+            data = data[start:]
+            self.discarding = False
+        data = self.input + data
+        # M28 is told from its parsed code, which takes parsing every line
+        if self.binary and BinaryGcode.MAGIC in data or self.uploads:
+            self.input = self.split(data)
+        else:
+            lines = data.split("\n")
+            self.input = lines.pop()
+            for line in lines:
+                line = line.rstrip("\r")
+                if len(line) > 0:
+                    self.lines.append(Gcode({"message": line, "prot": self.prot}))
+        if len(self.input) > MAX_LINE_LENGTH:
+            logging.warning(self.prot + ": dropping a line longer than " + str(MAX_LINE_LENGTH) + " bytes")
+            self.input = ""
+            self.discarding = True
+        if self.lines:
+            self.on_receive()
+
+    def split(self, data):
+        """ Queue the lines and binary records in data one by one, handing
+        what follows an M28 to its upload. Returns the incomplete rest. """
+        pos = 0
+        while pos < len(data):
+            if self.binary and data[pos] == BinaryGcode.MAGIC:
+                size = BinaryGcode.record_size(data, pos)
+                if size is None or pos + size > len(data):
+                    break
+                gcode = BinaryGcode.decode(data[pos:pos + size], self.prot)
+                self.lines.append(gcode)
+                if gcode.checksum_failed:
+                    # Where the next record starts can't be trusted either, and
+                    # the bytes up to it aren't lines. The host sends the lines
+                    # again from the one asked for.
+                    pos = self.resync(data, pos + 1)
+                    if pos is None:
+                        self.discarding = True
+                        return ""
+                    continue
+                pos += size
+            else:
+                end = data.find("\n", pos)
+                if end < 0:
+                    break
+                line = data[pos:end].rstrip("\r")
+                pos = end + 1
+                if len(line) == 0:
+                    continue
+                gcode = Gcode({"message": line, "prot": self.prot})
+                self.lines.append(gcode)
+                if self.uploads and gcode.code() == "M28":
+                    data = self.start_upload(gcode, data[pos:])
+                    if data is None:
+                        return ""
+                    pos = 0
+        return data[pos:]
+
+    def resync(self, data, pos):
+        """ Where the first line or record after pos starts, None if data
+        has no end of line or record start after pos """
+        start = data.find("\n", pos)
+        if start >= 0:
+            start += 1
+        if self.binary:
+            magic = data.find(BinaryGcode.MAGIC, pos)
+            if magic >= 0 and (start < 0 or magic < start):
+                start = magic
+        return start if start >= 0 else None
+
+    def start_upload(self, gcode, data):
+        """ Start the upload gcode asks for, with data as the start of the file.
+        Returns what follows the file once it is all there, None until then. """
+        gcode.upload = self.printer.processor.gcodes["M28"].start_upload(gcode)
+        if gcode.upload is None:
+            return data
+        rest = gcode.upload.feed(data)
+        if rest is None:
+            self.upload = gcode.upload
+        return rest
+
+    def on_receive(self):
+        """ Called when lines came in """
+        pass
+
+    def on_hangup(self):
+        """ Called when the host is gone """
+        self.close()
+
+    def has_output(self):
+        return self.output_size > 0
+
+    def send_message(self, message):
+        """ Queue a message. The reactor writes it out together with the
+        others queued by then, so the sender never waits for the host. """
+        if not self.send_response or self.fd is None:
+            return
+        if message[-1] != "\n":
+            message += "\n"
+        with self.output_lock:
+            if self.output_size + len(message) > MAX_OUTPUT:
+                self.dropped += 1
+                logging.warning(self.prot + ": host isn't reading, dropping a reply")
+                return
+            self.output.append(message)
+            self.output_size += len(message)
+            self.messages += 1
+        self.reactor.wake()
+
+    def flush(self):
+        """ Write the queued replies in one go, as far as the host takes them.
+        Only called by the reactor, so there is one writer. """
+        with self.output_lock:
+            if self.fd is None or not self.output:
+                return
+            data = "".join(self.output)
+            self.output.clear()
+        try:
+            written = self.write(data)
+        except EnvironmentError as e:
+            logging.warning(self.prot + ": " + str(e))
+            written = len(data)
+        with self.output_lock:
+            if written:
+                self.writes += 1
+            if written < len(data):
+                # ahead of what was queued while writing
+                self.output.appendleft(data[written:])
+            self.output_size -= written
+
+    def close(self):
+        if self.upload is not None:
+            self.upload.abort()
+            self.upload = None
+        if self.reactor:
+            self.reactor.remove(self)
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+class Reactor(object):
+    """ Waits on every channel at once, hands the lines they send to the
+    G-code processor and writes out the replies queued for them """
+
+    def __init__(self, printer):
+        self.printer = printer
+        self.channels = []   # replaced rather than changed, so the loop can use it unlocked
+        self.lock = Lock()
+        self.wake_r, self.wake_w = os.pipe()
+        set_nonblocking(self.wake_r)
+        set_nonblocking(self.wake_w)
+        self.woken = False
+        self.running = False
+        self.t = None
+
+    def add(self, channel):
+        channel.reactor = self
+        with self.lock:
+            self.channels = self.channels + [channel]
+        self.wake()
+
+    def remove(self, channel):
+        with self.lock:
+            self.channels = [c for c in self.channels if c is not channel]
+        self.wake()
+
+    def get_stats(self):
+        """ Per channel prot: the replies queued, the writes they took,
+        how many were dropped and how many bytes are still queued """
+        return dict((c.prot, c.get_stats()) for c in self.channels if isinstance(c, Channel))
+
+    def reset_stats(self):
+        for channel in self.channels:
+            if isinstance(channel, Channel):
+                channel.reset_stats()
+
+    def start(self):
+        self.running = True
+        self.t = Thread(target=self.loop, name="Reactor")
+        self.t.daemon = True
+        self.t.start()
+
+    def stop(self):
+        self.running = False
+        self.wake()
+        if self.t:
+            self.t.join()
+
+    def wake(self):
+        """ Make the loop look at the channels again """
+        if not self.woken:
+            self.woken = True
+            try:
+                os.write(self.wake_w, "x")
+            except OSError:
+                pass  # full, so it is waking up anyway
+
+    def loop(self):
+        while self.running:
+            channels = self.channels
+            # A held channel isn't read, so its host waits too
+            readers = [c for c in channels if not c.is_held()]
+            writers = [c for c in channels if c.has_output()]
+            waiting = len(readers) < len(channels)
+            try:
+                readable, _, _ = select.select(readers + [self.wake_r], writers, [],
+                                                      RETRY_INTERVAL if waiting else None)
+            except (select.error, EnvironmentError) as e:
+                if e.args[0] == errno.EINTR:
+                    continue
+                # a channel was closed under us, the next round won't have it
+                logging.debug("Reactor: " + str(e))
+                continue
+
+            if self.wake_r in readable:
+                readable.remove(self.wake_r)
+                try:
+                    os.read(self.wake_r, 4096)
+                except OSError:
+                    pass
+                self.woken = False
+
+            for channel in readable:
+                try:
+                    channel.on_readable()
+                except Exception:
+                    logging.exception("Reading from " + str(getattr(channel, "prot", channel)) + ": ")
+            for channel in channels:
+                self.dispatch(channel)
+            # Everything queued by now, real-time replies included, goes out in one write
+            for channel in channels:
+                if channel.has_output():
+                    channel.flush()
+
+    def dispatch(self, channel):
+        """ Queue the lines of channel as long as there is room for them """
+        processor = self.printer.processor
+        while channel.lines and processor.has_room_for(channel.lines[0]):
+            gcode = channel.lines.popleft()
+            try:
+                processor.enqueue(gcode)
+            except Exception:
+                logging.exception("Could not queue " + gcode.message + ": ")
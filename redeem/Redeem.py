@@ -23,6 +23,10 @@ License: GNU GPL v3: http://www.gnu.org/copyleft/gpl.html
  along with Redeem.  If not, see <http://www.gnu.org/licenses/>.
 """
 
+from StartupTimer import StartupTimer
+startup_timer = StartupTimer()
+startup_timer.start_timing_imports()
+
 import glob
 import logging
 import logging.handlers
@@ -30,8 +34,6 @@ import os
 import os.path
 import signal
 import threading
-from threading import Thread
-import Queue
 import numpy as np
 import sys, traceback
 
@@ -46,6 +48,7 @@ from EndStop import EndStop
 from USB import USB
 from Pipe import Pipe
 from Ethernet import Ethernet
+from Reactor import Reactor
 from Path import Path
 from PathPlanner import PathPlanner
 from Gcode import Gcode
@@ -54,6 +57,7 @@ from PruFirmware import PruFirmware
 from CascadingConfigParser import CascadingConfigParser
 from Printer import Printer
 from GCodeProcessor import GCodeProcessor
+from Scheduler import Scheduler, LANES
 from PluginsController import PluginsController
 from Delta import Delta
 from Enable import Enable
@@ -64,9 +68,12 @@ from Alarm import Alarm, AlarmExecutor
 from StepperWatchdog import StepperWatchdog
 from Key_pin import Key_pin, Key_pin_listener
 from Watchdog import Watchdog
+from Util import Util
 from six import iteritems
 from _version import __version__, __release_name__
 
+startup_timer.stop_timing_imports()
+
 # Global vars
 printer = None
 
@@ -216,6 +223,8 @@ class Redeem:
         # activate all the endstops
         self.printer.set_active_endstops()
         
+        startup_timer.phase("config, capes and end stops")
+
         #######################################################################
         # STEPPER
 
@@ -290,6 +299,8 @@ class Redeem:
             for opt in opts:
                 Delta.__dict__[opt] = printer.config.getfloat('Delta', opt)
                 
+        startup_timer.phase("steppers")
+
         #######################################################################
         # TEMPERATURE CONTROL
 
@@ -354,6 +365,7 @@ class Redeem:
                       "on-off-control":OnOffControl,
                       "pid-control":PIDControl,
                       "proportional-control":ProportionalControl,
+                      "velocity-control":VelocityControl,
                       "fan":Fan, "heater":Heater, "safety":Safety,
                       "gcode":CommandCode}
     
@@ -429,6 +441,8 @@ class Redeem:
             logging.info("{} enabled".format(name))
             heater.enable()
                 
+        startup_timer.phase("temperature control")
+
         #######################################################################
         # SERVO
 
@@ -475,16 +489,14 @@ class Redeem:
                 printer.filament_sensors.append(sensor)
 
 
+        startup_timer.phase("servos, encoders and sensors")
+
         #######################################################################
         # PATH PLANNING
 
-        # Make a queue of commands
-        self.printer.commands = Queue.Queue(10)
-
-        # Make a queue of commands that should not be buffered
-        self.printer.sync_commands = Queue.Queue()
-        self.printer.unbuffered_commands = Queue.Queue(10)
-        self.printer.async_commands = Queue.Queue(10)
+        # Runs the commands as they come in, in step with the moves
+        depths = dict((lane, printer.config.getint('System', lane + '_queue_depth')) for lane in LANES)
+        self.printer.scheduler = Scheduler(self.printer, self._execute, self._synchronize, depths)
 
         # Bed compensation matrix
         printer.matrix_bed_comp = printer.load_bed_compensation_matrix()
@@ -518,6 +530,16 @@ class Redeem:
         printer.move_cache_size = printer.config.getfloat('Planner', 'move_cache_size')
         printer.print_move_buffer_wait = printer.config.getfloat('Planner', 'print_move_buffer_wait')
         printer.max_buffered_move_time = printer.config.getfloat('Planner', 'max_buffered_move_time')
+        printer.step_workers = printer.config.getint('Planner', 'step_workers')
+
+        printer.realtime = printer.config.getboolean('System', 'realtime')
+        printer.realtime_planner_priority = printer.config.getint('System', 'realtime_planner_priority')
+        printer.realtime_pru_priority = printer.config.getint('System', 'realtime_pru_priority')
+        printer.realtime_executor_priority = printer.config.getint('System', 'realtime_executor_priority')
+        printer.realtime_cpu = printer.config.getint('System', 'realtime_cpu')
+        printer.realtime_lock_memory = printer.config.getboolean('System', 'realtime_lock_memory')
+        printer.early_ok = printer.config.getboolean('System', 'early_ok')
+        printer.binary_gcode = printer.config.getboolean('System', 'binary_gcode')
 
         self.printer.processor = GCodeProcessor(self.printer)
         self.printer.plugins = PluginsController(self.printer)
@@ -588,6 +610,8 @@ class Redeem:
                 logging.info("Home position = %s"%str(printer.path_planner.home_pos))
 
 
+        startup_timer.phase("path planner")
+
         # Read end stop value again now that PRU is running
         for _, es in iteritems(self.printer.end_stops):
             es.read_value()
@@ -598,42 +622,31 @@ class Redeem:
         if printer.config.getboolean('Steppers', 'use_timeout'):
             printer.swd.start()
 
-        # Set up communication channels
+        # Set up communication channels, all served by the reactor
+        printer.reactor = Reactor(printer)
         printer.comms["USB"] = USB(self.printer)
-        printer.comms["Eth"] = Ethernet(self.printer)
+        printer.comms["Eth"] = Ethernet(self.printer,
+                                        printer.config.get('System', 'ethernet_bind'),
+                                        printer.config.getint('System', 'ethernet_port'))
 
-        if Pipe.check_tty0tty() or Pipe.check_socat():
-            printer.comms["octoprint"] = Pipe(printer, "octoprint")
-            printer.comms["toggle"] = Pipe(printer, "toggle")
-            printer.comms["testing"] = Pipe(printer, "testing")
-            printer.comms["testing_noret"] = Pipe(printer, "testing_noret")
+        for prot in ["octoprint", "toggle", "testing", "testing_noret"]:
+            try:
+                printer.comms[prot] = Pipe(printer, prot)
+            except EnvironmentError as e:
+                logging.warning("No virtual tty pipe for " + prot + ": " + str(e))
+        if "testing_noret" in printer.comms:
             # Does not send "ok"
             printer.comms["testing_noret"].send_response = False
-        else:
-            logging.warning("Neither tty0tty or socat is installed! No virtual tty pipes enabled")
+        printer.reactor.start()
+
+        startup_timer.phase("communication channels")
+        startup_timer.report()
 
 
     def start(self):
         """ Start the processes """
         self.running = True
-        # Start the two processes
-        p0 = Thread(target=self.loop,
-                    args=(self.printer.commands, "buffered"), name="p0")
-        p1 = Thread(target=self.loop,
-                    args=(self.printer.unbuffered_commands, "unbuffered"), name="p1")
-        p2 = Thread(target=self.loop,
-                    args=(self.printer.async_commands, "async"), name="p2")
-        p3 = Thread(target=self.eventloop,
-                    args=(self.printer.sync_commands, "sync"), name="p3")
-        p0.daemon = True
-        p1.daemon = True
-        p2.daemon = True
-        p3.daemon = True
-
-        p0.start()
-        p1.start()
-        p2.start()
-        p3.start()
+        self.printer.scheduler.start()
 
         Alarm.executor.start()
         Key_pin.listener.start()
@@ -646,42 +659,10 @@ class Redeem:
         # Signal everything ready
         logging.info("Redeem ready")
 
-    def loop(self, queue, name):
-        """ When a new gcode comes in, execute it """
-        try:
-            while self.running:
-                try:
-                    gcode = queue.get(block=True, timeout=1)
-                except Queue.Empty:
-                    continue
-                logging.debug("Executing "+gcode.code()+" from "+name + " " + gcode.message)
-                self._execute(gcode)
-                self.printer.reply(gcode)
-                queue.task_done()
-                logging.debug("Completed "+gcode.code()+" from "+name + " " + gcode.message)
-        except Exception:
-            logging.exception("Exception in {} loop: ".format(name))
-
-    def eventloop(self, queue, name):
-        """ When a new event comes in, execute the pending gcode """
-        try:
-            while self.running:
-                # Returns False on timeout, else True
-                if self.printer.path_planner.wait_until_sync_event():
-                    try:
-                        gcode = queue.get(block=True, timeout=1)
-                    except Queue.Empty:
-                        logging.info("spurious sync event completion")
-                        continue
-                    self._synchronize(gcode)
-                    logging.info("Event handled for " + gcode.code() + " from " + name + " " + gcode.message)
-                    queue.task_done()
-        except Exception:
-            logging.exception("Exception in {} eventloop: ".format(name))
-
     def exit(self):
         logging.info("Redeem starting exit")
         self.running = False
+        self.printer.scheduler.stop()
         self.printer.path_planner.wait_until_done()
         self.printer.path_planner.force_exit()
 
@@ -700,9 +681,10 @@ class Redeem:
             logging.debug("closing "+fan.name)
             fan.disable()
 
-        for name, comm in iteritems(self.printer.comms):
+        for name, comm in list(self.printer.comms.items()):
             logging.debug("closing "+name)
             comm.close()
+        self.printer.reactor.stop()
 
         self.printer.enable.set_disabled()
         self.printer.swd.stop()
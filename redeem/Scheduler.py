@@ -0,0 +1,242 @@
+"""
+Runs the queued G-codes. Each lane has a thread that runs its G-codes in
+order. A G-code can also be made to wait for G-codes in other lanes, or for
+the moves queued before it to be stepped out, and is dispatched as soon as
+those are done.
+
+License: GNU GPL v3: http://www.gnu.org/copyleft/gpl.html
+
+ Redeem is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ Redeem is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with Redeem.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from Util import Util
+
+MOTION = "motion"          # moves and what rides along with them into the planner
+BUFFERED = "buffered"      # commands run in order with the moves
+UNBUFFERED = "unbuffered"  # commands run as soon as they arrive
+LANES = (MOTION, BUFFERED, UNBUFFERED)
+
+
+class Task(object):
+    """ A G-code queued in a lane. It is done once it has run, or, if it
+    queued a planner event, once the event fired and its on_sync ran. """
+    __slots__ = ("gcode", "lane", "after", "done", "planner_event")
+
+    def __init__(self, gcode, lane, after):
+        self.gcode = gcode
+        self.lane = lane
+        self.after = after          # tasks that have to be done before this one runs
+        self.done = False
+        self.planner_event = None   # the timed event ticket, or True for a sync event
+
+
+class Lane(object):
+    """ The G-codes queued for one worker, with the counters to size its depth by """
+
+    def __init__(self, name, depth, lock):
+        self.name = name
+        self.depth = depth                       # G-codes held before submit blocks
+        self.queue = deque()
+        self.ready = threading.Condition(lock)   # the head may have become ready
+        self.space = threading.Condition(lock)   # a G-code was taken off
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.since = time.time()
+        self.high_water = len(self.queue)
+        self.executed = 0
+        self.blocked = 0          # submits that had to wait for space
+        self.blocked_time = 0.0   # seconds they waited in total
+
+    def get_stats(self):
+        elapsed = max(time.time() - self.since, 1e-6)
+        return {
+            "depth": self.depth,
+            "queued": len(self.queue),
+            "high_water": self.high_water,
+            "executed": self.executed,
+            "per_second": self.executed / elapsed,
+            "blocked": self.blocked,
+            "blocked_ms": self.blocked_time * 1000.0,
+        }
+
+
+class Scheduler(object):
+
+    def __init__(self, printer, execute, synchronize, depths=None):
+        self.printer = printer
+        self.execute = execute          # runs a G-code
+        self.synchronize = synchronize  # runs the on_sync of a G-code
+
+        depths = depths or {}
+        self.lock = threading.Lock()
+        self.lanes = dict((lane, Lane(lane, max(1, depths.get(lane, 10)), self.lock))
+                          for lane in LANES)
+        self.sync_tasks = deque()   # waiting for the planner's sync events, in the order they were queued
+        self.timed_tasks = deque()  # waiting for timed events
+        self.timed_queued = threading.Condition(self.lock)
+        self.running = False
+        self.threads = []
+
+    def start(self):
+        self.running = True
+        for lane in LANES:
+            self.threads.append(threading.Thread(target=self._work, args=(lane,), name=lane))
+        self.threads.append(threading.Thread(target=self._wait_for_sync_events, name="sync"))
+        self.threads.append(threading.Thread(target=self._wait_for_timed_events, name="timed"))
+        for thread in self.threads:
+            thread.daemon = True
+            thread.start()
+
+    def stop(self):
+        """ Stop dispatching. G-codes already running are finished. """
+        with self.lock:
+            self.running = False
+            for lane in self.lanes.values():
+                lane.ready.notify_all()
+                lane.space.notify_all()
+            self.timed_queued.notify_all()
+
+    def submit(self, gcode, lane, after=()):
+        """ Queue gcode to run after the G-codes before it in lane and the tasks
+        in after. Blocks while the lane is full. Returns the task of gcode. """
+        task = Task(gcode, lane, [t for t in after if t is not None])
+        gcode.task = task
+        lane = self.lanes[lane]
+        with self.lock:
+            if self.running and len(lane.queue) >= lane.depth:
+                blocked = time.time()
+                while self.running and len(lane.queue) >= lane.depth:
+                    lane.space.wait()
+                lane.blocked += 1
+                lane.blocked_time += time.time() - blocked
+            lane.queue.append(task)
+            lane.high_water = max(lane.high_water, len(lane.queue))
+            lane.ready.notify()
+        return task
+
+    def get_free_slots(self, lanes=(MOTION, BUFFERED)):
+        """ G-codes that can be submitted to any of lanes without blocking """
+        with self.lock:
+            return min(self.lanes[lane].depth - len(self.lanes[lane].queue) for lane in lanes)
+
+    def get_stats(self):
+        """ Per lane: its depth, how many G-codes are queued, the most there were,
+        how many ran and how fast, and how often and how long submit blocked """
+        with self.lock:
+            return dict((name, lane.get_stats()) for name, lane in self.lanes.items())
+
+    def reset_stats(self):
+        with self.lock:
+            for lane in self.lanes.values():
+                lane.reset_stats()
+
+    def queue_sync_event(self, gcode):
+        """ Queue a planner sync event after the moves so far. The task of gcode
+        is then done when the event fires. False if there were no moves to wait for. """
+        with self.lock:
+            if not self.printer.path_planner.queue_sync_event(False):
+                return False
+            gcode.task.planner_event = True
+            self.sync_tasks.append(gcode.task)
+        return True
+
+    def wait_for_timed_event(self, gcode):
+        """ The task of gcode is done when gcode.timed_event is reached """
+        with self.lock:
+            gcode.task.planner_event = gcode.timed_event
+            self.timed_tasks.append(gcode.task)
+            self.timed_queued.notify()
+
+    def _is_ready(self, task):
+        for before in task.after:
+            if not before.done:
+                return False
+        return True
+
+    def _complete(self, task):
+        """ Mark task done and wake the lanes that may wait for it. Call with the lock held. """
+        task.done = True
+        for lane in self.lanes.values():
+            lane.ready.notify()
+
+    def _work(self, name):
+        if name == BUFFERED and self.printer.realtime:
+            Util.set_thread_realtime(self.printer.realtime_executor_priority,
+                                     self.printer.realtime_cpu)
+        lane = self.lanes[name]
+        try:
+            while True:
+                with self.lock:
+                    while self.running and not (lane.queue and self._is_ready(lane.queue[0])):
+                        lane.ready.wait()
+                    if not self.running:
+                        return
+                    task = lane.queue.popleft()
+                    lane.space.notify()
+
+                gcode = task.gcode
+                logging.debug("Executing " + gcode.code() + " from " + name + " " + gcode.message)
+                self.execute(gcode)
+                self.printer.reply(gcode)
+                logging.debug("Completed " + gcode.code() + " from " + name + " " + gcode.message)
+
+                with self.lock:
+                    lane.executed += 1
+                    if task.planner_event is None:
+                        self._complete(task)
+        except Exception:
+            logging.exception("Exception in {} lane: ".format(name))
+
+    def _wait_for_sync_events(self):
+        try:
+            while self.running:
+                # Returns False on timeout, else True
+                if not self.printer.path_planner.wait_until_sync_event():
+                    continue
+                with self.lock:
+                    task = self.sync_tasks.popleft() if self.sync_tasks else None
+                if task is None:
+                    logging.info("spurious sync event completion")
+                    continue
+                self.synchronize(task.gcode)
+                logging.info("Event handled for " + task.gcode.code() + " " + task.gcode.message)
+                with self.lock:
+                    self._complete(task)
+        except Exception:
+            logging.exception("Exception waiting for sync events: ")
+
+    def _wait_for_timed_events(self):
+        try:
+            while True:
+                with self.lock:
+                    while self.running and not self.timed_tasks:
+                        self.timed_queued.wait()
+                    if not self.running:
+                        return
+                    task = self.timed_tasks[0]
+                while not self.printer.path_planner.wait_until_timed_event(task.planner_event):
+                    if not self.running:
+                        return
+                self.synchronize(task.gcode)
+                logging.debug("Timed event handled for " + task.gcode.code() + " " + task.gcode.message)
+                with self.lock:
+                    self.timed_tasks.popleft()
+                    self._complete(task)
+        except Exception:
+            logging.exception("Exception waiting for timed events: ")
@@ -0,0 +1,73 @@
+"""
+Measures how long Redeem takes to import its modules and to get through
+each phase of initialization, so slow startups can be tracked down.
+
+License: GNU GPL v3: http://www.gnu.org/copyleft/gpl.html
+
+ Redeem is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ Redeem is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with Redeem.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import __builtin__
+import logging
+import time
+
+
+class StartupTimer(object):
+
+    def __init__(self):
+        self.imports = []   # (module, seconds) of each import made while timing
+        self.phases = []    # (phase, seconds) in the order they ran
+        self.last = time.time()
+        self._import = None
+        self._depth = 0
+
+    def start_timing_imports(self):
+        """ Time the imports from here on. Only the outermost ones are
+        recorded, each including the modules it pulls in. """
+        self._import = __builtin__.__import__
+        __builtin__.__import__ = self._timed_import
+
+    def stop_timing_imports(self):
+        if self._import is not None:
+            __builtin__.__import__ = self._import
+            self._import = None
+        self.phase("imports")
+
+    def _timed_import(self, name, *args, **kwargs):
+        if self._depth:
+            return self._import(name, *args, **kwargs)
+        self._depth += 1
+        start = time.time()
+        try:
+            return self._import(name, *args, **kwargs)
+        finally:
+            self._depth -= 1
+            self.imports.append((name, time.time() - start))
+
+    def phase(self, name):
+        """ Record the time since the previous phase ended as phase name """
+        now = time.time()
+        self.phases.append((name, now - self.last))
+        self.last = now
+
+    def report(self):
+        """ Log the slowest imports and every phase at debug level """
+        total = sum(seconds for _, seconds in self.phases)
+        logging.debug("Startup took {:.0f} ms".format(total * 1000))
+        for name, seconds in sorted(self.imports, key=lambda i: -i[1])[:10]:
+            logging.debug("  import {:<24} {:6.0f} ms".format(name, seconds * 1000))
+        for name, seconds in self.phases:
+            logging.debug("  {:<31} {:6.0f} ms".format(name, seconds * 1000))
+        self.imports = []
+        self.phases = []
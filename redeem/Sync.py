@@ -1,6 +1,5 @@
 """
-GCode M400
-Wait until all buffered paths are executed
+Internal commands that keep the G-codes in step with the moves
 
 Author: Mathieu Monney
 email: zittix(at)xwaves(dot)net
@@ -10,85 +9,37 @@ License: CC BY-SA: http://creativecommons.org/licenses/by-sa/2.0/
 
 from gcodes.GCodeCommand import GCodeCommand
 import logging
-import threading
 
 
-class SyncState:
-    def __init__(self):
-        self.ready_event = threading.Event()
-        self.used_event = False
-
-
-class SyncBufferedToAsync_Buffered(GCodeCommand):
-    def __init__(self, printer, sync_state):
-        super(SyncBufferedToAsync_Buffered, self).__init__(printer)
-        self.sync_state = sync_state
+class SyncPoint(GCodeCommand):
+    """ Done once the moves queued before it are stepped out, so the G-codes
+    made to wait for it run in step with the moves """
 
     def execute(self, g):
-        logging.debug("SyncBufferedToAsync_Buffered starting")
-        self.sync_state.ready_event.wait()
-        logging.debug("SyncBufferedToAsync_Buffered got ready event")
-        if not self.sync_state.used_event:
-            logging.debug("SyncBufferedToAsync_Buffered has to wait manually")
+        if not self.printer.scheduler.queue_sync_event(g):
             # The move buffer is already empty! fallback to this to ensure we're in sync.
             self.printer.path_planner.wait_until_done()
-        logging.debug("SyncBufferedToAsync_Buffered complete")
-
-    def get_description(self):
-        return "Internal"
-
-
-class SyncBufferedToAsync_Async(GCodeCommand):
-    def __init__(self, printer, sync_state):
-        super(SyncBufferedToAsync_Async, self).__init__(printer)
-        self.sync_state = sync_state
-
-    def execute(self, g):
-        logging.debug("SyncBufferedToAsync_Async starting")
-        # This needs to be a standard method somewhere
-        # No blocking of the PRU, (notification only)
-        if not self.printer.path_planner.queue_sync_event(False):
-            logging.debug(
-                "SyncBufferedToAsync_Async failed to queue a sync event - waiting until done instead")
-            self.sync_state.used_event = False
-            self.sync_state.ready_event.set()
-            self.printer.sync_commands.get()
-            # We should be at the front of the line.
-            self.printer.sync_commands.task_done()
-        logging.debug("SyncBufferedToAsync_Async complete")
 
     def on_sync(self, g):
-        logging.debug("SyncBufferedToAsync_Async on_sync")
-        self.sync_state.used_event = True
-        self.sync_state.ready_event.set()
+        logging.debug("SyncPoint on_sync")
 
     def get_description(self):
         return "Internal"
 
 
-class SyncAsyncToBuffered_Buffered(GCodeCommand):
-    def __init__(self, printer, sync_state):
-        super(SyncAsyncToBuffered_Buffered, self).__init__(printer)
-        self.sync_state = sync_state
+class TimedEvent(GCodeCommand):
+    """ Carries a buffered command in the async stream, so it runs when the moves
+    queued before it have been stepped out instead of syncing the queues """
+    def __init__(self, printer, command):
+        super(TimedEvent, self).__init__(printer)
+        self.command = command
 
     def execute(self, g):
-        logging.debug("SyncAsyncToBuffered_Buffered firing event")
-        self.sync_state.used_event = False
-        self.sync_state.ready_event.set()
-
-    def get_description(self):
-        return "Internal"
+        g.timed_event = self.printer.path_planner.queue_timed_event()
+        self.printer.scheduler.wait_for_timed_event(g)
 
-
-class SyncAsyncToBuffered_Async(GCodeCommand):
-    def __init__(self, printer, sync_state):
-        super(SyncAsyncToBuffered_Async, self).__init__(printer)
-        self.sync_state = sync_state
-
-    def execute(self, g):
-        logging.debug("SyncAsyncToBuffered_Async waiting for event")
-        self.sync_state.ready_event.wait()
-        logging.debug("SyncAsyncToBuffered_Async event has fired - continuing")
+    def on_sync(self, g):
+        self.command.execute(g)
 
     def get_description(self):
         return "Internal"
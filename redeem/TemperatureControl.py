@@ -481,6 +481,36 @@ class CommandCode(ConstantControl):
         return str(self.name)
         
         
+class VelocityControl(Control):
+    """
+    Scale the input by the planned speed of the move being stepped out, 
+    so a laser or spindle puts the same energy into every millimeter 
+    through acceleration and deceleration
+    """
+    
+    feedback_control = False
+    
+    def get_options(self):
+        """ retrieve options from config"""
+        self.input = self.options["input"]
+        self.output = None
+        if "output" in self.options:
+            self.output = self.options["output"]
+        self.sleep = float(self.options['sleep'])
+        
+    def set_target_value(self, value):
+        """ set the power at the commanded speed """
+        self.input.set_target_value(value)
+        
+    def ramp_to(self, value, delay):
+        """ ramp the power at the commanded speed """
+        self.input.ramp_to(value, delay)
+        
+    def get_value(self):
+        """ return the input scaled by the current speed ratio """
+        return self.input.get_value()*self.printer.path_planner.get_speed_ratio()
+        
+        
 class OnOffControl(Control):
     """
     Control by switching between two defined states
@@ -21,48 +21,31 @@ License: GNU GPL v3: http://www.gnu.org/copyleft/gpl.html
  along with Redeem.  If not, see <http://www.gnu.org/licenses/>.
 """
 
-from threading import Thread
-import select
+import os
 import logging
-from Gcode import Gcode
+from Reactor import Channel
 
 
-class USB:
+class USB(Channel):
     def __init__(self, printer):
-        self.printer = printer
         self.send_response = False
+        self.reactor = None
+        self.fd = None
+        self.upload = None
         try:
-            self.tty = open("/dev/ttyGS0", "r+")
-        except IOError:
+            fd = os.open("/dev/ttyGS0", os.O_RDWR | os.O_NOCTTY)
+        except OSError:
             logging.warning("USB gadget serial not available as /dev/ttyGS0")
             return
-        self.running = True
-        self.t = Thread(target=self.get_message, name="USB")
-        self.t.start()		
-
-    def get_message(self):
-        """ Loop that gets messages and pushes them on the queue """
-        while self.running:
-            ret = select.select([self.tty], [], [], 1.0)
-            if ret[0] == [self.tty]:
-                message = self.tty.readline().strip("\n")
-                if len(message) > 0:
-                    g = Gcode({"message": message, "prot": "USB"})
-                    self.printer.processor.enqueue(g)
-                    # Do not enable sending messages until a 
-                    # message has been received
-                    self.send_response = True
+        Channel.__init__(self, printer, fd, "USB")
+        self.binary = printer.binary_gcode
+        # Do not enable sending messages until a
+        # message has been received
+        self.send_response = False
+        printer.reactor.add(self)
 
-    def send_message(self, message):
-        """ Send a message """
-        if self.send_response:
-            if message[-1] != "\n":
-                message += "\n"
-            #logging.debug("USB: "+str(message))
-            self.tty.write(message)
+    def on_receive(self):
+        self.send_response = True
 
-    def close(self):
-        """ Stop receiving messages """
-        self.running = False
-        if hasattr(self, 't'):
-            self.t.join()
+    def on_hangup(self):
+        pass  # the gadget stays, the host will be back
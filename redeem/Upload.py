@@ -0,0 +1,127 @@
+"""
+Upload - a file sent by a host over its channel, see M28.
+
+License: GNU GPL v3: http://www.gnu.org/copyleft/gpl.html
+
+ Redeem is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ Redeem is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with Redeem.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+from threading import Thread
+import logging
+import os
+import time
+import zlib
+import Queue
+
+CHUNK_SIZE = 1 << 20  # bytes written to the file at a time
+MAX_QUEUED = 8        # chunks waiting for the disk before the host is held back
+
+
+class Upload(object):
+    """ The reactor feeds it what the host sends and a thread of its own
+    writes it out in large chunks, so the disk never holds up the other
+    channels. The file is synced and checked against its CRC32 before it
+    takes its name, so a failed upload doesn't leave half a file behind. """
+
+    def __init__(self, path, size, crc, done):
+        self.path = path
+        self.size = size
+        self.crc = crc
+        self.done = done   # called with None once the file is in place, else with the error
+        self.received = 0
+        self.pending = []
+        self.pending_size = 0
+        self.aborted = False
+        self.started = time.time()
+        self.chunks = Queue.Queue(MAX_QUEUED)
+        self.part = path + ".part"
+        self.fd = os.open(self.part, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        self.t = Thread(target=self.write, name="Upload")
+        self.t.daemon = True
+        self.t.start()
+
+    def is_full(self):
+        """ True while the disk is behind, the host is not read until it catches up """
+        return self.chunks.full()
+
+    def feed(self, data):
+        """ Take the part of data that belongs to the file. Returns what
+        follows the file once it is all there, None until then. """
+        take = min(len(data), self.size - self.received)
+        if take:
+            self.pending.append(data[:take] if take < len(data) else data)
+            self.pending_size += take
+            self.received += take
+        last = self.received == self.size
+        if last or self.pending_size >= CHUNK_SIZE:
+            self.chunks.put(("".join(self.pending), last))
+            self.pending = []
+            self.pending_size = 0
+        return data[take:] if last else None
+
+    def abort(self):
+        """ The host is gone before sending it all """
+        self.aborted = True
+        try:
+            self.chunks.put_nowait(("", True))
+        except Queue.Full:
+            pass  # the writer sees aborted after the next chunk
+
+    def write(self):
+        crc = 0
+        error = None
+        try:
+            last = False
+            while not last:
+                data, last = self.chunks.get()
+                if self.aborted:
+                    error = "aborted after {} of {} bytes".format(self.received, self.size)
+                    break
+                if error:
+                    continue  # keep taking chunks so the host isn't held back
+                crc = zlib.crc32(data, crc)
+                try:
+                    while data:
+                        data = data[os.write(self.fd, data):]
+                except OSError as e:
+                    error = str(e)
+            if not error:
+                os.fsync(self.fd)
+        except OSError as e:
+            error = str(e)
+        finally:
+            os.close(self.fd)
+
+        if not error and crc & 0xffffffff != self.crc:
+            error = "checksum mismatch"
+        try:
+            if error:
+                os.remove(self.part)
+            else:
+                os.rename(self.part, self.path)
+                directory = os.open(os.path.dirname(self.path) or ".", os.O_RDONLY)
+                try:
+                    os.fsync(directory)  # so the rename survives a power cut too
+                finally:
+                    os.close(directory)
+        except OSError as e:
+            error = error or str(e)
+
+        if error:
+            logging.warning("Upload of " + self.path + " failed: " + error)
+        else:
+            elapsed = max(time.time() - self.started, 1e-6)
+            logging.info("Uploaded {} ({} bytes, {:.0f} kB/s)".format(
+                self.path, self.size, self.size / elapsed / 1000.0))
+        self.done(error)
@@ -23,8 +23,16 @@ License: GNU GPL v3: http://www.gnu.org/copyleft/gpl.html
 from __future__ import division, print_function
 import time
 import logging
+import ctypes
+import ctypes.util
 import numpy as np
 
+SCHED_FIFO = 1
+
+
+class _SchedParam(ctypes.Structure):
+    _fields_ = [("sched_priority", ctypes.c_int)]
+
 
 class Util:
 
@@ -219,4 +227,28 @@ class Util:
             ax.set_title("%s (mph=%s, mpd=%d, threshold=%s, edge='%s')"
                          % (mode, str(mph), mpd, str(threshold), edge))
             # plt.grid()
-            plt.show()
\ No newline at end of file
+            plt.show()
+
+    @staticmethod
+    def set_thread_realtime(priority, cpu=-1):
+        """
+        Run the calling thread as SCHED_FIFO at the given priority,
+        pinned to cpu unless that is -1. Returns False if the kernel
+        refused, usually for lack of CAP_SYS_NICE.
+        """
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        ok = True
+        # pid 0 is the calling thread, not the whole process
+        if priority > 0:
+            param = _SchedParam(priority)
+            if libc.sched_setscheduler(0, SCHED_FIFO, ctypes.byref(param)) != 0:
+                logging.warning("Could not set SCHED_FIFO priority {}: errno {}".format(
+                    priority, ctypes.get_errno()))
+                ok = False
+        if cpu >= 0:
+            mask = ctypes.c_ulong(1 << cpu)
+            if libc.sched_setaffinity(0, ctypes.sizeof(mask), ctypes.byref(mask)) != 0:
+                logging.warning("Could not pin thread to cpu {}: errno {}".format(
+                    cpu, ctypes.get_errno()))
+                ok = False
+        return ok
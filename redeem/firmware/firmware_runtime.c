@@ -41,6 +41,9 @@ __far __attribute__((cregister("PRU_SHAREDMEM", near))) volatile uint32_t g_unus
 __far __attribute__((cregister("PRU_SHAREDMEM", near))) volatile uint32_t g_steppersAllowedToMove;
 __far __attribute__((cregister("PRU_SHAREDMEM", near))) volatile uint32_t g_stepsRemaining;
 __far __attribute__((cregister("PRU_SHAREDMEM", near))) volatile uint32_t g_endstops_triggered;
+// Signed count of the steps actually taken on each axis since the firmware started.
+// The host reads these directly to find out how far a cancelled (probe) move got.
+__far __attribute__((cregister("PRU_SHAREDMEM", near))) volatile int32_t g_stepCounters[8];
 
 typedef struct SteppersCommand
 {
@@ -87,6 +90,12 @@ int main(void) {
 
 	g_stepsRemaining = 0;
 
+	uint8_t axis;
+	for (axis = 0; axis < 8; axis++)
+	{
+		g_stepCounters[axis] = 0;
+	}
+
 	while(1)
 	{
 		volatile uint32_t* ddr_addr = *ddr_start;
@@ -221,6 +230,15 @@ int main(void) {
 				*GPIO2_CLEARDATAOUT = gpio2;
 				*GPIO3_CLEARDATAOUT = gpio3;
 
+				// Account for the steps we just took while we wait out the rest of this command
+				for (axis = 0; axis < 8; axis++)
+				{
+					if ((steps >> axis) & 0x01)
+					{
+						g_stepCounters[axis] += ((curCommand->direction >> axis) & 0x01) ? 1 : -1;
+					}
+				}
+
 				// Conveniently, we reset the timer at the start of this step. This means that exactly PRU0_CTRL.CYCLE
 				// cycles have elapsed since we started. If we wait until curCommand->delay cycles have elapsed, this step
 				// will be the right length. It may need to be longer to meet the minimum delay, however.
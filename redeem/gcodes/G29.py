@@ -105,9 +105,7 @@ class G29_1(GCodeCommand):  # was G29C[ircle]
                 i, p[0], p[1], probe_start_height)
         gcodes += "    G32 ; Undock probe\n"
         gcodes += "    G28 ; Home steppers\n"
-        for i in range(len(probes)):
-            gcodes += "    G30 P{} S F{}; Probe point {}\n".format(
-                i, probe_speed, i)
+        gcodes += "    G29.3 S F{}; Probe all points\n".format(probe_speed)
         gcodes += "    G31 ; Dock probe\n"
         if bed_comp:
             gcodes += "    M561 U; (RFS) Update the matrix based on probe data\n"
@@ -147,7 +145,6 @@ class G29_2(GCodeCommand):  # was G29S[quare]
             "X", 0)          # Offset X from starting point
         probe_offset_y = g.get_float_by_letter(
             "Y", 0)          # Offset Y from starting point
-        invert = 1 if g.has_letter("I") else 0                 # Invert probing
         bed_comp = g.get_int_by_letter('B', 1)
 
         ppd = np.sqrt(points)
@@ -166,13 +163,7 @@ class G29_2(GCodeCommand):  # was G29S[quare]
                 i, p[0], p[1], probe_start_height)
         gcodes += "    G32 ; Undock probe\n"
         gcodes += "    G28 ; Home steppers\n"
-        for i in range(len(probes)):
-            if invert:
-                gcodes += "    G30 P{} S F{}; Probe point {}\n".format(
-                    len(probes) - i - 1, probe_speed, len(probes) - i - 1)
-            else:
-                gcodes += "    G30 P{} S F{}; Probe point {}\n".format(
-                    i, probe_speed, i)
+        gcodes += "    G29.3 S F{}; Probe all points\n".format(probe_speed)
         gcodes += "    G31 ; Dock probe\n"
         if bed_comp:
             gcodes += "    M561 U; (RFS) Update the matrix based on probe data\n"
@@ -195,3 +186,75 @@ class G29_2(GCodeCommand):  # was G29S[quare]
                 "X = probe offset X, default: 0\n"
                 "Y = probe offset y, default: 0\n"
                 "B = bed compensation matrix off, default:1\n")
+
+
+class G29_3(GCodeCommand):
+
+    def execute(self, g):
+        if not self.printer.probe_points:
+            logging.warning("G29.3: no probe points defined. Aborting.")
+            return
+
+        # Get probe length, if present, else use value from config.
+        if g.has_letter("D"):
+            probe_length = g.get_float_by_letter("D") / 1000.
+        else:
+            probe_length = self.printer.config.getfloat('Probe', 'length')
+
+        # Get probe speed, if present, else use value from config.
+        if g.has_letter("F"):
+            probe_speed = g.get_float_by_letter("F") / 60000.  # m/s
+        else:
+            probe_speed = self.printer.config.getfloat('Probe', 'speed')
+
+        # Get acceleration, if present, else use value from config.
+        if g.has_letter("Q"):
+            probe_accel = g.get_float_by_letter("Q") / 3600000.  # m/s^2
+        else:
+            probe_accel = self.printer.config.getfloat('Probe', 'accel')
+
+        # Probe offset and points are both in the planner's SI units here
+        offset_x = self.printer.config.getfloat('Probe', 'offset_x')
+        offset_y = self.printer.config.getfloat('Probe', 'offset_y')
+        points = [{"X": p["X"] / 1000. + offset_x,
+                   "Y": p["Y"] / 1000. + offset_y,
+                   "Z": p["Z"] / 1000.} for p in self.printer.probe_points]
+
+        distances = self.printer.path_planner.probe_points(
+            points, probe_length, probe_speed, probe_accel,
+            self.printer.feed_rate,
+            self.printer.accel)
+
+        for index, point in enumerate(self.printer.probe_points):
+            bed_dist = distances[index] * 1000.0  # convert to mm
+            self.printer.send_message(
+                g.prot,
+                "Found Z probe distance {0:.2f} mm at (X, Y) = ({1:.2f}, {2:.2f})".format(
+                    bed_dist, point["X"], point["Y"]))
+            Alarm.action_command("bed_probe_point", json.dumps(
+                [point["X"], point["Y"], bed_dist]))
+            if g.has_letter("S"):
+                self.printer.probe_heights[index] = bed_dist
+
+    def get_description(self):
+        return "Probe all points set by M557 in one sequence"
+
+    def get_long_description(self):
+        return ("Probe every point previously set by M557 as a single "
+                "sequence. The points are visited in nearest-neighbour order "
+                "from the current position and the travel between them is "
+                "not synchronised, so this is much faster than one G30 per "
+                "point. (G20 ignored. All units in mm.)\n\n"
+                "  D = sets the probe length (mm), or taken from config if nothing is specified. \n"
+                "  F = sets the probe speed. If not present, it's taken from the config. \n"
+                "  Q = sets the probe acceleration. If not present, it's taken from the config. \n"
+                "  S = save the probed point distances, as G30 P<n> S does\n")
+
+    def is_buffered(self):
+        return True
+
+    def is_async(self):
+        return True
+
+    def get_test_gcodes(self):
+        return ["G29.3", "G29.3 S"]
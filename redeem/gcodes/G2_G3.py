@@ -36,11 +36,9 @@ class G2(GCodeCommand):
             smds[axis] = value
 
         if self.printer.movement == Path.ABSOLUTE:
-            path = AbsolutePath(smds, self.printer.feed_rate *
-                                self.printer.speed_factor, self.printer.accel)
+            path = AbsolutePath(smds, self.printer.feed_rate, self.printer.accel)
         elif self.printer.movement == Path.RELATIVE:
-            path = RelativePath(smds, self.printer.feed_rate *
-                                self.printer.speed_factor, self.printer.accel)
+            path = RelativePath(smds, self.printer.feed_rate, self.printer.accel)
         else:
             logging.error("invalid movement: " + str(self.printer.movement))
             return
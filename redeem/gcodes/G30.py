@@ -18,6 +18,18 @@ from redeem.Path import G92Path
 from redeem.Alarm import Alarm
 
 
+def _probe_taps(printer, g):
+    """ Multi-tap settings for PathPlanner.probe from [Probe], A overrides the number of taps """
+    return {
+        "samples": max(1, g.get_int_by_letter("A", printer.config.getint('Probe', 'samples'))),
+        "fast_speed": printer.config.getfloat('Probe', 'fast_speed'),
+        "retract": printer.config.getfloat('Probe', 'retract'),
+        "tolerance": printer.config.getfloat('Probe', 'tolerance'),
+        "retries": printer.config.getint('Probe', 'retries'),
+        "method": printer.config.get('Probe', 'samples_method')
+    }
+
+
 class G30(GCodeCommand):
 
     def execute(self, g):
@@ -79,7 +91,8 @@ class G30(GCodeCommand):
         self.printer.processor.execute(G0)
         self.printer.path_planner.wait_until_done()
         bed_dist = self.printer.path_planner.probe(
-            probe_length, probe_speed, probe_accel) * 1000.0  # convert to mm
+            probe_length, probe_speed, probe_accel,
+            **_probe_taps(self.printer, g)) * 1000.0  # convert to mm
         logging.debug("Bed dist: " + str(bed_dist) + " mm")
 
         self.printer.send_message(
@@ -109,6 +122,7 @@ class G30(GCodeCommand):
                 "  D = sets the probe length (mm), or taken from config if nothing is specified. \n"
                 "  F = sets the probe speed. If not present, it's taken from the config. \n"
                 "  Q = sets the probe acceleration. If not present, it's taken from the config. \n"
+                "  A = sets the number of taps. If not present, it's taken from the config. \n"
                 "  P = the point at which to probe, previously set by M557. \n"
                 "  S = save the probed point distance\n"
                 "P and S save the probed bed distance to a list that corresponds with point P")
@@ -182,7 +196,8 @@ class G30_1(GCodeCommand):
         self.printer.processor.execute(G0)
         self.printer.path_planner.wait_until_done()
         bed_dist = self.printer.path_planner.probe(
-            probe_length, probe_speed, probe_accel) * 1000.0  # convert to mm
+            probe_length, probe_speed, probe_accel,
+            **_probe_taps(self.printer, g)) * 1000.0  # convert to mm
 
         # calculated required offset to make bed equal to Z0 or user's specified Z.
         # should be correct, assuming probe starts at Z(5), requested Z(0)  probe Z(-0.3), adjusted global Z should be 5.3
@@ -215,7 +230,8 @@ class G30_1(GCodeCommand):
                 "Z = sets the requested Z height at bed level, if not present, set to 0. \n"
                 "D = sets the probe length, or taken from config if nothing is specified. \n"
                 "F = sets the probe speed. If not present, it's taken from the config. \n"
-                "Q = sets the probe acceleration. If not present, it's taken from the config. \n")
+                "Q = sets the probe acceleration. If not present, it's taken from the config. \n"
+                "A = sets the number of taps. If not present, it's taken from the config. \n")
 
     def is_buffered(self):
         return True
@@ -7,9 +7,58 @@ Website: http://www.xwaves.net
 License: CC BY-SA: http://creativecommons.org/licenses/by-sa/2.0/
 """
 
+import os
+import json
+import hashlib
+import logging
+from threading import Lock
 from abc import ABCMeta, abstractmethod
-from docutils.core import publish_string
-from redeem.TextWriter import text_writer
+
+# Plain text renderings of the formatted descriptions, kept next to the handlers
+DESCRIPTION_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "descriptions.json")
+
+_descriptions = None
+_descriptions_lock = Lock()
+
+
+def _redeem_version():
+    try:
+        from redeem._version import __version__
+    except ImportError:
+        from _version import __version__
+    return __version__
+
+
+def render_description(rst):
+    """ Plain text of the restructured text rst. docutils renders each text
+    once per Redeem version, after that it comes from the cache. """
+    global _descriptions
+    key = hashlib.sha1(rst.encode("utf-8") if isinstance(rst, unicode) else rst).hexdigest()
+
+    with _descriptions_lock:
+        if _descriptions is None:
+            _descriptions = {}
+            try:
+                with open(DESCRIPTION_CACHE) as f:
+                    cached = json.load(f)
+                if cached["version"] == _redeem_version():
+                    _descriptions = dict((k, v.encode("utf-8")) for k, v in cached["texts"].items())
+            except (IOError, ValueError, KeyError, TypeError):
+                pass
+
+        if key not in _descriptions:
+            # docutils is slow to import and only needed for help
+            from docutils.core import publish_string
+            from redeem.TextWriter import text_writer
+            _descriptions[key] = publish_string(rst, writer=text_writer)
+            try:
+                with open(DESCRIPTION_CACHE + ".tmp", "w") as f:
+                    json.dump({"version": _redeem_version(), "texts": _descriptions}, f)
+                os.rename(DESCRIPTION_CACHE + ".tmp", DESCRIPTION_CACHE)
+            except (IOError, OSError) as e:
+                logging.debug("Could not cache the G-code descriptions: " + str(e))
+
+        return _descriptions[key]
 
 
 class GCodeCommand(object):
@@ -30,7 +79,7 @@ class GCodeCommand(object):
         """Override method to provide long description as text."""
         # Return formatted description as plain text
         if self.get_formatted_description():
-            return publish_string(self.get_formatted_description(), writer=text_writer)
+            return render_description(self.get_formatted_description())
         # If subclass doesn't override, return standard description
         return self.get_description()
 
@@ -51,6 +100,16 @@ class GCodeCommand(object):
         """ Return true if the command executes asynchronously (such as a movement command that queues in the native path planner) """
         return False
 
+    def is_timed(self):
+        """ Return true if the command may ride along with the queued moves and run when the
+        moves before it are done, instead of forcing the command queues to synchronize """
+        return False
+
+    def is_realtime(self):
+        """ Return true if the command is executed by the I/O thread as soon as it is received,
+        ahead of everything queued. Only for short commands that are safe to run from any thread """
+        return False
+
     def __str__(self):
         """ The class name of the gcode """
         return type(self).__name__
@@ -46,3 +46,6 @@ class M104(GCodeCommand):
 
     def is_buffered(self):
         return True
+
+    def is_timed(self):
+        return True
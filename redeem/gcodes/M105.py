@@ -60,3 +60,6 @@ class M105(GCodeCommand):
 
     def is_buffered(self):
         return False
+
+    def is_realtime(self):
+        return True
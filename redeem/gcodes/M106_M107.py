@@ -45,6 +45,9 @@ class M106(GCodeCommand):
     def is_buffered(self):
         return True
 
+    def is_timed(self):
+        return True
+
 
 class M107(GCodeCommand):
 
@@ -69,3 +72,6 @@ class M107(GCodeCommand):
 
     def is_buffered(self):
         return True
+
+    def is_timed(self):
+        return True
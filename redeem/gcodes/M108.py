@@ -22,3 +22,6 @@ class M108(GCodeCommand):
         
     def is_buffered(self):
         return True
+
+    def is_realtime(self):
+        return True
@@ -22,3 +22,6 @@ class M112(GCodeCommand):
 
     def is_buffered(self):
         return False
+
+    def is_realtime(self):
+        return True
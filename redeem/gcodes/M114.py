@@ -33,6 +33,9 @@ class M114(GCodeCommand):
             "The returned value is in millimeters.\n"
             "M = Return the position seen with the bed matix enabled " )
 
+    def is_realtime(self):
+        return True
+
     def get_test_gcodes(self):
         return ["M114"]
 
@@ -0,0 +1,48 @@
+"""
+GCode M122
+Report how full the command lanes and reply queues get
+
+License: CC BY-SA: http://creativecommons.org/licenses/by-sa/2.0/
+"""
+from __future__ import absolute_import
+
+from .GCodeCommand import GCodeCommand
+
+
+class M122(GCodeCommand):
+
+    def execute(self, g):
+        stats = self.printer.scheduler.get_stats()
+        for name in sorted(stats):
+            lane = stats[name]
+            self.printer.send_message(
+                g.prot, "{}: {}/{} queued, high water {}, {} run ({:.1f}/s), "
+                "blocked {} times for {:.0f} ms".format(
+                    name, lane["queued"], lane["depth"], lane["high_water"],
+                    lane["executed"], lane["per_second"], lane["blocked"], lane["blocked_ms"]))
+        stats = self.printer.reactor.get_stats()
+        for prot in sorted(stats):
+            channel = stats[prot]
+            self.printer.send_message(
+                g.prot, "{}: {} replies in {} writes, {} dropped, {} bytes queued".format(
+                    prot, channel["messages"], channel["writes"], channel["dropped"],
+                    channel["queued"]))
+        if g.has_letter("R"):
+            self.printer.scheduler.reset_stats()
+            self.printer.reactor.reset_stats()
+
+    def get_description(self):
+        return "Report how full the command lanes and reply queues get"
+
+    def get_long_description(self):
+        return ("Shows for each command lane how many G-codes are queued out of its depth, "
+                "the most there have been, how many ran and how fast, and how often and "
+                "for how long the host had to wait for space. R resets the counters.\n"
+                "The depths are set with [System] motion_queue_depth, buffered_queue_depth "
+                "and unbuffered_queue_depth.\n"
+                "Then, for each host channel, how many replies were queued and in how "
+                "many writes they went out, how many were dropped because the host "
+                "wasn't reading, and how many bytes are waiting.")
+
+    def is_realtime(self):
+        return True
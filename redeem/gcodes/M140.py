@@ -25,3 +25,6 @@ class M140(GCodeCommand):
 
     def is_buffered(self):
         return True
+
+    def is_timed(self):
+        return True
@@ -16,10 +16,10 @@ class M201(GCodeCommand):
 
     def execute(self, g):
 
-        t=[]
-        for i, axis in enumerate(self.printer.AXES):
+        t = list(self.printer.acceleration)
+        for i, axis in enumerate(self.printer.AXES[:self.printer.num_axes]):
             if g.has_letter(axis):
-                t.append(round(g.get_distance_by_letter(axis) / 3600.0, 4))
+                t[i] = round(g.get_distance_by_letter(axis) / 3600.0, 4)
 
         if self.printer.axis_config == self.printer.AXIS_CONFIG_CORE_XY or self.printer.axis_config == self.printer.AXIS_CONFIG_H_BELT:
             # x and y should have same accelerations for lines to be straight
@@ -30,8 +30,9 @@ class M201(GCodeCommand):
             t[2] = t[0]
             
         logging.debug("M201: acceleration = "+str(t))
-            
-        self.printer.path_planner.native_planner.setAcceleration(t)
+
+        self.printer.acceleration = t
+        self.printer.path_planner.reconfigure()
 
     def get_description(self):
         return "Set print acceleration"
@@ -49,6 +50,6 @@ In all cases, axes H, A, B and C remain independant.
 """)
 
     def is_buffered(self):
-        return False
+        return True
     
  
@@ -17,6 +17,8 @@ class M220(GCodeCommand):
 
     def execute(self, g):
         self.printer.speed_factor = g.get_float_by_letter("S", 100) / 100
+        # Applied by the native planner as moves are sent, queued ones included
+        self.printer.path_planner.native_planner.setSpeedFactor(self.printer.speed_factor)
         logging.debug("M220 speed factor " + str(self.printer.speed_factor))
 
     def get_description(self):
@@ -45,3 +45,6 @@ class M280(GCodeCommand):
 
     def get_long_description(self):
         return "Set servo position. Use 'S' to specify angle, use 'P' to specify index, use F to specify speed. "
+
+    def is_timed(self):
+        return True
@@ -16,6 +16,8 @@ class M290(GCodeCommand):
         if g.has_letter("S"): # Amount in mm
             offset_z = g.get_float_by_letter("S")
             self.printer.offset_z += (offset_z/1000.0)
+            # Step the queued moves as well, add_path takes care of new ones
+            self.printer.path_planner.native_planner.queueBabystep(offset_z/1000.0)
         else:
             g.set_answer("ok Current Babystep offset: {} mm".format(self.printer.offset_z*1000.0))
 
@@ -26,7 +28,8 @@ class M290(GCodeCommand):
         return ("Baby stepping. This command tells the printer to apply the specified "
                 "additional offset to the Z coordinate for all future moves, "
                 "and to apply the offset to moves that have already been "
-                "queued if this case be done. Baby stepping is cumulative, "
+                "queued. The steps are sent with the next move that does not "
+                "move Z (or any tower on a delta). Baby stepping is cumulative, "
                 "for example after M290 S0.1 followed by M290 S-0.02, "
                 "an offset of 0.08mm is used.\n"
                 "M290 with no parameters reports the accumulated baby stepping offset.\n"
@@ -13,7 +13,7 @@ M2x commands:
 - M25: Pause SD print
 - M26: Set SD position
 - M27: Report SD print status
-- M28: TODO
+- M28: Upload a file to local storage
 - M29: TODO
 
 mount uses auto. if this doen't work, use parted library to determine format type
@@ -39,6 +39,7 @@ from time import sleep
 
 from GCodeCommand import GCodeCommand
 from redeem.Gcode import Gcode
+from redeem.Upload import Upload
 
 # device_location = '/dev/mmcblk1p1'
 USB_DEVICE_LOCATION = '/dev/sda1'
@@ -359,6 +360,9 @@ class M25(GCodeCommand):
 
     def is_buffered(self):
         return False
+
+    def is_realtime(self):
+        return True
         
 class M26(M2X):
 
@@ -419,6 +423,9 @@ class M27(M2X):
     def get_description(self):
         return """Report external file print status"""
 
+    def is_realtime(self):
+        return True
+
     def get_formatted_description(self):
         return """If printing from an externally selected file (from ``M23``), display of how many bytes
 from the active file have been processed.
@@ -431,21 +438,71 @@ from the active file have been processed.
 """
 
 
-#class M28(M2X):
-#
-#    def execute(self, g):
-#        self.printer.send_message(g.prot, "M28 not implemented")
-#        self.printer.send_message(g.prot, "use M20 instead to list local files as sd files")
-#        self.printer.send_message(g.prot, "if you used the 'Upload to SD' button in OctoPrint you will now need to disconnect/reconnect Redeem because Octoprint is being dumb")
-#        
-#        # Octoprint expects 'Writing to file' but we don't want that
-#
-#    def get_description(self):
-#        return "Placeholder for write to SD card, use M20 instead"
-#        
-#    def get_formatted_description(self):
-#        return """Placeholder for write to SD card, use M20 instead"""
-#        
+class M28(M2X):
+
+    def start_upload(self, g):
+        """ Called by the channel as soon as it reads g, as the file follows right
+        after it. Returns the Upload to hand the file to, None if there is none. """
+        words = g.get_message().split()[1:]
+        fn = words[0] if words and words[0].startswith('/') else None
+        values = dict((w[0].upper(), w[1:]) for w in words[1:] if len(w) > 1)
+        try:
+            size = int(values["S"])
+            crc = int(values["C"], 16)
+        except (KeyError, ValueError):
+            self.printer.send_message(g.prot, "Error: M28 needs the size as S<bytes> "
+                                              "and the CRC32 as C<hex>")
+            return None
+
+        if not fn or not fn.startswith('/lcl/') or '..' in fn.split('/') or size < 0:
+            self.printer.send_message(g.prot, "Error: can only upload to /lcl/<file name>")
+            return None
+        path = fn.replace('/lcl', LCL_MOUNT_LOCATION, 1)
+
+        def done(error):
+            if error:
+                self.printer.send_message(g.prot, "Error: upload of {} failed: {}".format(fn, error))
+            else:
+                self.printer.send_message(g.prot, "Done saving file")
+
+        try:
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            upload = Upload(path, size, crc, done)
+        except OSError as e:
+            self.printer.send_message(g.prot, "Error: could not write '{}': {}".format(fn, e))
+            return None
+        # Sent now rather than once g is executed, which can be after the upload is done
+        self.printer.send_message(g.prot, "Writing to file: {}".format(path))
+        return upload
+
+    def execute(self, g):
+        if not hasattr(g, "upload"):
+            self.printer.send_message(g.prot, "Error: files can only be uploaded over Ethernet")
+
+    def get_description(self):
+        return "Upload a file to local storage"
+
+    def get_formatted_description(self):
+        return """Upload a file over Ethernet to local storage, to print it with ``M23`` and
+``M24`` without the host. The file follows the line right away, as its exact
+number of bytes:
+
+    S = size in bytes
+    C = CRC32 of the file, in hex
+
+::
+
+    > M28 /lcl/part.gcode S123456 C1a2b3c4d
+    Writing to file: /usr/share/models/part.gcode
+    <the 123456 bytes of the file>
+    Done saving file
+
+The file is written in large chunks and synced, and only takes its name once
+all of it arrived with the right CRC32.
+"""
+
+
 #class M29(M2X):
 #
 #    def execute(self, g):
@@ -11,7 +11,6 @@ from __future__ import absolute_import
 
 from .GCodeCommand import GCodeCommand
 import logging
-import threading
 
 
 class M400(GCodeCommand):
@@ -20,14 +19,11 @@ class M400(GCodeCommand):
         logging.info("M400 starting")
         # This needs to be a standard method somewhere
         # No blocking of the PRU, (notification only)
-        if not self.printer.path_planner.queue_sync_event(False):
+        if not self.printer.scheduler.queue_sync_event(g):
             logging.info(
                 "M400 failed to queue a sync event - waiting until done instead")
             # The move buffer is already empty! fallback to this to ensure we're in sync.
             self.printer.path_planner.wait_until_done()
-            self.printer.sync_commands.get()
-            # We should be at the front of the line.
-            self.printer.sync_commands.task_done()
         logging.info("M400 complete")
 
     def on_sync(self, g):
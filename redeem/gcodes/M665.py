@@ -23,8 +23,7 @@ class M665(GCodeCommand):
             if g.has_letter("R"):
                 Delta.r = g.get_float_by_letter("R")
                 
-            self.printer.path_planner.native_planner.delta_bot.setMainDimensions(Delta.L, Delta.r)
-            # self.printer.path_planner.native_planner.delta_bot.recalculate()
+            self.printer.path_planner.reconfigure()
 
     def get_description(self):
         return "Set delta arm calibration values"
@@ -37,4 +36,5 @@ class M665(GCodeCommand):
                 "If the measured points are too convex, "
                 "try increasing the radius")
 
-
+    def is_buffered(self):
+        return True
@@ -19,6 +19,7 @@ class M81(GCodeCommand):
         if g.has_letter("P"):         
             g.answer = None   # Prevent reply
             self.printer.redeem.running = False
+            self.printer.scheduler.stop()
             self.printer.path_planner.queue_sync_event(True)
         elif g.has_letter("R"):
             g.answer = None   # Prevent reply
@@ -16,14 +16,12 @@ from .GCodeCommand import GCodeCommand
 class M909(GCodeCommand):
 
     def execute(self, g):
-        self.printer.path_planner.wait_until_done()
-        
         for axis in self.printer.AXES:
             if g.has_letter(axis) and g.has_letter_value(axis):
                 val = g.get_int_by_letter(axis)
                 if val >= 0 and val <= 7:
                     self.printer.steppers[axis].set_microstepping(val)
-        self.printer.path_planner.update_steps_pr_meter()
+        self.printer.path_planner.reconfigure()
         logging.debug("Updated steps pr meter to %s", self.printer.steps_pr_meter)
 
     def get_description(self):
@@ -27,7 +27,10 @@ class M92(GCodeCommand):
                 self.printer.steps_pr_meter[i] = self.printer.steppers[axis].get_steps_pr_meter()
             else: 
                 logging.error('Steps per milimeter must be grater than zero.')
-        self.printer.path_planner.restart()
+        self.printer.path_planner.reconfigure()
 
     def get_description(self):
         return "Set number of steps per millimeters for each steppers"
+
+    def is_buffered(self):
+        return True
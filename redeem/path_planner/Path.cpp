@@ -78,24 +78,32 @@ void Path::zero() {
   joinFlags = 0;
   flags = 0;
   maxJunctionSpeed = 0;
+  speedFactor = 1.0;
 
   distance = 0;
   moveMask = 0;
   timeInTicks = 0;
   speeds.zero();
   fullSpeed = 0;
+  maxSpeed = 0;
   startSpeed = 0;
   endSpeed = 0;
   minSpeed = 0;
   accel = 0;
   startMachinePos.zero();
 
+  machineEndPos.zero();
+  stepsPerM.zero();
+  idealTimeForMove = 0;
+  axisConfig = AXIS_CONFIG_XY;
+  delta = nullptr;
+
   stepperPath.zero();
 
+  // keep the capacity, buffers are recycled through the planner's StepBufferPool
   for (auto& stepVector : steps)
   {
-    std::vector<Step> empty;
-    stepVector.swap(empty);
+    stepVector.clear();
   }
 }
 
@@ -112,18 +120,26 @@ Path& Path::operator=(const Path& path) {
   joinFlags = path.joinFlags;
   flags = path.flags.load();
   maxJunctionSpeed = path.maxJunctionSpeed;
+  speedFactor = path.speedFactor;
 
   distance = path.distance;
   moveMask = path.moveMask;
   timeInTicks = path.timeInTicks;
   speeds = path.speeds;
   fullSpeed = path.fullSpeed;
+  maxSpeed = path.maxSpeed;
   startSpeed = path.startSpeed;
   endSpeed = path.endSpeed;
   minSpeed = path.minSpeed;
   accel = path.accel;
   startMachinePos = path.startMachinePos;
 
+  machineEndPos = path.machineEndPos;
+  stepsPerM = path.stepsPerM;
+  idealTimeForMove = path.idealTimeForMove;
+  axisConfig = path.axisConfig;
+  delta = path.delta;
+
   stepperPath = path.stepperPath;
   steps = path.steps;
 
@@ -135,18 +151,26 @@ Path& Path::operator=(Path&& path) {
   joinFlags = path.joinFlags;
   flags = path.flags.load();
   maxJunctionSpeed = path.maxJunctionSpeed;
+  speedFactor = path.speedFactor;
 
   distance = path.distance;
   moveMask = path.moveMask;
   timeInTicks = path.timeInTicks;
   speeds = path.speeds;
   fullSpeed = path.fullSpeed;
+  maxSpeed = path.maxSpeed;
   startSpeed = path.startSpeed;
   endSpeed = path.endSpeed;
   minSpeed = path.minSpeed;
   accel = path.accel;
   startMachinePos = path.startMachinePos;
 
+  machineEndPos = path.machineEndPos;
+  stepsPerM = path.stepsPerM;
+  idealTimeForMove = path.idealTimeForMove;
+  axisConfig = path.axisConfig;
+  delta = path.delta;
+
   stepperPath = path.stepperPath;
   steps = std::move(path.steps);
 
@@ -233,10 +257,11 @@ void Path::initialize(const IntVectorN& machineStart,
   }
 
   // Now figure out if we can honor the user's requested speed.
-  fullSpeed = std::min(requestedSpeed, calculateMaximumSpeed(worldMove, maxSpeeds, distance, axisConfig));
+  maxSpeed = calculateMaximumSpeed(worldMove, maxSpeeds, distance, axisConfig);
+  fullSpeed = std::min(requestedSpeed, maxSpeed);
   assert(!std::isnan(fullSpeed));
 
-  const FLOAT_T idealTimeForMove = distance / fullSpeed; // m / (m/s) = s
+  idealTimeForMove = distance / fullSpeed; // m / (m/s) = s
   timeInTicks = F_CPU * idealTimeForMove; // ticks / s * s = ticks
 
   for (int i = 0; i < NUM_AXES; i++) {
@@ -264,32 +289,79 @@ void Path::initialize(const IntVectorN& machineStart,
 
   LOG("ideal move should be " << fullSpeed << " m/s and cover " << distance << " m in " << idealTimeForMove << " seconds" << std::endl);
 
+  machineEndPos = machineEnd;
+  this->stepsPerM = stepsPerM;
+  this->axisConfig = axisConfig;
+  this->delta = &delta;
+
+  if ((isAxisMove(E_AXIS) && !isAxisOnlyMove(E_AXIS)) || (isAxisMove(H_AXIS) && !isAxisOnlyMove(H_AXIS))) {
+    flags |= FLAG_USE_PRESSURE_ADVANCE;
+  }
+
+  LOG("Distance in m:     " << distance << std::endl);
+  LOG("Speed in m/s:      " << fullSpeed << " requested: " << requestedSpeed << std::endl);
+  LOG("Accel in m/s:     " << accel << " requested: " << requestedAccel << std::endl);
+  LOG("Ticks :            " << timeInTicks << std::endl);
+
+  invalidateStepperPathParameters();
+}
+
+void Path::calculateSteps() {
   switch (axisConfig)
   {
   case AXIS_CONFIG_DELTA:
-    delta.calculateMove(machineStart.toIntVector3(), machineEnd.toIntVector3(), stepsPerM.toVector3(), idealTimeForMove, steps);
+    delta->calculateMove(startMachinePos.toIntVector3(), machineEndPos.toIntVector3(), stepsPerM.toVector3(), idealTimeForMove, steps);
     break;
   case AXIS_CONFIG_XY:
   case AXIS_CONFIG_H_BELT:
   case AXIS_CONFIG_CORE_XY:
-    calculateXYMove(machineStart.toIntVector3(), machineEnd.toIntVector3(), stepsPerM.toVector3(), idealTimeForMove, steps);
+    calculateXYMove(startMachinePos.toIntVector3(), machineEndPos.toIntVector3(), stepsPerM.toVector3(), idealTimeForMove, steps);
     break;
   default:
     assert(0);
   }
 
-  calculateExtruderMove(machineStart, machineEnd, idealTimeForMove, steps);
+  calculateExtruderMove(startMachinePos, machineEndPos, idealTimeForMove, steps);
 
   assert(!steps.empty());
 
-  if ((isAxisMove(E_AXIS) && !isAxisOnlyMove(E_AXIS)) || (isAxisMove(H_AXIS) && !isAxisOnlyMove(H_AXIS))) {
-    flags |= FLAG_USE_PRESSURE_ADVANCE;
+#ifndef NDEBUG
+  // sanity check - the steps have to add up to the move
+  IntVectorN realDeltas;
+
+  for (const auto& axisSteps : steps)
+  {
+    FLOAT_T lastTime = 0;
+    for (const auto& step : axisSteps)
+    {
+      realDeltas[step.axis] += step.direction ? 1 : -1;
+      assert(step.time > lastTime);
+      lastTime = step.time;
+    }
   }
 
-  LOG("Distance in m:     " << distance << std::endl);
-  LOG("Speed in m/s:      " << fullSpeed << " requested: " << requestedSpeed << std::endl);
-  LOG("Accel in m/s:     " << accel << " requested: " << requestedAccel << std::endl);
-  LOG("Ticks :            " << timeInTicks << std::endl);
+  for (int i = 0; i < NUM_AXES; i++)
+  {
+    if (startMachinePos[i] + realDeltas[i] != machineEndPos[i])
+    {
+      LOG("step count sanity check failed on axis " << i << " because " << startMachinePos[i] << " + " << realDeltas[i] << " != " << machineEndPos[i] << std::endl);
+      assert(0);
+    }
+  }
+#endif
+}
+
+void Path::applySpeedFactor(FLOAT_T factor, FLOAT_T previousEndSpeed) {
+  const FLOAT_T plannedEndSpeed = endSpeed;
+  const FLOAT_T accelDistance2 = getAccelerationDistance2();
+
+  speedFactor = factor;
+  startSpeed = std::min(startSpeed, previousEndSpeed);
+
+  FLOAT_T newEndSpeed = std::min(plannedEndSpeed, std::min(fullSpeed * factor, maxSpeed));
+  newEndSpeed = std::max(newEndSpeed, std::sqrt(std::max((FLOAT_T)0, startSpeed * startSpeed - accelDistance2)));
+  newEndSpeed = std::min(newEndSpeed, std::sqrt(startSpeed * startSpeed + accelDistance2));
+  endSpeed = std::min(newEndSpeed, plannedEndSpeed);
 
   invalidateStepperPathParameters();
 }
@@ -314,10 +386,7 @@ FLOAT_T Path::runFinalStepCalculations()
 
   for (auto& axisSteps : steps)
   {
-    for (auto& step : axisSteps)
-    {
-      step.time = stepperPath.dilateTime(step.time);
-    }
+    stepperPath.dilateSteps(axisSteps);
   }
 
   LOG("accelSteps: " << stepperPath.accelSteps
@@ -336,10 +405,11 @@ void Path::updateStepperPathParameters() {
   if (areParameterUpToDate())
     return;
 
-  FLOAT_T cruiseSpeed = fullSpeed;
+  // The step times are based on fullSpeed, dilateTime maps them onto the scaled cruise speed.
+  FLOAT_T cruiseSpeed = std::max(std::min(fullSpeed * speedFactor, maxSpeed), std::max(startSpeed, endSpeed));
 
-  FLOAT_T accelTime = (fullSpeed - startSpeed) / accel;
-  FLOAT_T decelTime = (fullSpeed - endSpeed) / accel;
+  FLOAT_T accelTime = (cruiseSpeed - startSpeed) / accel;
+  FLOAT_T decelTime = (cruiseSpeed - endSpeed) / accel;
 
   FLOAT_T accelDistance = (cruiseSpeed * cruiseSpeed - startSpeed * startSpeed) / (2.0 * accel);
   FLOAT_T decelDistance = (cruiseSpeed * cruiseSpeed - endSpeed * endSpeed) / (2.0 * accel);
@@ -423,12 +493,21 @@ void Path::updateStepperPathParameters() {
   assert(accelDistance >= 0 && cruiseDistance >= 0 && decelDistance >= 0);
   assert(std::abs(distance - (accelDistance + cruiseDistance + decelDistance)) < NEGLIGIBLE_ERROR);
 
-  stepperPath.baseSpeed = fullSpeed;
-  stepperPath.startSpeed = startSpeed;
-  stepperPath.cruiseSpeed = cruiseSpeed;
-  stepperPath.endSpeed = endSpeed;
-  stepperPath.accel = accel;
-  stepperPath.distance = distance;
+  stepperPath.calculate(fullSpeed, startSpeed, cruiseSpeed, endSpeed, accel, distance);
+
+  joinFlags |= FLAG_JOIN_STEPPARAMS_COMPUTED;
+
+  assert(areParameterUpToDate());
+}
+
+void StepperPathParameters::calculate(FLOAT_T baseSpeed, FLOAT_T startSpeed, FLOAT_T cruiseSpeed, FLOAT_T endSpeed, FLOAT_T accel, FLOAT_T distance)
+{
+  this->baseSpeed = baseSpeed;
+  this->startSpeed = startSpeed;
+  this->cruiseSpeed = cruiseSpeed;
+  this->endSpeed = endSpeed;
+  this->accel = accel;
+  this->distance = distance;
 
   const FLOAT_T& Vi = startSpeed;
   const FLOAT_T& Vc = cruiseSpeed;
@@ -440,15 +519,122 @@ void Path::updateStepperPathParameters() {
   const FLOAT_T Vc2 = Vc * Vc;
   const FLOAT_T Vf2 = Vf * Vf;
 
-  stepperPath.baseAccelEnd = (-(Vi2 - Vc2)) / (2 * A*Vc);
-  stepperPath.baseCruiseEnd = (Vf2 - Vc2 + 2 * A*D) / (2 * A*Vc);
-  stepperPath.baseMoveEnd = D / Vc;
+  baseAccelEnd = (-(Vi2 - Vc2)) / (2 * A*Vc);
+  baseCruiseEnd = (Vf2 - Vc2 + 2 * A*D) / (2 * A*Vc);
+  baseMoveEnd = D / Vc;
 
-  stepperPath.moveEnd = (Vi2 - 2 * Vc*Vi + Vf2 - 2 * Vc*Vf + 2 * Vc2 + 2 * A*D) / (2 * A*Vc);
+  moveEnd = (Vi2 - 2 * Vc*Vi + Vf2 - 2 * Vc*Vf + 2 * Vc2 + 2 * A*D) / (2 * A*Vc);
 
-  joinFlags |= FLAG_JOIN_STEPPARAMS_COMPUTED;
+  // The ramps in dilateTime are t = (sqrt(2*A*Vc*tb + Vi^2) - Vi) / A for a base time tb.
+  // Scaled by U fixed-point slots per second that is sqrt(P*b + Qi^2) - Qi with b = U*tb,
+  // P = 2*U*Vc/A and Qi = U*Vi/A, so each ramp step costs an integer square root.
+  // The radicand never exceeds (U*Vc/A)^2, which decides how many bits are left over
+  // for the fraction of b and P.
+  const FLOAT_T unitsPerSecond = F_CPU_FLOAT / MINIMUM_STEP_INTERVAL * (1 << STEP_SLOT_FRACTION_BITS);
+  const FLOAT_T peakRoot = unitsPerSecond * Vc / A;
+  const int headroom = A > 0 && Vc > 0 ? 62 - (int)std::ceil(std::log2(peakRoot * peakRoot + 1)) : -1;
+  const FLOAT_T P = 2 * unitsPerSecond * Vc / A;
 
-  assert(areParameterUpToDate());
+  inputShift = std::min(headroom, 8);
+  rampShift = headroom - inputShift;
+
+  integerDilation = headroom >= 0
+    && std::ldexp(P, rampShift) < std::ldexp(1.0, 62)
+    && std::ldexp(baseMoveEnd * unitsPerSecond, inputShift) < std::ldexp(1.0, 62)
+    && moveEnd * unitsPerSecond < std::ldexp(1.0, 62 - STEP_SLOT_FRACTION_BITS);
+
+  if (!integerDilation)
+  {
+    return;
+  }
+
+  inputScale = std::ldexp(unitsPerSecond * baseSpeed / cruiseSpeed, inputShift);
+  baseAccelEndFixed = std::llround(std::ldexp(baseAccelEnd * unitsPerSecond, inputShift));
+  baseCruiseEndFixed = std::llround(std::ldexp(baseCruiseEnd * unitsPerSecond, inputShift));
+  baseMoveEndFixed = std::llround(std::ldexp(baseMoveEnd * unitsPerSecond, inputShift));
+  rampFactor = std::llround(std::ldexp(P, rampShift));
+  startRoot = std::llround(unitsPerSecond * Vi / A);
+  endRoot = std::llround(unitsPerSecond * Vf / A);
+  startSquare = std::llround(std::pow(unitsPerSecond * Vi / A, 2));
+  endSquare = std::llround(std::pow(unitsPerSecond * Vf / A, 2));
+  cruiseOffset = std::llround(unitsPerSecond * (Vc - Vi) * (Vc - Vi) / (2 * A*Vc));
+  moveEndFixed = std::llround(moveEnd * unitsPerSecond);
+}
+
+// floor(sqrt(n)) by Newton's method. Consecutive steps of an axis have close roots,
+// so seeding with the previous one usually settles in a single division.
+static inline unsigned long long squareRootFrom(unsigned long long n, unsigned long long x)
+{
+  if (n < 2)
+  {
+    return n;
+  }
+
+  if (x == 0)
+  {
+    x = (unsigned long long)std::sqrt((double)n);
+  }
+
+  // one iteration from any positive seed lands at or above the root...
+  x = (x + n / x) / 2;
+
+  // ...from where the iterations decrease until they reach it. n < 2^62, so anything
+  // that doesn't fit in 32 bits is still above it.
+  while (x > 0xFFFFFFFFULL || x * x > n)
+  {
+    x = (x + n / x) / 2;
+  }
+
+  return x;
+}
+
+long long StepperPathParameters::dilateToSlots(FLOAT_T t, unsigned long long& root) const
+{
+  assert(integerDilation);
+  assert(t >= 0);
+
+  const long long b = std::llround(t * inputScale);
+  const int shift = rampShift + inputShift;
+
+  if (b < baseAccelEndFixed)
+  {
+    accelSteps++;
+    root = squareRootFrom(((rampFactor * b) >> shift) + startSquare, root);
+    return (long long)root - startRoot;
+  }
+  else if (b < baseCruiseEndFixed)
+  {
+    cruiseSteps++;
+    return ((b + ((1LL << inputShift) >> 1)) >> inputShift) + cruiseOffset;
+  }
+  else
+  {
+    decelSteps++;
+    const long long remaining = std::max(0LL, baseMoveEndFixed - b);
+    root = squareRootFrom(((rampFactor * remaining) >> shift) + endSquare, root);
+    return moveEndFixed - ((long long)root - endRoot);
+  }
+}
+
+void StepperPathParameters::dilateSteps(std::vector<Step>& steps) const
+{
+  if (!integerDilation)
+  {
+    for (auto& step : steps)
+    {
+      step.slot = secondsToStepSlot(dilateTime(step.time));
+    }
+    return;
+  }
+
+  const long long half = 1LL << (STEP_SLOT_FRACTION_BITS - 1);
+  unsigned long long root = 0;
+
+  for (auto& step : steps)
+  {
+    const long long fixed = std::max(0LL, dilateToSlots(step.time, root));
+    step.slot = (uint32_t)((fixed + half) >> STEP_SLOT_FRACTION_BITS);
+  }
 }
 
 FLOAT_T StepperPathParameters::dilateTime(FLOAT_T t) const
@@ -498,3 +684,11 @@ FLOAT_T StepperPathParameters::finalTime() const
 {
   return moveEnd;
 }
+
+FLOAT_T StepperPathParameters::speedAt(FLOAT_T t) const
+{
+  const FLOAT_T accelerating = startSpeed + accel * t;
+  const FLOAT_T decelerating = endSpeed + accel * (moveEnd - t);
+
+  return std::max((FLOAT_T)0, std::min(cruiseSpeed, std::min(accelerating, decelerating)));
+}
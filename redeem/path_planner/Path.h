@@ -30,10 +30,12 @@
 #include <stdint.h>
 #include <stddef.h>
 #include <assert.h>
+#include <cmath>
 #include <atomic>
 #include <vector>
 #include <string>
 #include <array>
+#include <algorithm>
 #include <vector>
 #include "config.h"
 #include "StepperCommand.h"
@@ -48,6 +50,7 @@
 #define FLAG_SYNC_WAIT             (1 << 6)
 #define FLAG_USE_PRESSURE_ADVANCE  (1 << 7)
 #define FLAG_PROBE                 (1 << 8)
+#define FLAG_STEPS_PENDING         (1 << 9)
 
 /** Are the step parameter computed */
 #define FLAG_JOIN_STEPPARAMS_COMPUTED (1 << 0)
@@ -74,15 +77,25 @@
 #endif
 #endif
 
+// Fraction bits of the fixed-point step times used while dilating steps into PRU slots
+#define STEP_SLOT_FRACTION_BITS 8
+
 class Delta;
 
+/// Convert a time in seconds to a PRU slot (a multiple of MINIMUM_STEP_INTERVAL ticks)
+inline uint32_t secondsToStepSlot(FLOAT_T seconds) {
+  return (uint32_t)std::llround(seconds * (F_CPU_FLOAT / MINIMUM_STEP_INTERVAL));
+}
+
 struct Step {
   FLOAT_T time;
+  uint32_t slot; // time in MINIMUM_STEP_INTERVAL units, set by Path::runFinalStepCalculations
   unsigned char axis;
   bool direction;
 
   Step(FLOAT_T time, unsigned char axis, bool direction)
     : time(time),
+    slot(0),
     axis(axis),
     direction(direction)
   {}
@@ -110,6 +123,23 @@ struct StepperPathParameters {
   mutable unsigned long long cruiseSteps;
   mutable unsigned long long decelSteps;
 
+  // Integer form of dilateTime. Times are fixed-point slots with STEP_SLOT_FRACTION_BITS
+  // fraction bits, base times carry inputShift more bits. Set up by calculate.
+  bool integerDilation;
+  int inputShift;
+  FLOAT_T inputScale;          // base seconds to fixed-point base time
+  long long baseAccelEndFixed;
+  long long baseCruiseEndFixed;
+  long long baseMoveEndFixed;
+  unsigned long long rampFactor; // 2 * Vc / A in the squared fixed-point domain
+  int rampShift;
+  long long startRoot;          // Vi / A
+  long long endRoot;            // Vf / A
+  unsigned long long startSquare;
+  unsigned long long endSquare;
+  long long cruiseOffset;
+  long long moveEndFixed;
+
   inline void zero() {
     startSpeed = 0;
     cruiseSpeed = 0;
@@ -120,11 +150,28 @@ struct StepperPathParameters {
     accelSteps = 0;
     cruiseSteps = 0;
     decelSteps = 0;
+
+    integerDilation = false;
   }
 
+  /// Set up the trapezoid for a path whose step times were calculated at baseSpeed
+  void calculate(FLOAT_T baseSpeed, FLOAT_T startSpeed, FLOAT_T cruiseSpeed, FLOAT_T endSpeed, FLOAT_T accel, FLOAT_T distance);
+
   FLOAT_T dilateTime(FLOAT_T t) const;
 
+  /**
+   * @brief Integer counterpart of dilateTime, returning fixed-point slots
+   * @param root the previous square root on this axis, seeds the next one. Start with 0.
+   */
+  long long dilateToSlots(FLOAT_T t, unsigned long long& root) const;
+
+  /// Set the PRU slots of one axis' steps from their base times
+  void dilateSteps(std::vector<Step>& steps) const;
+
   FLOAT_T finalTime() const;
+
+  /// Planned speed in m/s at t seconds into the move
+  FLOAT_T speedAt(FLOAT_T t) const;
 };
 
 class Path {
@@ -133,6 +180,7 @@ private:
   unsigned int joinFlags;
   std::atomic_uint_fast32_t flags;
   FLOAT_T maxJunctionSpeed;       /// Max. junction speed between this and next segment
+  FLOAT_T speedFactor;            /// Live speed override applied when the move is sent
 
   // These fields are constant after initialization
   FLOAT_T distance;               /// Total distance of the move in NUM_AXIS-dimensional space in meters
@@ -140,6 +188,7 @@ private:
   unsigned long long timeInTicks; /// Time for completing a move (optimistically assuming it runs full speed the whole time)
   VectorN speeds;
   FLOAT_T fullSpeed;              /// Cruising speed in m/s
+  FLOAT_T maxSpeed;               /// Fastest the axis limits allow for this move in m/s
   FLOAT_T startSpeed;             /// Starting speed in m/s
   FLOAT_T endSpeed;               /// Exit speed in m/s
   FLOAT_T minSpeed;               /// Minimum allowable speed for the move
@@ -149,6 +198,13 @@ private:
   StepperPathParameters stepperPath;
   std::array<std::vector<Step>, NUM_AXES> steps;
 
+  // What calculateSteps needs, kept from initialize
+  IntVectorN machineEndPos;
+  VectorN stepsPerM;
+  FLOAT_T idealTimeForMove;
+  int axisConfig;
+  const Delta* delta;
+
   FLOAT_T calculateSafeSpeed(const VectorN& worldMove, const VectorN& maxSpeedJumps);
 
 public:
@@ -172,8 +228,19 @@ public:
     bool cancelable,
     bool is_probe);
 
+  /// Calculate the steps of an initialized path, possibly on another thread than initialize
+  void calculateSteps();
+
   FLOAT_T runFinalStepCalculations();
 
+  /**
+   * @brief Scale the cruise speed of a move that is about to be sent
+   * @details The start speed becomes at most previousEndSpeed, which is what the move
+   * before this one actually ended at. The end speed is never raised above what the
+   * lookahead planned, and is kept reachable within the move.
+   */
+  void applySpeedFactor(FLOAT_T factor, FLOAT_T previousEndSpeed);
+
   void zero();
 
   inline void clearJoinFlags() {
@@ -229,6 +296,18 @@ public:
     return flags & FLAG_BLOCKED;
   }
 
+  inline void markStepsPending() {
+    flags |= FLAG_STEPS_PENDING;
+  }
+
+  inline void markStepsCalculated() {
+    flags &= ~FLAG_STEPS_PENDING;
+  }
+
+  inline bool areStepsPending() {
+    return flags & FLAG_STEPS_PENDING;
+  }
+
   inline bool isCheckEndstops() {
     return flags & FLAG_CHECK_ENDSTOPS;
   }
@@ -315,6 +394,15 @@ public:
     invalidateStepperPathParameters();
   }
 
+  /// The speed the move was asked for, after the speed factor and axis limits
+  inline FLOAT_T getCommandedSpeed() {
+    return std::min(fullSpeed * speedFactor, maxSpeed);
+  }
+
+  inline const StepperPathParameters& getStepperPathParameters() {
+    return stepperPath;
+  }
+
   inline FLOAT_T getMinSpeed() {
     return minSpeed;
   }
@@ -25,8 +25,10 @@
 */
 
 #include "PathPlanner.h"
+#include "RealTime.h"
 #include "AlarmCallback.h"
 #include <cmath>
+#include <algorithm>
 #include <assert.h>
 #include <thread>
 #include <array>
@@ -42,8 +44,10 @@ PathPlanner::PathPlanner(unsigned int cacheSize, AlarmCallback& alarmCallback)
   LOGCRITICAL( "PathPlanner, loglevel " << LOGLEVEL << std::endl);
   moveCacheSize = cacheSize;
   lines.resize(moveCacheSize);
+  stepBuffers.setSize(moveCacheSize * NUM_AXES);
   printMoveBufferWait = 250;
   maxBufferedMoveTime = 6 * printMoveBufferWait;
+  speedFactor = 1.0;
   linesCount = 0;
   linesTicksCount = 0;
   stop = false;
@@ -54,6 +58,18 @@ PathPlanner::PathPlanner(unsigned int cacheSize, AlarmCallback& alarmCallback)
   state.zero();
   lastProbeDistance = 0;
   queue_move_fail = true;
+  babystepsToSend.zero();
+  babystepsToState.zero();
+  babystepTotal = 0;
+  movesQueued = 0;
+  movesSent = 0;
+  suspended = false;
+  realTimePriority = 0;
+  realTimeCpu = -1;
+  reactionCount = 0;
+  reactionSum = 0;
+  reactionSumSquares = 0;
+  reactionMax = 0;
 
   // set bed compensation matrix to identity
   matrix_bed_comp.resize(9, 0);
@@ -112,6 +128,151 @@ void PathPlanner::clearSyncEvent(){
   PyEval_RestoreThread(_save);
 }
 
+unsigned long long PathPlanner::queueTimedEvent(){
+  std::lock_guard<std::mutex> lk(timed_event_mutex);
+  const unsigned long long ticket = movesQueued;
+  TimedEvent& event = timedEvents[ticket];
+
+  if(event.pending == 0){
+    // The last queued move may already be on its way to the PRU
+    event.blocks = movesSent >= ticket ? pru.getBlocksQueued() : TIMED_EVENT_UNSENT;
+  }
+  event.pending++;
+  return ticket;
+}
+
+bool PathPlanner::waitUntilTimedEvent(unsigned long long ticket, unsigned int timeoutMs){
+  PyThreadState *_save; 
+  _save = PyEval_SaveThread();
+
+  const auto deadline = std::chrono::steady_clock::now() + std::chrono::milliseconds(timeoutMs);
+  bool done = true;
+  std::unique_lock<std::mutex> lk(timed_event_mutex);
+  auto event = timedEvents.find(ticket);
+
+  if(event != timedEvents.end()){
+    done = timedEventSent.wait_until(lk, deadline, [this, event] {
+	return event->second.blocks != TIMED_EVENT_UNSENT || stop;
+      });
+
+    if(done && !stop){
+      const unsigned long long blocks = event->second.blocks;
+      const auto remaining = std::chrono::duration_cast<std::chrono::milliseconds>(deadline - std::chrono::steady_clock::now());
+      lk.unlock();
+      done = pru.waitUntilBlocksCompleted(blocks, std::max(0, (int)remaining.count()));
+      lk.lock();
+    }
+
+    if(done && --event->second.pending == 0){
+      timedEvents.erase(event);
+    }
+  }
+
+  lk.unlock();
+  PyEval_RestoreThread(_save);
+  return done;
+}
+
+void PathPlanner::markMoveSent(){
+  std::lock_guard<std::mutex> lk(timed_event_mutex);
+  movesSent++;
+
+  auto event = timedEvents.find(movesSent);
+  if(event != timedEvents.end()){
+    event->second.blocks = pru.getBlocksQueued();
+    timedEventSent.notify_all();
+  }
+}
+
+void PathPlanner::trackSentMove(Path& move, FLOAT_T moveEndTime, unsigned long long firstBlock, std::chrono::steady_clock::time_point pushed){
+  const unsigned long long lastBlock = pru.getBlocksQueued();
+  std::lock_guard<std::mutex> lk(sent_moves_mutex);
+
+  popCompletedMoves(pru.getBlocksCompleted());
+
+  SentMove sent;
+  sent.firstBlock = firstBlock;
+  sent.lastBlock = lastBlock;
+  sent.pushed = pushed;
+  sent.started = false;
+  sent.syncWait = move.isSyncWaitEvent();
+  sent.duration = moveEndTime;
+  sent.profile = move.getStepperPathParameters();
+  sent.commandedSpeed = move.getCommandedSpeed();
+  sentMoves.push_back(sent);
+}
+
+// Called with sent_moves_mutex held
+void PathPlanner::popCompletedMoves(unsigned long long completed){
+  while(!sentMoves.empty() && sentMoves.front().lastBlock <= completed){
+    sentMoves.pop_front();
+  }
+}
+
+FLOAT_T PathPlanner::getSpeedRatio(){
+  const unsigned long long completed = pru.getBlocksCompleted();
+  const auto completedAt = pru.getBlocksCompletedTime();
+  std::lock_guard<std::mutex> lk(sent_moves_mutex);
+  const auto now = std::chrono::steady_clock::now();
+
+  popCompletedMoves(completed);
+
+  // Nothing left for the PRU (an underrun), or it is still on a move before this one
+  if(suspended || sentMoves.empty() || sentMoves.front().firstBlock > completed){
+    return 0;
+  }
+
+  SentMove& move = sentMoves.front();
+  if(!move.started){
+    // The PRU got to the move when it reported the blocks before it done
+    move.start = std::max(move.pushed, completedAt);
+    move.started = true;
+  }
+
+  const FLOAT_T t = std::chrono::duration<FLOAT_T>(now - move.start).count();
+  if(move.commandedSpeed <= 0 || (move.syncWait && t >= move.duration)){
+    return 0; // stepped out and waiting for the sync event to be cleared
+  }
+
+  return std::min((FLOAT_T)1.0, move.profile.speedAt(t) / move.commandedSpeed);
+}
+
+void PathPlanner::suspend(){
+  std::lock_guard<std::mutex> lk(sent_moves_mutex);
+  pru.suspend();
+  if(!suspended){
+    suspended = true;
+    suspendedAt = std::chrono::steady_clock::now();
+  }
+}
+
+void PathPlanner::resume(){
+  std::lock_guard<std::mutex> lk(sent_moves_mutex);
+  pru.resume();
+  if(suspended){
+    suspended = false;
+    // The move the PRU was on picks up where it stopped
+    if(!sentMoves.empty() && sentMoves.front().started){
+      sentMoves.front().start += std::chrono::steady_clock::now() - suspendedAt;
+    }
+  }
+}
+
+std::vector<unsigned long long> PathPlanner::getStepBufferStats(){
+  return stepBuffers.getStats();
+}
+
+std::vector<FLOAT_T> PathPlanner::getReactionStats(){
+  std::lock_guard<std::mutex> lk(line_mutex);
+  if (!reactionCount) {
+    return {0, 0, 0, 0};
+  }
+
+  const FLOAT_T mean = reactionSum / reactionCount;
+  const FLOAT_T variance = std::max((FLOAT_T)0, reactionSumSquares / reactionCount - mean * mean);
+  return {(FLOAT_T)reactionCount, mean * 1e6, reactionMax * 1e6, std::sqrt(variance) * 1e6};
+}
+
 void PathPlanner::queueMove(VectorN endWorldPos,
 			    FLOAT_T speed, FLOAT_T accel, 
 			    bool cancelable, bool optimize, 
@@ -131,6 +292,8 @@ void PathPlanner::queueMove(VectorN endWorldPos,
     return;
   }
 
+  applyBabystepsToState();
+
   LOG("NEW MOVE:\n");
   // for (int i = 0; i<NUM_AXES; ++i) {
   //   LOG("AXIS " << i << ": start = " << startPos[i] << "(" << state[i] << "), end = " << endPos[i] << "\n");
@@ -222,6 +385,7 @@ void PathPlanner::queueMove(VectorN endWorldPos,
   _save = PyEval_SaveThread();
 
   Path p;
+  stepBuffers.acquire(p.getSteps());
 
   p.initialize(state, tweakedEndPos, startWorldPos, endWorldPos, axisStepsPerM,
     maxSpeedJumps, maxSpeeds, maxAccelerationMPerSquareSecond,
@@ -234,32 +398,10 @@ void PathPlanner::queueMove(VectorN endWorldPos,
     return; // No steps included
   }
 
-  LOG("checking deltas...");
-  std::cout.flush();
-  {
-    IntVectorN realDeltas;
-
-    for (const auto& axisSteps : p.getSteps())
-    {
-      FLOAT_T lastTime = 0;
-      for (const auto& step : axisSteps)
-      {
-        realDeltas[step.axis] += step.direction ? 1 : -1;
-	assert(step.time > lastTime);
-	lastTime = step.time;
-      }
-    }
-
-    for (int i = 0; i < NUM_AXES; i++)
-    {
-      if (state[i] + realDeltas[i] != endPos[i])
-      {
-	LOG("step count sanity check failed on axis " << i << " because " << state[i] << " + " << realDeltas[i] << " != " << endPos[i] << std::endl);
-	assert(0);
-      }
-    }
+  // without workers the steps are calculated here, otherwise once the path has its place in the queue
+  if (!stepWorkers.getWorkers()) {
+    p.calculateSteps();
   }
-  LOG("done!" << std::endl);
 
   unsigned int linesCacheRemaining = moveCacheSize - linesCount;
   long long linesTicksRemaining = maxBufferedMoveTime - linesTicksCount;
@@ -282,6 +424,10 @@ void PathPlanner::queueMove(VectorN endWorldPos,
 
   // Now swap p into the path queue - note that we shouldn't refer to p after this because it won't contain anything useful
   qp = std::move(p);
+
+  if (stepWorkers.getWorkers()) {
+    stepWorkers.submit(qp);
+  }
   
   // capture state so we can check it after a probe
   const IntVectorN startPos = state;
@@ -304,6 +450,7 @@ void PathPlanner::queueMove(VectorN endWorldPos,
   
   updateTrapezoids();
   linesWritePos++;
+  movesQueued++;
   linesCacheRemaining--;
   linesTicksRemaining -= qp.getTimeInTicks();
 
@@ -318,6 +465,7 @@ void PathPlanner::queueMove(VectorN endWorldPos,
       std::lock_guard<std::mutex> lk(line_mutex);
       linesCount++;
       linesTicksCount += qp.getTimeInTicks();
+      linesReadyAt = std::chrono::steady_clock::now();
     }
     notifyIfPathQueueIsReadyToPrint();
   }
@@ -521,6 +669,9 @@ void PathPlanner::runThread() {
   runningThread = std::thread([this]() {
       this->run();
     });
+
+  if(realTimePriority || realTimeCpu >= 0)
+    setThreadRealTime(runningThread.native_handle(), realTimePriority, realTimeCpu);
 }
 
 void PathPlanner::stopThread(bool join) {
@@ -528,6 +679,10 @@ void PathPlanner::stopThread(bool join) {
     pru.stopThread(join);	
   stop = true;
   notifyIfPathQueueIsReadyToPrint();
+  {
+    std::lock_guard<std::mutex> lk(timed_event_mutex);
+    timedEventSent.notify_all();
+  }
 
   if(join && runningThread.joinable()) {
     runningThread.join();
@@ -561,6 +716,8 @@ void PathPlanner::reset() {
 
 void PathPlanner::run() {
   bool waitUntilFilledUp = true;
+  FLOAT_T lastEndSpeed = 0;
+  bool lastEndSpeedChanged = false;
   LOG("PathPlanner loop starting" << std::endl);
 
   const unsigned int maxCommandsPerBlock = pru.getMaxBytesPerBlock() / sizeof(SteppersCommand);
@@ -569,7 +726,16 @@ void PathPlanner::run() {
   while(!stop) {		
     std::unique_lock<std::mutex> lk(line_mutex);
     if (!isPathQueueReadyToPrint()) {
+      const auto waitStart = std::chrono::steady_clock::now();
       pathQueueReadyToPrint.wait(lk, [this] { return this->isPathQueueReadyToPrint(); });
+
+      if (linesReadyAt > waitStart) {
+	const FLOAT_T reaction = std::chrono::duration<FLOAT_T>(std::chrono::steady_clock::now() - linesReadyAt).count();
+	reactionCount++;
+	reactionSum += reaction;
+	reactionSumSquares += reaction * reaction;
+	reactionMax = std::max(reactionMax, reaction);
+      }
     }
     Path* cur = &lines[linesPos];
 
@@ -617,6 +783,17 @@ void PathPlanner::run() {
 		
     // Only enable axes that are moving. If the axis doesn't need to move then it can stay disabled depending on configuration.
     cur->fixStartAndEndSpeed();
+
+    // Apply the live speed factor, except to homing and probing moves. Once a move has been
+    // sent with a changed end speed, the next one has to start from it even if it isn't scaled.
+    const FLOAT_T factor = cur->isCancelable() ? 1.0 : (FLOAT_T)speedFactor;
+    const FLOAT_T plannedEndSpeed = cur->getEndSpeed();
+    if(factor != 1.0 || lastEndSpeedChanged){
+      cur->applySpeedFactor(factor, lastEndSpeed);
+    }
+    lastEndSpeed = cur->getEndSpeed();
+    lastEndSpeedChanged = lastEndSpeed != plannedEndSpeed;
+
     if(!cur->areParameterUpToDate()){  // should never happen, but with bad timings???
       cur->updateStepperPathParameters();
     }
@@ -638,10 +815,18 @@ void PathPlanner::run() {
     LOG("fullSpeed:    " << cur->getFullSpeed() << std::endl);
     LOG("acceleration: " << cur->getAcceleration() << std::endl);
 
+    stepWorkers.waitFor(*cur);
     const FLOAT_T moveEndTime = cur->runFinalStepCalculations();
 
+    // A cancelled move would drop the babysteps with it
+    if(!cur->isCancelable()){
+      injectBabysteps(cur->getSteps(), moveEndTime);
+    }
+
     LOG("Sending " << std::dec << linesPos << ", Start speed=" << cur->getStartSpeed() << ", end speed=" << cur->getEndSpeed() << std::endl);
 
+    const unsigned long long firstBlock = pru.getBlocksQueued();
+    const auto pushed = std::chrono::steady_clock::now();
     runMove(moveMask, cancellableMask, cur->isSyncEvent(), cur->isSyncWaitEvent(), moveEndTime, cur->getSteps(), commandBlock, maxCommandsPerBlock,
       cur->isProbeMove() ? &probeDistanceTraveled : nullptr);
 
@@ -660,6 +845,8 @@ void PathPlanner::run() {
 
     LOG( "Done sending with " << std::dec << linesPos << std::endl);
 		
+    trackSentMove(*cur, moveEndTime, firstBlock, pushed);
+    markMoveSent();
     removeCurrentLine();
     notifyIfPathQueueHasSpace();
   }
@@ -684,7 +871,7 @@ void PathPlanner::runMove(
   std::array<unsigned long long, NUM_AXES> finalStepTimes;
   std::array<size_t, NUM_AXES> stepIndex;
   size_t commandsIndex = 0;
-  std::vector<SteppersCommand> probeSteps;
+  std::array<int32_t, NUM_AXES> probeStartCounters;
   unsigned long long totalSteps = 0;
 
   finalStepTimes.fill(0);
@@ -714,6 +901,14 @@ void PathPlanner::runMove(
     }
   }
 
+  if (probeDistanceTraveled)
+  {
+    // The PRU step counters only hold still while nothing is executing, so let
+    // the previous moves finish before taking the starting reading.
+    pru.waitUntilFinished();
+    probeStartCounters = pru.getStepCounters();
+  }
+
   // reserve a command to be an opening delay with no steps
   uint32_t* lastDelay = &commands[commandsIndex].delay;
   commandsIndex++;
@@ -737,7 +932,7 @@ void PathPlanner::runMove(
 
       if (axisSteps.size() > axisStepIndex)
       {
-        stepTime = std::min(stepTime, roundStepTime(axisSteps[axisStepIndex].time));
+        stepTime = std::min(stepTime, (unsigned long long)axisSteps[axisStepIndex].slot * MINIMUM_STEP_INTERVAL);
         foundStep = true;
       }
     }
@@ -778,7 +973,7 @@ void PathPlanner::runMove(
       const auto& axisSteps = steps[i];
       const auto axisStepIndex = stepIndex[i];
 
-      if (axisSteps.size() > axisStepIndex && roundStepTime(axisSteps[axisStepIndex].time) == stepTime)
+      if (axisSteps.size() > axisStepIndex && (unsigned long long)axisSteps[axisStepIndex].slot * MINIMUM_STEP_INTERVAL == stepTime)
       {
 	const auto& step = axisSteps[axisStepIndex];
 
@@ -798,16 +993,6 @@ void PathPlanner::runMove(
     if (commandsIndex == commandsLength) {
       pru.push_block((uint8_t*)&commands[0], sizeof(SteppersCommand)*commandsIndex, sizeof(SteppersCommand), commandsIndex);
 
-      if (probeDistanceTraveled)
-      {
-	probeSteps.reserve(probeSteps.size() + commandsIndex);
-
-	for (size_t i = 0; i < commandsIndex; i++)
-	{
-	  probeSteps.push_back(commands[i]);
-	}
-      }
-
       commandsIndex = 0;
 
       for (size_t i = 0; i < commandsLength; i++) {
@@ -834,16 +1019,6 @@ void PathPlanner::runMove(
 
   if (commandsIndex != 0) {
     pru.push_block((uint8_t*)&commands[0], sizeof(SteppersCommand)*commandsIndex, sizeof(SteppersCommand), commandsIndex);
-
-    if (probeDistanceTraveled)
-    {
-      probeSteps.reserve(probeSteps.size() + commandsIndex);
-
-      for (size_t i = 0; i < commandsIndex; i++)
-      {
-	probeSteps.push_back(commands[i]);
-      }
-    }
   }
 
   {
@@ -876,24 +1051,15 @@ void PathPlanner::runMove(
   if (probeDistanceTraveled)
   {
     pru.waitUntilFinished();
-    const size_t stepsRemaining = pru.getStepsRemaining();
-    const size_t stepsTraveled = probeSteps.size() - stepsRemaining;
-
-    assert(stepsRemaining < probeSteps.size());
+    const std::array<int32_t, NUM_AXES> probeEndCounters = pru.getStepCounters();
     IntVectorN deltasTraveled;
 
-    for (size_t i = 0; i < stepsTraveled; i++)
+    for (int axis = 0; axis < NUM_AXES; axis++)
     {
-      for (int axis = 0; axis < NUM_AXES; axis++)
-      {
-	const SteppersCommand& command = probeSteps[i];
-	if (command.step & (1 << axis))
-	{
-	  deltasTraveled[axis] += (command.direction & (1 << axis)) ? 1 : -1;
-	}
-      }
+      // subtract as unsigned so a counter wrapping around still gives the right delta
+      deltasTraveled[axis] = (int32_t)((uint32_t)probeEndCounters[axis] - (uint32_t)probeStartCounters[axis]);
     }
-    
+
     *probeDistanceTraveled = deltasTraveled;
   }
 }
@@ -929,7 +1095,74 @@ VectorN PathPlanner::machineToWorld(const IntVectorN& machinePos)
 
 VectorN PathPlanner::getState()
 {
-  return machineToWorld(state);
+  std::lock_guard<std::mutex> lk(babystep_mutex);
+  return machineToWorld(state + babystepsToState);
+}
+
+void PathPlanner::queueBabystep(FLOAT_T z)
+{
+  std::lock_guard<std::mutex> lk(babystep_mutex);
+
+  // Z on cartesian machines, all the towers by the same amount on a delta
+  std::vector<int> axes;
+  for (int i = (axis_config == AXIS_CONFIG_DELTA ? X_AXIS : Z_AXIS); i <= Z_AXIS; i++)
+    axes.push_back(i);
+  if (has_slaves) {
+    for (size_t i = 0; i < master.size(); i++)
+      if (master[i] <= Z_AXIS && std::find(axes.begin(), axes.end(), master[i]) != axes.end())
+	axes.push_back(slave[i]);
+  }
+
+  for (int axis : axes) {
+    const long long steps = std::llround((babystepTotal + z) * axisStepsPerM[axis]) - std::llround(babystepTotal * axisStepsPerM[axis]);
+    babystepsToSend[axis] += steps;
+    babystepsToState[axis] += steps;
+  }
+  babystepTotal += z;
+
+  LOG("babystep " << z << " m, pending Z steps: " << babystepsToSend[Z_AXIS] << std::endl);
+}
+
+void PathPlanner::applyBabystepsToState()
+{
+  std::lock_guard<std::mutex> lk(babystep_mutex);
+  state += babystepsToState;
+  babystepsToState.zero();
+}
+
+void PathPlanner::injectBabysteps(std::array<std::vector<Step>, NUM_AXES>& steps, const FLOAT_T moveEndTime)
+{
+  std::lock_guard<std::mutex> lk(babystep_mutex);
+
+  // Only use a move that doesn't step any of the babystepped axes, so the step trains can't collide
+  bool pending = false;
+  for (int i = 0; i < NUM_AXES; i++) {
+    if (babystepsToSend[i] != 0) {
+      if (!steps[i].empty())
+	return;
+      pending = true;
+    }
+  }
+  if (!pending)
+    return;
+
+  for (int i = 0; i < NUM_AXES; i++) {
+    if (babystepsToSend[i] == 0)
+      continue;
+
+    // Step no faster than the axis may start and stop from standstill
+    const FLOAT_T interval = std::min(0.1, std::max(MINIMUM_STEP_INTERVAL / F_CPU_FLOAT, 2.0 / (maxSpeedJumps[i] * axisStepsPerM[i])));
+    const long long fits = std::max(0LL, (long long)(moveEndTime / interval) - 1);
+    const long long count = std::min(std::llabs(babystepsToSend[i]), fits);
+    const bool direction = babystepsToSend[i] > 0;
+
+    for (long long n = 1; n <= count; n++) {
+      steps[i].emplace_back(Step(n * interval, i, direction));
+      steps[i].back().slot = secondsToStepSlot(n * interval);
+    }
+
+    babystepsToSend[i] -= direction ? count : -count;
+  }
 }
 
 bool PathPlanner::getLastQueueMoveStatus()
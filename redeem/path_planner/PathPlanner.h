@@ -32,11 +32,17 @@
 #include <thread>
 #include <vector>
 #include <mutex>
+#include <map>
+#include <deque>
+#include <chrono>
+#include <climits>
 #include <string.h>
 #include <strings.h>
 #include <assert.h>
 #include "PruTimer.h"
 #include "Path.h"
+#include "StepBufferPool.h"
+#include "StepWorkerPool.h"
 #include "Delta.h"
 #include "vectorN.h"
 #include "config.h"
@@ -89,6 +95,8 @@ class PathPlanner {
   int printMoveBufferWait;
   long long maxBufferedMoveTime;
 
+  std::atomic<FLOAT_T> speedFactor;
+
   std::vector<Path> lines;
 
   inline unsigned int previousPlannerIndex(unsigned int p){
@@ -101,6 +109,7 @@ class PathPlanner {
 
   inline void removeCurrentLine(){
     linesTicksCount -= lines[linesPos].getTimeInTicks();
+    stepBuffers.release(lines[linesPos].getSteps());
     lines[linesPos].zero();
     assert(linesTicksCount >= 0);
     linesPos++;
@@ -183,6 +192,63 @@ class PathPlanner {
 
   // distance of the last bed probe movement
   FLOAT_T lastProbeDistance;
+
+  // babystepping, see queueBabystep
+  std::mutex babystep_mutex;
+  IntVectorN babystepsToSend;   // steps not yet interleaved into a move
+  IntVectorN babystepsToState;  // steps not yet added to state
+  FLOAT_T babystepTotal;        // sum of all babysteps in m, so the rounding doesn't add up
+  void applyBabystepsToState();
+  void injectBabysteps(std::array<std::vector<Step>, NUM_AXES>& steps, const FLOAT_T moveEndTime);
+
+  // timed events, see queueTimedEvent
+  struct TimedEvent {
+    unsigned long long blocks;  // PRU blocks queued once the move was sent, TIMED_EVENT_UNSENT before
+    unsigned int pending;       // events waiting on this move
+  };
+  static const unsigned long long TIMED_EVENT_UNSENT = ULLONG_MAX;
+  std::mutex timed_event_mutex;
+  std::condition_variable timedEventSent;
+  std::map<unsigned long long, TimedEvent> timedEvents; // keyed by move number
+  unsigned long long movesQueued; // lines written by queueMove
+  unsigned long long movesSent;   // lines handed to the PRU by run()
+  void markMoveSent();
+
+  // planned speed of the move the PRU is on, see getSpeedRatio
+  struct SentMove {
+    unsigned long long firstBlock;  // PRU blocks queued before the move
+    unsigned long long lastBlock;   // and after it, the move is done once that many are completed
+    std::chrono::steady_clock::time_point pushed;
+    std::chrono::steady_clock::time_point start; // when the PRU got to it, once known
+    bool started;
+    bool syncWait;                  // the PRU stops at its end until clearSyncEvent
+    FLOAT_T duration;
+    StepperPathParameters profile;
+    FLOAT_T commandedSpeed;
+  };
+  std::mutex sent_moves_mutex;
+  std::deque<SentMove> sentMoves;
+  bool suspended;
+  std::chrono::steady_clock::time_point suspendedAt;
+  void popCompletedMoves(unsigned long long completed);
+
+  // step storage handed from retired moves to new ones
+  StepBufferPool stepBuffers;
+
+  // calculates the steps of queued moves, declared after lines so it stops before they go
+  StepWorkerPool stepWorkers;
+
+  // real-time scheduling of the run thread, see setRealTime
+  int realTimePriority;
+  int realTimeCpu;
+
+  // how long run() takes to start once moves are ready, in seconds. Guarded by line_mutex.
+  std::chrono::steady_clock::time_point linesReadyAt;
+  unsigned long long reactionCount;
+  FLOAT_T reactionSum;
+  FLOAT_T reactionSumSquares;
+  FLOAT_T reactionMax;
+  void trackSentMove(Path& move, FLOAT_T moveEndTime, unsigned long long firstBlock, std::chrono::steady_clock::time_point pushed);
 	
   // slaves
   bool has_slaves;
@@ -248,6 +314,21 @@ class PathPlanner {
    */
   void clearSyncEvent();
 
+  /**
+   * @brief Marks the current end of the move queue as a timed event
+   * @details Returns a ticket for waitUntilTimedEvent. Unlike queueSyncEvent this doesn't
+   * change the moves or involve the PRU, so any number of events can share a point in the stream.
+   */
+  unsigned long long queueTimedEvent();
+
+  /**
+   * @brief Blocks until the PRU has stepped out every move queued before the timed event
+   * @details Each ticket from queueTimedEvent has to be waited for until this returns true.
+   *
+   * @return true once the moves are done, false on timeout.
+   */
+  bool waitUntilTimedEvent(unsigned long long ticket, unsigned int timeoutMs);
+
   /**
    * @brief Queue a line move for execution
    * @details Queue a line move execution in the path planner. Note that the path planner 
@@ -311,6 +392,14 @@ class PathPlanner {
    */
   void setMaxBufferedMoveTime(long long dt);
 
+  /**
+   * @brief Set the number of threads calculating the steps of queued moves
+   * @details With 0 the steps are calculated by queueMove itself. -1 starts one thread
+   * per spare core, up to STEP_WORKERS_MAX_AUTO, so single-core boards get none.
+   * @param count number of worker threads
+   */
+  void setStepWorkers(int count);
+
   /**
    * @brief Set the maximum feedrates of the different axis X,Y,Z
    * @details Set the maximum feedrates of the different axis in m/s
@@ -347,14 +436,22 @@ class PathPlanner {
    * @param speedJumps the maximum speed jump for each axis in m/s^2
    */
   void setMaxSpeedJumps(VectorN speedJumps);
+
+  /**
+   * @brief Set the live speed override
+   * @details The factor scales the cruise speed of every move, other than homing and probing
+   * moves, from the next one the planner thread sends to the PRU, including moves that are
+   * already queued.
+   * Start and end speeds are only ever lowered, so the lookahead limits still hold.
+   *
+   * @param factor 1.0 is the speed the moves were queued at
+   */
+  void setSpeedFactor(FLOAT_T factor);
+  FLOAT_T getSpeedFactor();
 	
-  void suspend() {
-    pru.suspend();
-  }
+  void suspend();
 	
-  void resume() {
-    pru.resume();
-  }
+  void resume();
 
     
   void setSoftEndstopsMin(VectorN stops);
@@ -364,16 +461,71 @@ class PathPlanner {
   void setBedCompensationMatrix(std::vector<FLOAT_T> matrix);
   void setAxisConfig(int axis);
   void setState(VectorN set);
+
+  /**
+   * @brief Like setState, for a position that has bed compensation applied already
+   * @details getState returns such a position, so the state can be carried over a
+   * change of steps/m or geometry with getState, the change, then setCompensatedState.
+   */
+  void setCompensatedState(VectorN set);
   void enableSlaves(bool enable);
   void addSlave(int master_in, int slave_in);
+  void clearSlaves();
   void setBacklashCompensation(VectorN set);
   void resetBacklash();
 	
   VectorN getState();
   bool getLastQueueMoveStatus();
 
+  /// Moves that can be queued before queueMove blocks
+  unsigned int getFreeMoveSlots() {
+    return isLinesBufferFilled() ? 0 : moveCacheSize - linesCount;
+  }
+
   FLOAT_T getLastProbeDistance();
 
+  /**
+   * @brief Move Z by a small amount as soon as possible
+   * @details Instead of waiting for the queued moves, the steps are interleaved into the next
+   * move sent to the PRU that doesn't step Z (or any tower on a delta) and isn't cancelable.
+   * The planner state includes the offset right away, so getState and new moves stay consistent.
+   *
+   * @param z the distance in m
+   */
+  void queueBabystep(FLOAT_T z);
+
+  /**
+   * @brief Planned speed of the move being stepped out right now, relative to its commanded speed
+   * @details Follows the acceleration and deceleration of each move, so an output scaled by it
+   * (a laser, for instance) puts the same energy into every millimeter. 0 when no move is running.
+   */
+  FLOAT_T getSpeedRatio();
+
+  /**
+   * @brief Counters of the step buffer pool
+   * @details reused, missed, retained and dropped buffers since startup, then the number
+   * of buffers currently pooled. A steadily growing missed or dropped count means moves
+   * still go to the heap for their step storage.
+   */
+  std::vector<unsigned long long> getStepBufferStats();
+
+  /**
+   * @brief Run the motion threads with real-time priority
+   * @details The run thread gets SCHED_FIFO plannerPriority, the thread waiting for the PRU
+   * pruPriority, both pinned to cpu. 0 leaves a thread's policy alone, cpu -1 lets them run
+   * anywhere. With lockMemory the process is locked in memory and the PRU memory pre-faulted.
+   * Needs CAP_SYS_NICE and CAP_IPC_LOCK; failures are logged and otherwise ignored.
+   */
+  void setRealTime(int plannerPriority, int pruPriority, int cpu, bool lockMemory);
+
+  /**
+   * @brief Reaction time of the run thread
+   * @details The number of times it woke up for new moves, then the mean, maximum and
+   * standard deviation (the jitter) of the time from the moves being ready to the thread
+   * running, in microseconds.
+   */
+  std::vector<FLOAT_T> getReactionStats();
+
   void reset();
 	
   virtual ~PathPlanner();
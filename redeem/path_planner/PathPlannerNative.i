@@ -33,6 +33,7 @@
 // Instantiate template for vector<>
 namespace std {
   %template(vector_FLOAT_T) vector<FLOAT_T>;
+  %template(vector_ulonglong) vector<unsigned long long>;
 }
 
 %apply FLOAT_T *OUTPUT { FLOAT_T* offset };
@@ -128,6 +129,8 @@ class PathPlanner {
   bool queueSyncEvent(bool isBlocking = true);
   int waitUntilSyncEvent();
   void clearSyncEvent();
+  unsigned long long queueTimedEvent();
+  bool waitUntilTimedEvent(unsigned long long ticket, unsigned int timeoutMs);
   void queueMove(VectorN endPos, 
 		 FLOAT_T speed, FLOAT_T accel, 
 		 bool cancelable, bool optimize, 
@@ -138,6 +141,7 @@ class PathPlanner {
   void waitUntilFinished();
   void setPrintMoveBufferWait(int dt);
   void setMaxBufferedMoveTime(long long dt);
+  void setStepWorkers(int count);
   void setMaxSpeeds(VectorN speeds);
   void setAxisStepsPerMeter(VectorN stepPerM);
   void setAcceleration(VectorN accel);
@@ -146,16 +150,26 @@ class PathPlanner {
   void setSoftEndstopsMax(VectorN stops);
   void setStopPrintOnSoftEndstopHit(bool stop);
   void setStopPrintOnPhysicalEndstopHit(bool stop);
+  void setSpeedFactor(FLOAT_T factor);
+  FLOAT_T getSpeedFactor();
   void setBedCompensationMatrix(std::vector<FLOAT_T> matrix);
   void setAxisConfig(int axis);
   void setState(VectorN set);
+  void setCompensatedState(VectorN set);
   void enableSlaves(bool enable);
   void addSlave(int master_in, int slave_in);
+  void clearSlaves();
   void setBacklashCompensation(VectorN set);
   void resetBacklash();
   VectorN getState();
   bool getLastQueueMoveStatus();
+  unsigned int getFreeMoveSlots();
   FLOAT_T getLastProbeDistance();
+  void queueBabystep(FLOAT_T z);
+  FLOAT_T getSpeedRatio();
+  std::vector<unsigned long long> getStepBufferStats();
+  void setRealTime(int plannerPriority, int pruPriority, int cpu, bool lockMemory);
+  std::vector<FLOAT_T> getReactionStats();
   void suspend();
   void resume();
   void reset();
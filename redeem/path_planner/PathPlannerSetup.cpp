@@ -26,6 +26,7 @@
 
 #include "AlarmCallback.h"
 #include "PathPlanner.h"
+#include "RealTime.h"
 #include <Python.h>
 
 void PathPlanner::setPrintMoveBufferWait(int dt) {
@@ -36,6 +37,27 @@ void PathPlanner::setMaxBufferedMoveTime(long long dt) {
   maxBufferedMoveTime = dt;
 }
 
+void PathPlanner::setRealTime(int plannerPriority, int pruPriority, int cpu, bool lockMemory) {
+  realTimePriority = plannerPriority;
+  realTimeCpu = cpu;
+
+  if (lockMemory && lockProcessMemory()) {
+    pru.prefaultMemory();
+  }
+
+  pru.setRealTime(pruPriority, cpu);
+  if (runningThread.joinable()) {
+    setThreadRealTime(runningThread.native_handle(), realTimePriority, realTimeCpu);
+  }
+}
+
+void PathPlanner::setStepWorkers(int count) {
+  Py_BEGIN_ALLOW_THREADS
+  stepWorkers.setWorkers(count);
+  Py_END_ALLOW_THREADS
+  LOGINFO("Calculating steps on " << stepWorkers.getWorkers() << " worker threads" << std::endl);
+}
+
 // Speeds / accels
 void PathPlanner::setMaxSpeeds(VectorN speeds){
   maxSpeeds = speeds;
@@ -52,6 +74,14 @@ void PathPlanner::setMaxSpeedJumps(VectorN speedJumps){
 
 }
 
+void PathPlanner::setSpeedFactor(FLOAT_T factor){
+  speedFactor = factor;
+}
+
+FLOAT_T PathPlanner::getSpeedFactor(){
+  return speedFactor;
+}
+
 void PathPlanner::setAxisStepsPerMeter(VectorN stepPerM) {
   axisStepsPerM = stepPerM;
 
@@ -118,7 +148,11 @@ void PathPlanner::pruAlarmCallback()
 void PathPlanner::setState(VectorN set)
 {
   applyBedCompensation(set);
+  setCompensatedState(set);
+}
 
+void PathPlanner::setCompensatedState(VectorN set)
+{
   IntVectorN newState = (set * axisStepsPerM).round();
 
   switch (axis_config)
@@ -157,6 +191,12 @@ void PathPlanner::setState(VectorN set)
     assert(0);
   }
 
+  // Babysteps already in the old state are replaced by the new position. The
+  // steps still to be sent are kept: the motors haven't made them yet and the
+  // offset M290 asked for must stay.
+  std::lock_guard<std::mutex> lk(babystep_mutex);
+  babystepsToState.zero();
+
   state = newState;
 }
 
@@ -178,6 +218,12 @@ void PathPlanner::addSlave(int master_in, int slave_in)
   slave.push_back(slave_in);
 }
 
+void PathPlanner::clearSlaves()
+{
+  master.clear();
+  slave.clear();
+}
+
 // backlash compensation
 void PathPlanner::setBacklashCompensation(VectorN set)
 {
@@ -36,6 +36,7 @@
 #include <cmath>
 #include "StepperCommand.h"
 #include "config.h"
+#include "RealTime.h"
 
 #define PRU_NUM0	  0
 #define PRU_NUM1	  1
@@ -45,6 +46,7 @@
 #define PRU_ICSS 0x4A300000 
 #define PRU_ICSS_LEN 512*1024
 #define SHARED_RAM_START 0x00012000
+#define SHARED_RAM_STEP_COUNTERS 24
 
 PruTimer::PruTimer(std::function<void()> endstopAlarmCallback)
 : endstopAlarmCallback(endstopAlarmCallback) {
@@ -56,7 +58,10 @@ PruTimer::PruTimer(std::function<void()> endstopAlarmCallback)
 	ddr_size = 0;
 	totalQueuedMovesTime = 0;
 	ddr_mem_used = 0;
+	blocksCompleted = 0;
 	stop = false;
+	realTimePriority = 0;
+	realTimeCpu = -1;
 }
 
 bool PruTimer::initPRU(const std::string &firmware_stepper, const std::string &firmware_endstops) {
@@ -262,7 +267,10 @@ void PruTimer::reset() {
 	ddr_mem_used = 0;
 	currentNbEvents = 0;
 	
+	blocksCompleted += blocksID.size();
+	blocksCompletedAt = std::chrono::steady_clock::now();
 	blocksID = std::queue<BlockDef>();
+	blocksCompletedChanged.notify_all();
 }
 
 void PruTimer::runThread() {
@@ -276,6 +284,29 @@ void PruTimer::runThread() {
 	runningThread = std::thread([this]() {
 		this->run();
 	});
+
+	if(realTimePriority || realTimeCpu >= 0)
+		setThreadRealTime(runningThread.native_handle(), realTimePriority, realTimeCpu);
+}
+
+void PruTimer::setRealTime(int priority, int cpu) {
+	realTimePriority = priority;
+	realTimeCpu = cpu;
+
+	if(runningThread.joinable())
+		setThreadRealTime(runningThread.native_handle(), realTimePriority, realTimeCpu);
+}
+
+void PruTimer::prefaultMemory() {
+	std::lock_guard<std::mutex> lk(mutex_memory);
+	if(!ddr_mem)
+		return;
+
+	const long pageSize = sysconf(_SC_PAGESIZE);
+	for(size_t offset = 0; offset < ddr_size; offset += pageSize) {
+		(void)*(volatile uint8_t*)(ddr_mem + offset);
+	}
+	LOG( "Prefaulted " << std::dec << ddr_size / pageSize << " pages of PRU memory" << std::endl);
 }
 
 void PruTimer::stopThread(bool join) {
@@ -305,6 +336,7 @@ void PruTimer::stopThread(bool join) {
 
 
 	  pruMemoryAvailable.notify_all();
+	  blocksCompletedChanged.notify_all();
 	}
 	
 	if(join && runningThread.joinable()) {
@@ -622,11 +654,14 @@ void PruTimer::run() {
 				assert(ddr_mem_used<ddr_size);
 //				LOG( "Block of size " << std::dec << front.size << " and time " << front.totalTime << " done." << std::endl);
 				blocksID.pop();
+				blocksCompleted++;
 				currentNbEvents++;
 			}
 			currentNbEvents = nb;
+			blocksCompletedAt = std::chrono::steady_clock::now();
 			notifyIfPruMemoryIsAvailable();
 			notifyIfPruMemoryIsEmpty();
+			blocksCompletedChanged.notify_all();
 		}
 //		LOG( "NB event after " << std::dec << nb << " / " << currentNbEvents << std::endl);
 //		LOG( std::dec <<ddr_mem_used << " bytes used, free: " <<std::dec <<  ddr_size-ddr_mem_used<< "." << std::endl);
@@ -634,6 +669,12 @@ void PruTimer::run() {
 	}
 }
 
+bool PruTimer::waitUntilBlocksCompleted(unsigned long long count, unsigned int timeoutMs) {
+	std::unique_lock<std::mutex> lk(mutex_memory);
+	return blocksCompletedChanged.wait_for(lk, std::chrono::milliseconds(timeoutMs),
+		[this, count] { return blocksCompleted >= count || stop; });
+}
+
 int PruTimer::waitUntilSync() {
     int ret;
 	// Wait until the PRU sends a sync event.
@@ -658,3 +699,14 @@ void PruTimer::resume() {
 size_t PruTimer::getStepsRemaining() {
 	return *(volatile size_t*)(shared_mem + SHARED_RAM_START + 16);
 }
+
+std::array<int32_t, NUM_AXES> PruTimer::getStepCounters() {
+	std::array<int32_t, NUM_AXES> counters;
+	volatile int32_t* shared = (volatile int32_t*)(shared_mem + SHARED_RAM_START + SHARED_RAM_STEP_COUNTERS);
+
+	for (int i = 0; i < NUM_AXES; i++) {
+		counters[i] = shared[i];
+	}
+
+	return counters;
+}
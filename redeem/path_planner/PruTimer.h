@@ -16,8 +16,11 @@
 #include <string.h>
 #include <strings.h>
 #include <condition_variable>
+#include <chrono>
 #include <functional>
+#include <array>
 #include "Logger.h"
+#include "config.h"
 
 //#define DEMO_PRU
 
@@ -52,6 +55,8 @@ class PruTimer {
 	uint32_t* pru_control;
 	
 	uint32_t currentNbEvents;
+	unsigned long long blocksCompleted; //Blocks stepped out (or dropped by a reset) since start
+	std::chrono::steady_clock::time_point blocksCompletedAt; //When blocksCompleted last grew
 
 	std::function<void()> endstopAlarmCallback;
 	
@@ -71,6 +76,7 @@ class PruTimer {
 	}
 
 	std::condition_variable pruMemoryEmpty;
+	std::condition_variable blocksCompletedChanged;
 
 	inline bool isPruMemoryEmpty() {
 	  return ddr_mem_used == 0;
@@ -84,6 +90,8 @@ class PruTimer {
 	
 	std::thread runningThread;
 	bool stop;
+	int realTimePriority;
+	int realTimeCpu;
 	
 #ifdef DEMO_PRU
 	uint8_t *currentReadingAddress;
@@ -101,6 +109,13 @@ public:
 	void runThread();
 	void stopThread(bool join);
 	void waitUntilFinished();
+
+	/* SCHED_FIFO priority (0 for none) and cpu (-1 for any) of the thread
+	 * waiting for the PRU, applied now if it's running or else when it starts */
+	void setRealTime(int priority, int cpu);
+
+	/* Touch every page of the DDR mapping so sending moves doesn't page fault */
+	void prefaultMemory();
 	
 	size_t getFreeMemory() {
 		std::lock_guard<std::mutex> lk(mutex_memory);
@@ -116,6 +131,27 @@ public:
 		return (ddr_size / 4) - 12;
 	}
 
+	/* Number of blocks pushed so far. The PRU is past a point in the stream
+	 * once getBlocksCompleted() reaches the value returned here at that point. */
+	unsigned long long getBlocksQueued() {
+		std::lock_guard<std::mutex> lk(mutex_memory);
+		return blocksCompleted + blocksID.size();
+	}
+
+	unsigned long long getBlocksCompleted() {
+		std::lock_guard<std::mutex> lk(mutex_memory);
+		return blocksCompleted;
+	}
+
+	/* When the PRU last reported blocks done */
+	std::chrono::steady_clock::time_point getBlocksCompletedTime() {
+		std::lock_guard<std::mutex> lk(mutex_memory);
+		return blocksCompletedAt;
+	}
+
+	/* Returns false on timeout */
+	bool waitUntilBlocksCompleted(unsigned long long count, unsigned int timeoutMs);
+
 	int waitUntilSync();
 	
 	void suspend();
@@ -127,6 +163,10 @@ public:
 	void push_block(uint8_t* blockMemory, size_t blockLen, unsigned int unit, unsigned long totalTime);
 
 	size_t getStepsRemaining();
+
+	/* Signed number of steps taken on each axis since the firmware was started.
+	 * Only meaningful while the PRU is idle, i.e. after waitUntilFinished(). */
+	std::array<int32_t, NUM_AXES> getStepCounters();
 };
 
 #endif /* defined(__PathPlanner__PruTimer__) */
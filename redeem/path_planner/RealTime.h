@@ -0,0 +1,73 @@
+/*
+ This file is part of Redeem - 3D Printer control software
+
+ Redeem is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ Redeem is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with Redeem.  If not, see <http://www.gnu.org/licenses/>.
+
+ */
+
+#ifndef PathPlanner_RealTime_h
+#define PathPlanner_RealTime_h
+
+#include <pthread.h>
+#include <sched.h>
+#include <errno.h>
+#include <string.h>
+#include <sys/mman.h>
+#include <algorithm>
+#include "Logger.h"
+
+/**
+ * @brief Run a thread as SCHED_FIFO at priority, pinned to cpu
+ * @param priority 1 to 99, 0 leaves the scheduling policy alone
+ * @param cpu core to run on, -1 for any
+ * @return false if the kernel refused, usually for lack of CAP_SYS_NICE
+ */
+inline bool setThreadRealTime(pthread_t thread, int priority, int cpu) {
+  bool ok = true;
+
+  if (priority > 0) {
+    sched_param param;
+    memset(&param, 0, sizeof(param));
+    param.sched_priority = std::min(priority, sched_get_priority_max(SCHED_FIFO));
+    const int error = pthread_setschedparam(thread, SCHED_FIFO, &param);
+    if (error) {
+      LOGERROR("Could not set SCHED_FIFO priority " << priority << ": " << strerror(error) << std::endl);
+      ok = false;
+    }
+  }
+
+  if (cpu >= 0) {
+    cpu_set_t cpus;
+    CPU_ZERO(&cpus);
+    CPU_SET(cpu, &cpus);
+    const int error = pthread_setaffinity_np(thread, sizeof(cpus), &cpus);
+    if (error) {
+      LOGERROR("Could not pin thread to cpu " << cpu << ": " << strerror(error) << std::endl);
+      ok = false;
+    }
+  }
+
+  return ok;
+}
+
+/// Lock all current and future pages of the process in memory
+inline bool lockProcessMemory() {
+  if (mlockall(MCL_CURRENT | MCL_FUTURE)) {
+    LOGERROR("Could not lock memory: " << strerror(errno) << std::endl);
+    return false;
+  }
+  return true;
+}
+
+#endif
@@ -0,0 +1,97 @@
+/*
+ This file is part of Redeem - 3D Printer control software
+
+ Redeem is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ Redeem is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with Redeem.  If not, see <http://www.gnu.org/licenses/>.
+
+ */
+
+#ifndef PathPlanner_StepBufferPool_h
+#define PathPlanner_StepBufferPool_h
+
+#include <array>
+#include <vector>
+#include <mutex>
+#include <assert.h>
+#include "Path.h"
+
+// Buffers that grew larger than this are freed instead of kept (16 bytes per step)
+#define STEP_BUFFER_MAX_RETAINED_STEPS 8192
+
+/**
+ * Free list of per-axis step buffers. Moves take their buffers from here when they
+ * are queued and hand them back when they retire, so once the pool has warmed up
+ * queueing a move doesn't touch the heap.
+ */
+class StepBufferPool {
+  std::mutex mutex;
+  std::vector<std::vector<Step>> buffers;
+  size_t maxBuffers;
+
+  unsigned long long reused;   // buffers handed out from the pool
+  unsigned long long missed;   // moves that found the pool empty before all axes had a buffer
+  unsigned long long retained; // buffers taken back into the pool
+  unsigned long long dropped;  // buffers freed because the pool was full or they were too big
+
+public:
+  StepBufferPool() : maxBuffers(0), reused(0), missed(0), retained(0), dropped(0) {}
+
+  void setSize(size_t size) {
+    std::lock_guard<std::mutex> lk(mutex);
+    maxBuffers = size;
+    buffers.reserve(maxBuffers);
+  }
+
+  /// Swap pooled buffers into the (empty) step vectors of a move about to be calculated
+  void acquire(std::array<std::vector<Step>, NUM_AXES>& steps) {
+    std::lock_guard<std::mutex> lk(mutex);
+    for (auto& axisSteps : steps) {
+      assert(axisSteps.empty());
+      if (buffers.empty()) {
+	missed++;
+	return;
+      }
+      axisSteps.swap(buffers.back());
+      buffers.pop_back();
+      reused++;
+    }
+  }
+
+  /// Take back the step vectors of a retiring move, leaving them empty
+  void release(std::array<std::vector<Step>, NUM_AXES>& steps) {
+    std::lock_guard<std::mutex> lk(mutex);
+    for (auto& axisSteps : steps) {
+      if (axisSteps.capacity() == 0) {
+	continue;
+      }
+      if (buffers.size() < maxBuffers && axisSteps.capacity() <= STEP_BUFFER_MAX_RETAINED_STEPS) {
+	axisSteps.clear();
+	buffers.emplace_back();
+	buffers.back().swap(axisSteps);
+	retained++;
+      }
+      else {
+	std::vector<Step>().swap(axisSteps);
+	dropped++;
+      }
+    }
+  }
+
+  /// reused, missed, retained, dropped, buffers currently pooled
+  std::vector<unsigned long long> getStats() {
+    std::lock_guard<std::mutex> lk(mutex);
+    return {reused, missed, retained, dropped, buffers.size()};
+  }
+};
+
+#endif
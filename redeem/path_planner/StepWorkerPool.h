@@ -0,0 +1,124 @@
+/*
+ This file is part of Redeem - 3D Printer control software
+
+ Redeem is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ Redeem is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with Redeem.  If not, see <http://www.gnu.org/licenses/>.
+
+ */
+
+#ifndef PathPlanner_StepWorkerPool_h
+#define PathPlanner_StepWorkerPool_h
+
+#include <deque>
+#include <vector>
+#include <thread>
+#include <mutex>
+#include <condition_variable>
+#include "Path.h"
+
+// Most workers started when the count is left to the planner
+#define STEP_WORKERS_MAX_AUTO 3
+
+/**
+ * Threads that calculate the steps of queued paths while the planner moves on to the
+ * next one. Paths are taken in the order they were submitted, the run thread waits for
+ * each one's steps before sending it. With no workers queueMove calculates the steps itself.
+ */
+class StepWorkerPool {
+  std::mutex mutex;
+  std::condition_variable jobQueued;
+  std::condition_variable jobDone;
+  std::deque<Path*> jobs;
+  std::vector<std::thread> workers;
+  bool stopping;
+
+  void work() {
+    std::unique_lock<std::mutex> lk(mutex);
+    while (true) {
+      jobQueued.wait(lk, [this] { return stopping || !jobs.empty(); });
+      if (jobs.empty()) {
+	return; // stopping, and everything submitted is done
+      }
+
+      Path* path = jobs.front();
+      jobs.pop_front();
+
+      lk.unlock();
+      path->calculateSteps();
+      lk.lock();
+
+      path->markStepsCalculated();
+      jobDone.notify_all();
+    }
+  }
+
+public:
+  StepWorkerPool() : stopping(false) {}
+
+  ~StepWorkerPool() {
+    setWorkers(0);
+  }
+
+  /// Start count workers, after the current ones finished what was submitted. -1 picks one per spare core.
+  void setWorkers(int count) {
+    if (count < 0) {
+      const unsigned int cores = std::thread::hardware_concurrency();
+      count = std::min(cores > 1 ? cores - 1 : 0, (unsigned int)STEP_WORKERS_MAX_AUTO);
+    }
+
+    if ((size_t)count == workers.size()) {
+      return;
+    }
+
+    {
+      std::lock_guard<std::mutex> lk(mutex);
+      stopping = true;
+    }
+    jobQueued.notify_all();
+    for (auto& worker : workers) {
+      worker.join();
+    }
+    workers.clear();
+    stopping = false;
+
+    for (int i = 0; i < count; i++) {
+      workers.emplace_back([this] { this->work(); });
+    }
+  }
+
+  size_t getWorkers() const {
+    return workers.size();
+  }
+
+  /// Hand the steps of a path to the workers. The path must stay where it is until they're done.
+  void submit(Path& path) {
+    assert(!workers.empty());
+    path.markStepsPending();
+    {
+      std::lock_guard<std::mutex> lk(mutex);
+      jobs.push_back(&path);
+    }
+    jobQueued.notify_one();
+  }
+
+  /// Block until the steps of a submitted path are calculated
+  void waitFor(Path& path) {
+    if (!path.areStepsPending()) {
+      return;
+    }
+    std::unique_lock<std::mutex> lk(mutex);
+    jobDone.wait(lk, [&path] { return !path.areStepsPending(); });
+  }
+};
+
+#endif
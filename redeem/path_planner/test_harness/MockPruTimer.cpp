@@ -40,6 +40,7 @@ PruTimer::PruTimer() {
   assert(PruDump::singleton == nullptr);
   PruDump::singleton = new PruDump();
   ddr_size = 1024 * 1024;
+  blocksCompleted = 0;
 }
 
 bool PruTimer::initPRU(const std::string &firmware_stepper, const std::string &firmware_endstops) {
@@ -91,6 +92,17 @@ void PruTimer::waitUntilFinished() {
 void PruTimer::run() {
 }
 
+bool PruTimer::waitUntilBlocksCompleted(unsigned long long count, unsigned int timeoutMs) {
+  // blocks are dumped as soon as they are pushed
+  return true;
+}
+
+void PruTimer::setRealTime(int priority, int cpu) {
+}
+
+void PruTimer::prefaultMemory() {
+}
+
 int PruTimer::waitUntilSync() {
   return 0;
 }
@@ -100,3 +112,9 @@ void PruTimer::suspend() {
 
 void PruTimer::resume() {
 }
+
+std::array<int32_t, NUM_AXES> PruTimer::getStepCounters() {
+  std::array<int32_t, NUM_AXES> counters;
+  counters.fill(0);
+  return counters;
+}
@@ -0,0 +1,141 @@
+/*
+ This file is part of Redeem - 3D Printer control software
+
+ Redeem is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ Redeem is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with Redeem.  If not, see <http://www.gnu.org/licenses/>.
+
+ */
+
+/*
+ Compares the integer step time dilation against the floating point one and
+ measures both. From redeem/path_planner:
+
+   g++ -std=c++0x -O2 -DLOGLEVEL=30 -I. tests/step_timing.cpp Path.cpp Delta.cpp \
+     vector3.cpp vectorN.cpp Logger.cpp -o step_timing && ./step_timing
+*/
+
+#include <iostream>
+#include <iomanip>
+#include <chrono>
+#include "Path.h"
+
+void calculateLinearMove(const int axis, const long long startStep, const long long endStep, const FLOAT_T time, std::vector<Step>& steps);
+
+struct Profile {
+  const char* name;
+  FLOAT_T stepsPerM;
+  FLOAT_T baseSpeed;
+  FLOAT_T startSpeed;
+  FLOAT_T cruiseSpeed;
+  FLOAT_T endSpeed;
+  FLOAT_T accel;
+  FLOAT_T distance;
+};
+
+static const Profile profiles[] = {
+  { "short xy move",     80000, 0.10, 0.000, 0.100, 0.000, 3.0, 0.005 },
+  { "long xy move",      80000, 0.20, 0.010, 0.200, 0.010, 3.0, 0.200 },
+  { "triangle",          80000, 0.30, 0.005, 0.050, 0.020, 0.5, 0.004 },
+  { "speed factor",      80000, 0.20, 0.000, 0.100, 0.000, 1.0, 0.050 },
+  { "slow z",           400000, 0.005, 0.000, 0.005, 0.000, 0.05, 0.010 },
+  { "extruder",         900000, 0.005, 0.001, 0.004, 0.002, 0.2, 0.002 },
+};
+
+int main()
+{
+  const FLOAT_T ticksPerUnit = MINIMUM_STEP_INTERVAL / (FLOAT_T)(1 << STEP_SLOT_FRACTION_BITS);
+  bool ok = true;
+
+  std::cout << std::setw(14) << "profile" << std::setw(9) << "steps"
+	    << std::setw(13) << "max dev (t)" << std::setw(12) << "slot diff"
+	    << std::setw(14) << "float st/s" << std::setw(14) << "int st/s" << std::endl;
+
+  for (const auto& profile : profiles)
+  {
+    StepperPathParameters params;
+    params.zero();
+    params.calculate(profile.baseSpeed, profile.startSpeed, profile.cruiseSpeed, profile.endSpeed,
+		     profile.accel, profile.distance);
+
+    StepperPathParameters reference = params;
+    reference.integerDilation = false;
+
+    std::vector<Step> steps;
+    const long long count = std::llround(profile.distance * profile.stepsPerM);
+    calculateLinearMove(0, 0, count, profile.distance / profile.baseSpeed, steps);
+
+    // accuracy against the floating point times
+    FLOAT_T maxDeviation = 0;
+    size_t slotDifferences = 0;
+    unsigned long long root = 0;
+
+    for (const auto& step : steps)
+    {
+      const FLOAT_T exact = reference.dilateTime(step.time) * F_CPU_FLOAT;
+      const long long fixed = params.dilateToSlots(step.time, root);
+      maxDeviation = std::max(maxDeviation, std::abs(fixed * ticksPerUnit - exact));
+    }
+
+    std::vector<Step> referenceSteps = steps;
+    reference.dilateSteps(referenceSteps);
+    params.dilateSteps(steps);
+
+    for (size_t i = 0; i < steps.size(); i++)
+    {
+      if (steps[i].slot != referenceSteps[i].slot)
+      {
+	slotDifferences++;
+	if (std::abs((long long)steps[i].slot - (long long)referenceSteps[i].slot) > 1)
+	{
+	  ok = false;
+	}
+      }
+    }
+
+    // a slot is MINIMUM_STEP_INTERVAL ticks, so a dilation within a few ticks only
+    // differs from the float one where the float one sits right on a slot boundary
+    if (maxDeviation > MINIMUM_STEP_INTERVAL / 4)
+    {
+      ok = false;
+    }
+
+    // speed
+    const int repeats = std::max(1, (int)(2000000 / std::max((size_t)1, steps.size())));
+
+    auto start = std::chrono::steady_clock::now();
+    for (int i = 0; i < repeats; i++)
+    {
+      reference.dilateSteps(referenceSteps);
+    }
+    const FLOAT_T floatSeconds = std::chrono::duration<FLOAT_T>(std::chrono::steady_clock::now() - start).count();
+
+    start = std::chrono::steady_clock::now();
+    for (int i = 0; i < repeats; i++)
+    {
+      params.dilateSteps(steps);
+    }
+    const FLOAT_T integerSeconds = std::chrono::duration<FLOAT_T>(std::chrono::steady_clock::now() - start).count();
+
+    const FLOAT_T total = (FLOAT_T)repeats * steps.size();
+
+    std::cout << std::setw(14) << profile.name << std::setw(9) << steps.size()
+	      << std::setw(13) << std::fixed << std::setprecision(1) << maxDeviation
+	      << std::setw(12) << slotDifferences
+	      << std::setw(14) << std::setprecision(0) << total / floatSeconds
+	      << std::setw(14) << total / integerSeconds
+	      << (params.integerDilation ? "" : "  (float fallback)") << std::endl;
+  }
+
+  std::cout << (ok ? "PASS" : "FAIL") << std::endl;
+  return ok ? 0 : 1;
+}
@@ -0,0 +1,29 @@
+import unittest
+import BinaryGcode
+
+
+class TestBinaryGcode(unittest.TestCase):
+
+    def test_round_trip(self):
+        record = BinaryGcode.encode("G1", {"X": 12.345, "E": 0.1, "F": 3000}, 42)
+        self.assertEqual(len(record), BinaryGcode.record_size(record))
+        self.assertEqual(len(record), 26)
+
+        gcode = BinaryGcode.decode(record, "Eth1")
+        self.assertEqual(gcode.code(), "G1")
+        self.assertEqual(gcode.get_tokens(), ["X12.345", "E0.1", "F3000"])
+        self.assertEqual(gcode.get_float_by_letter("X"), 12.345)
+        self.assertEqual(gcode.line_number, 42)
+        self.assertTrue(gcode.is_crc())
+        self.assertEqual(gcode.message, "G1 X12.345 E0.1 F3000")
+        self.assertEqual(gcode.prot, "Eth1")
+
+    def test_corrupt_record(self):
+        record = BinaryGcode.encode("G1", {"X": 1.0}, 7)
+        record = record[:-5] + chr(ord(record[-5]) ^ 1) + record[-4:]
+        gcode = BinaryGcode.decode(record, "USB")
+        self.assertTrue(gcode.checksum_failed)
+        self.assertFalse(gcode.is_valid())
+
+    def test_no_binary_form(self):
+        self.assertRaises(ValueError, BinaryGcode.encode, "M117", {"T": 1.0, "W": 2.0})
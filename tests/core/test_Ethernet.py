@@ -0,0 +1,59 @@
+import socket
+import time
+import unittest
+import mock
+from Ethernet import Ethernet
+from Reactor import Reactor
+
+
+class TestEthernet(unittest.TestCase):
+
+    def setUp(self):
+        self.printer = mock.Mock(comms={})
+        self.printer.reactor = Reactor(self.printer)
+        self.ethernet = Ethernet(self.printer, "127.0.0.1", 0)
+        self.printer.reactor.start()
+
+    def tearDown(self):
+        self.ethernet.close()
+        self.printer.reactor.stop()
+
+    def connect(self):
+        client = socket.create_connection(("127.0.0.1", self.ethernet.port))
+        client.settimeout(1)
+        return client
+
+    def wait_for(self, condition):
+        deadline = time.time() + 1
+        while not condition() and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(condition())
+
+    def received(self):
+        return [(call[0][0].prot, call[0][0].message)
+                for call in self.printer.processor.enqueue.call_args_list]
+
+    def test_lines_split_across_reads(self):
+        client = self.connect()
+        client.sendall("G1 X1\nG1 ")
+        self.wait_for(lambda: len(self.received()) == 1)
+        client.sendall("X2\r\n\nM105\n")
+        self.wait_for(lambda: len(self.received()) == 3)
+        self.assertEqual([message for _, message in self.received()], ["G1 X1", "G1 X2", "M105"])
+        client.close()
+
+    def test_replies_go_to_their_client(self):
+        first = self.connect()
+        second = self.connect()
+        first.sendall("M105\n")
+        second.sendall("M114\n")
+        self.wait_for(lambda: len(self.received()) == 2)
+        prots = dict((message, prot) for prot, message in self.received())
+        self.assertNotEqual(prots["M105"], prots["M114"])
+
+        self.printer.comms[prots["M114"]].send_message("ok C: X:0.0")
+        self.assertEqual(second.recv(100), "ok C: X:0.0\n")
+
+        first.close()
+        self.wait_for(lambda: prots["M105"] not in self.printer.comms)
+        second.close()
@@ -0,0 +1,38 @@
+import os
+import shutil
+import tempfile
+import unittest
+import mock
+from gcodes import GCodeCommand
+
+RST = "Move\n====\n\nMoves the **head**.\n"
+
+
+class TestRenderDescription(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        cache = os.path.join(self.directory, "descriptions.json")
+        mock.patch.object(GCodeCommand, "DESCRIPTION_CACHE", cache).start()
+        mock.patch.object(GCodeCommand, "_descriptions", None).start()
+        self.publish = mock.patch("docutils.core.publish_string", return_value="Move\n").start()
+
+    def tearDown(self):
+        mock.patch.stopall()
+        shutil.rmtree(self.directory)
+
+    def test_rendered_once_and_persisted(self):
+        self.assertEqual(GCodeCommand.render_description(RST), "Move\n")
+        self.assertEqual(GCodeCommand.render_description(RST), "Move\n")
+        self.assertEqual(self.publish.call_count, 1)
+
+        GCodeCommand._descriptions = None  # as after a restart
+        self.assertEqual(GCodeCommand.render_description(RST), "Move\n")
+        self.assertEqual(self.publish.call_count, 1)
+
+    def test_new_version_renders_again(self):
+        GCodeCommand.render_description(RST)
+        GCodeCommand._descriptions = None
+        with mock.patch.object(GCodeCommand, "_redeem_version", return_value="99.0"):
+            GCodeCommand.render_description(RST)
+        self.assertEqual(self.publish.call_count, 2)
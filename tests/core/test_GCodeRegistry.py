@@ -0,0 +1,33 @@
+import unittest
+import mock
+from GCodeProcessor import GCodeRegistry
+
+
+class TestGCodeRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.printer = mock.Mock()
+        self.registry = GCodeRegistry(self.printer, "gcodes")
+        self.registry.register("M114", "M114", "M114")
+        self.registry.register("M115", "M115", "M115")
+
+    def test_handler_loaded_on_first_use(self):
+        module = mock.Mock()
+        with mock.patch("GCodeProcessor.importlib.import_module", return_value=module) as imp:
+            self.assertFalse(self.registry.is_loaded("M114"))
+            handler = self.registry["M114"]
+            self.assertIs(self.registry["M114"], handler)
+
+        imp.assert_called_once_with("gcodes.M114")
+        module.M114.assert_called_once_with(self.printer)
+        self.assertTrue(self.registry.is_loaded("M114"))
+        self.assertFalse(self.registry.is_loaded("M115"))
+        self.assertEqual(sorted(self.registry), ["M114", "M115"])
+
+    def test_override_replaces_handler_without_loading(self):
+        handler = mock.Mock()
+        with mock.patch("GCodeProcessor.importlib.import_module") as imp:
+            self.registry["M115"] = handler
+            self.assertIs(self.registry.get("M115"), handler)
+            self.assertIsNone(self.registry.get("M999"))
+        self.assertFalse(imp.called)
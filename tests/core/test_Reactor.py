@@ -0,0 +1,141 @@
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import zlib
+import time
+import unittest
+import mock
+from Reactor import Reactor, Channel
+import BinaryGcode
+from Upload import Upload
+from USB import USB
+
+
+class TestReactor(unittest.TestCase):
+
+    def setUp(self):
+        self.printer = mock.Mock()
+        self.printer.processor.has_room_for.return_value = True
+        self.reactor = Reactor(self.printer)
+        self.host, ours = socket.socketpair()
+        self.ours = ours  # keeps the socket, and so the descriptor, alive
+        self.channel = Channel(self.printer, ours.fileno(), "test")
+        self.reactor.add(self.channel)
+        self.reactor.start()
+
+    def tearDown(self):
+        self.reactor.stop()
+        self.reactor.remove(self.channel)
+        self.host.close()
+        self.ours.close()
+
+    def wait_for(self, condition):
+        deadline = time.time() + 1
+        while not condition() and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(condition())
+
+    def received(self):
+        return [call[0][0].message for call in self.printer.processor.enqueue.call_args_list]
+
+    def test_lines_wait_for_room(self):
+        self.printer.processor.has_room_for.return_value = False
+        self.host.sendall("G1 X1\r\nM105\n")
+        self.wait_for(lambda: len(self.channel.lines) == 2)
+        self.assertEqual(self.received(), [])
+
+        self.printer.processor.has_room_for.return_value = True
+        self.wait_for(lambda: len(self.received()) == 2)
+        self.assertEqual(self.received(), ["G1 X1", "M105"])
+
+    def test_binary_records_between_lines(self):
+        self.channel.binary = True
+        record = BinaryGcode.encode("G1", {"X": 10.0, "Y": 20.0})
+        self.host.sendall("G28\n" + record[:5])
+        self.wait_for(lambda: len(self.received()) == 1)
+        self.host.sendall(record[5:] + "M105\n")
+        self.wait_for(lambda: len(self.received()) == 3)
+        self.assertEqual(self.received(), ["G28", "G1 X10 Y20", "M105"])
+
+    def test_rest_of_a_long_line_is_dropped(self):
+        self.host.sendall("G1 X" + "1" * 5000)
+        self.wait_for(lambda: self.channel.discarding)
+        self.host.sendall("2 Y3\nM105\n")
+        self.wait_for(lambda: len(self.received()) == 1)
+        self.assertEqual(self.received(), ["M105"])
+
+    def test_resync_after_a_failed_checksum(self):
+        self.channel.binary = True
+        record = BinaryGcode.encode("G1", {"X": 10.0, "Y": 20.0})
+        bad = record[:-1] + chr(ord(record[-1]) ^ 0xff)
+        self.assertNotIn("\n", bad[1:])
+        self.assertNotIn(BinaryGcode.MAGIC, bad[1:])
+        self.host.sendall(bad + "G28 X0" + record + "M105\n")
+        self.wait_for(lambda: len(self.received()) == 3)
+        self.assertEqual(self.received(), ["", "G1 X10 Y20", "M105"])
+
+        self.host.sendall(bad + "G28 X0")
+        self.wait_for(lambda: self.channel.discarding)
+        self.host.sendall("Y0\nM105\n")
+        self.wait_for(lambda: len(self.received()) == 5)
+        self.assertEqual(self.received()[3:], ["", "M105"])
+
+    def upload(self, command):
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, "part.gcode")
+        content = "G1 X1\n{} is not a command in here\n".format(command) * 5000
+        saved = threading.Event()
+        m28 = mock.Mock()
+        m28.start_upload.side_effect = lambda g: Upload(
+            path, len(content), zlib.crc32(content) & 0xffffffff, lambda error: saved.set())
+        self.printer.processor.gcodes = {"M28": m28}
+        self.channel.uploads = True
+
+        header = "{} /lcl/part.gcode S{} C0\n".format(command, len(content))
+        self.host.sendall(header + content + "M23 /lcl/part.gcode\n")
+        self.assertTrue(saved.wait(5))
+        self.wait_for(lambda: len(self.received()) == 2)
+        self.assertEqual(self.received(), [header.strip(), "M23 /lcl/part.gcode"])
+        self.assertEqual(open(path).read(), content)
+        shutil.rmtree(directory)
+
+    def test_upload_after_M28(self):
+        self.upload("M28")
+
+    def test_upload_after_lowercase_m28(self):
+        self.upload("m28")
+
+    def test_close_usb_without_gadget(self):
+        with mock.patch("os.open", side_effect=OSError):
+            usb = USB(self.printer)
+        usb.close()
+
+    def test_replies_to_a_host_not_reading_are_dropped(self):
+        reply = "ok " + "x" * 1000
+        for i in range(200):
+            self.channel.send_message(reply)
+        stats = self.channel.get_stats()
+        self.assertGreater(stats["dropped"], 0)
+        self.assertEqual(stats["messages"] + stats["dropped"], 200)
+
+        self.host.settimeout(1)
+        expected = stats["messages"] * len(reply + "\n")
+        received = 0
+        while received < expected:
+            received += len(self.host.recv(65536))
+        self.assertEqual(received, expected)
+
+    def test_queued_replies_go_out_in_one_write(self):
+        self.reactor.stop()
+        self.channel.send_message("ok")
+        self.channel.send_message("ok T:20.0")
+        self.channel.send_message("ok")
+        self.host.setblocking(0)
+        self.assertRaises(socket.error, self.host.recv, 100)
+
+        self.channel.flush()
+        self.assertEqual(self.host.recv(100), "ok\nok T:20.0\nok\n")
+        stats = self.channel.get_stats()
+        self.assertEqual((stats["messages"], stats["writes"], stats["queued"]), (3, 1, 0))
@@ -0,0 +1,88 @@
+import threading
+import time
+import unittest
+import mock
+from Scheduler import Scheduler, MOTION, BUFFERED, UNBUFFERED
+
+
+class FakePlanner(object):
+
+    def __init__(self):
+        self.event = threading.Event()
+
+    def queue_sync_event(self, is_blocking):
+        return True
+
+    def wait_until_sync_event(self):
+        fired = self.event.wait(0.05)
+        self.event.clear()
+        return fired
+
+
+class TestScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.printer = mock.Mock(realtime=False)
+        self.printer.path_planner = FakePlanner()
+        self.executed = {}
+        self.scheduler = Scheduler(self.printer, self.execute, mock.Mock())
+        self.scheduler.start()
+
+    def tearDown(self):
+        self.scheduler.stop()
+
+    def execute(self, gcode):
+        if gcode.message == "sync":
+            self.scheduler.queue_sync_event(gcode)
+        elif gcode.message == "block":
+            self.release.wait()
+        self.executed[gcode.message].set()
+
+    def gcode(self, message):
+        self.executed[message] = threading.Event()
+        gcode = mock.Mock(message=message)
+        gcode.code.return_value = message
+        return gcode
+
+    def test_waits_for_the_moves(self):
+        moves_done = self.scheduler.submit(self.gcode("sync"), MOTION)
+        self.scheduler.submit(self.gcode("M104"), BUFFERED, after=[moves_done])
+
+        self.assertTrue(self.executed["sync"].wait(1))
+        self.assertFalse(self.executed["M104"].wait(0.1))
+
+        self.printer.path_planner.event.set()
+        self.assertTrue(self.executed["M104"].wait(1))
+        self.assertTrue(moves_done.done)
+
+    def test_lanes_run_independently(self):
+        self.release = threading.Event()
+        self.scheduler.submit(self.gcode("block"), BUFFERED)
+        self.scheduler.submit(self.gcode("M105"), BUFFERED)
+        self.scheduler.submit(self.gcode("M114"), UNBUFFERED)
+
+        self.assertTrue(self.executed["M114"].wait(1))
+        self.assertFalse(self.executed["M105"].is_set())
+        self.release.set()
+        self.assertTrue(self.executed["M105"].wait(1))
+
+    def test_stats(self):
+        self.scheduler.stop()
+        scheduler = Scheduler(self.printer, self.execute, mock.Mock(), {BUFFERED: 2})
+        scheduler.submit(self.gcode("M104"), BUFFERED)
+        scheduler.submit(self.gcode("M105"), BUFFERED)
+
+        blocked = threading.Thread(target=scheduler.submit, args=(self.gcode("M106"), BUFFERED))
+        scheduler.running = True  # submit only blocks while running
+        blocked.start()
+        time.sleep(0.1)
+        scheduler.start()
+        self.assertTrue(self.executed["M106"].wait(1))
+        blocked.join()
+        scheduler.stop()
+
+        stats = scheduler.get_stats()[BUFFERED]
+        self.assertEqual(stats["depth"], 2)
+        self.assertEqual(stats["high_water"], 2)
+        self.assertEqual(stats["executed"], 3)
+        self.assertEqual(stats["blocked"], 1)
@@ -0,0 +1,30 @@
+import unittest
+import __builtin__
+import mock
+from StartupTimer import StartupTimer
+
+
+class TestStartupTimer(unittest.TestCase):
+
+    def test_records_outer_imports_only(self):
+        timer = StartupTimer()
+        original = __builtin__.__import__
+        timer.start_timing_imports()
+        import xml.dom.minidom
+        timer.stop_timing_imports()
+
+        self.assertIs(__builtin__.__import__, original)
+        names = [name for name, _ in timer.imports]
+        self.assertEqual(names.count("xml.dom.minidom"), 1)
+        self.assertEqual(timer.phases[0][0], "imports")
+
+    def test_report_logs_phases_and_resets(self):
+        timer = StartupTimer()
+        timer.phase("config")
+        timer.phase("steppers")
+        with mock.patch("StartupTimer.logging") as log:
+            timer.report()
+        messages = " ".join(call[0][0] for call in log.debug.call_args_list)
+        self.assertIn("config", messages)
+        self.assertIn("steppers", messages)
+        self.assertEqual(timer.phases, [])
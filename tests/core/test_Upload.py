@@ -0,0 +1,48 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import zlib
+import mock
+import Upload
+
+
+class TestUpload(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "part.gcode")
+        self.finished = threading.Event()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def done(self, error):
+        self.error = error
+        self.finished.set()
+
+    def upload(self, content, crc):
+        upload = Upload.Upload(self.path, len(content), crc, self.done)
+        rest = None
+        for i in range(0, len(content) + 10, 7000):
+            rest = upload.feed((content + "M23 /lcl/part.gcode\n")[i:i + 7000])
+            if rest is not None:
+                break
+        self.assertTrue(self.finished.wait(5))
+        return rest
+
+    def test_written_in_chunks(self):
+        content = "G1 X1 Y1\n" * 50000
+        with mock.patch("Upload.CHUNK_SIZE", 65536):
+            rest = self.upload(content, zlib.crc32(content) & 0xffffffff)
+        self.assertTrue(rest.startswith("M23"))
+        self.assertIsNone(self.error)
+        self.assertEqual(open(self.path).read(), content)
+        self.assertEqual(os.listdir(self.directory), ["part.gcode"])
+
+    def test_checksum_mismatch(self):
+        self.upload("G28\n", 1234)
+        self.assertEqual(self.error, "checksum mismatch")
+        self.assertEqual(os.listdir(self.directory), [])
+
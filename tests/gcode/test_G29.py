@@ -22,3 +22,25 @@ class G29_Tests(MockPrinter):
         for i, v in enumerate(macro_gcodes):
             self.assertEqual(v, mock_Gcode.call_args_list[i][0][0]["message"])
 
+
+    def test_gcodes_G29_3_probes_all_points_in_one_sequence(self):
+        self.printer.path_planner.probe_points = mock.Mock(return_value=[0.001, 0.002])
+        self.printer.probe_points = [
+                {"X":10.0, "Y":20.0, "Z":5.0},
+                {"X":30.0, "Y":40.0, "Z":5.0}
+            ]
+        self.printer.probe_heights = [0, 0]
+
+        with mock.patch.object(self.printer.config, "getfloat", return_value=0.0):
+            self.execute_gcode("G29.3 S F3000")
+
+        self.assertEqual(self.printer.path_planner.probe_points.call_count, 1)
+        points = self.printer.path_planner.probe_points.call_args[0][0]
+        self.assertEqual(points[1], {"X": 0.03, "Y": 0.04, "Z": 0.005})
+        self.assertEqual(self.printer.probe_heights, [1.0, 2.0])
+
+    def test_gcodes_G29_2_macro_uses_G29_3(self):
+        self.execute_gcode("G29.2 P4")
+        macro = self.printer.config.get("Macros", "G29")
+        self.assertIn("G29.3 S F3000", macro)
+        self.assertNotIn("G30", macro)
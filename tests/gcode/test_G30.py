@@ -38,11 +38,15 @@ class G30_Tests(MockPrinter):
         expected_moveto = "G0 X{} Y{} Z{}".format(10.0+self.offset_x, 20.0+self.offset_y, 35.0) 
         gcode_packet = mock_Gcode.call_args[0][0]
         self.assertEqual(expected_moveto, gcode_packet["message"])
-        self.printer.path_planner.probe.assert_called_with(
+        self.assertEqual(self.printer.path_planner.probe.call_args[0], (
                 10.0 / 1000,        # D10.0 (probe height)
                 3000.0 / 60000,     # F3000 (speed)
                 1000.0 / 3600000    # Q1000 (acceration)
-            )
+            ))
+
+    def test_gcodes_G30_taps(self):
+        self.execute_gcode("G30 X10 Y20 Z35 A3")
+        self.assertEqual(self.printer.path_planner.probe.call_args[1]["samples"], 3)
 
     def test_gcodes_G30_S_but_no_P(self):
         self.printer.probe_heights = [0]
@@ -5,6 +5,9 @@ import math
 from random import random
 from .MockPrinter import MockPrinter
 from redeem.Fan import Fan
+from redeem.Gcode import Gcode
+from redeem.Scheduler import MOTION
+from redeem.TemperatureControl import VelocityControl
 
 
 class M106_M107_Tests(MockPrinter):
@@ -48,3 +51,27 @@ class M106_M107_Tests(MockPrinter):
         self.fan1.set_value(1.0)
         self.execute_gcode("M107 P0")
         self.assertEqual(self.fan1.value, 0.0)
+
+    def test_gcodes_M106_timed_after_moves(self):
+        g = Gcode({"message": "M106 P0 S128", "prot": "testing_noret"})
+        self.printer.processor.sync_event_needed = True
+        with mock.patch.object(self.printer, "scheduler") as scheduler, \
+                mock.patch.object(self.printer.path_planner, "queue_timed_event", return_value=7):
+            self.printer.processor.enqueue(g)
+            scheduler.submit.assert_called_once_with(g, MOTION, after=[None])
+
+            g.command.execute(g)
+            self.assertEqual(g.timed_event, 7)
+            scheduler.wait_for_timed_event.assert_called_with(g)
+        self.printer.processor.sync_event_needed = False
+
+        g.command.on_sync(g)
+        self.assertEqual(self.fan1.value, 128.0 / 255.0)
+
+    def test_gcodes_M106_velocity_control(self):
+        laser = VelocityControl("Laser", {"input": "0", "sleep": "0.01"}, self.printer)
+        laser.connect({})
+        self.fan1.input = laser
+        self.execute_gcode("M106 P0 S255")
+        with mock.patch.object(self.printer.path_planner, "get_speed_ratio", return_value=0.5):
+            self.assertEqual(laser.get_value(), 0.5)
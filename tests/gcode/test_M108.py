@@ -1,6 +1,8 @@
 from __future__ import absolute_import
 
+import mock
 from .MockPrinter import MockPrinter
+from redeem.Gcode import Gcode
 
 
 class M108_Tests(MockPrinter):
@@ -10,3 +12,11 @@ class M108_Tests(MockPrinter):
         self.execute_gcode("M108")
         self.assertEqual(self.printer.running_M116, False)
 
+    def test_gcodes_M108_bypasses_queues(self):
+        self.printer.running_M116 = True
+        g = Gcode({"message": "M108", "prot": "testing_noret"})
+        with mock.patch.object(self.printer, "scheduler") as scheduler:
+            self.printer.processor.enqueue(g)
+            scheduler.submit.assert_not_called()
+        self.assertEqual(self.printer.running_M116, False)
+        self.assertIn("M108", self.printer.processor.realtime_latency)
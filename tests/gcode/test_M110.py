@@ -1,5 +1,6 @@
 from __future__ import absolute_import
 
+import mock
 from .MockPrinter import MockPrinter
 from redeem.Gcode import Gcode
 
@@ -16,3 +17,55 @@ class M110_Tests(MockPrinter):
     def test_gcodes_M110_N123(self):
         self.execute_gcode("M110 N123")
         self.assertEqual(Gcode.line_number, 123)
+
+
+class M110_EarlyOk_Tests(MockPrinter):
+
+    def setUp(self):
+        self.printer.early_ok = True
+        self.printer.processor.last_line = {}
+        self.printer.send_message.reset_mock()
+        mock.patch.object(self.printer, "scheduler").start()
+        mock.patch.object(self.printer.path_planner, "get_free_move_slots", return_value=7).start()
+        self.printer.scheduler.get_free_slots.return_value = 3
+
+    def tearDown(self):
+        mock.patch.stopall()
+        self.printer.early_ok = False
+
+    def send(self, line, checksum=None):
+        if checksum is None:
+            checksum = Gcode({"message": ""})._getCS(line)
+        g = Gcode({"message": "{}*{}".format(line, checksum), "prot": "testing"})
+        self.printer.processor.enqueue(g)
+        return g
+
+    def sent(self):
+        return [call[0][1] for call in self.printer.send_message.call_args_list]
+
+    def test_ok_when_queued(self):
+        g = self.send("N1 M104 S0")
+        self.assertEqual(self.sent(), ["ok N1 P7 B3"])
+        self.assertTrue(g.acknowledged)
+
+        self.printer.send_message.reset_mock()
+        g.set_answer("ok T:20.0")
+        self.printer.reply(g)
+        self.assertEqual(self.sent(), ["T:20.0"])
+
+    def test_resend_missing_line(self):
+        self.send("N1 M104 S0")
+        self.send("N3 M104 S0")
+        self.assertEqual(self.sent()[1:], [
+            "Error:Line Number is not Last Line Number+1, Last Line: 1", "Resend: 2", "ok"])
+
+    def test_resend_checksum_mismatch(self):
+        self.send("N1 M104 S0", checksum=0)
+        self.assertEqual(self.sent()[:2], ["Error:checksum mismatch, Last Line: 0", "Resend: 1"])
+        self.printer.scheduler.submit.assert_not_called()
+
+    def test_M110_sets_line_number(self):
+        self.send("N0 M110 N10")
+        self.printer.send_message.reset_mock()
+        self.send("N11 M104 S0")
+        self.assertEqual(self.sent(), ["ok N11 P7 B3"])
@@ -0,0 +1,22 @@
+from __future__ import absolute_import
+
+import mock
+from .MockPrinter import MockPrinter
+
+
+class M122_Tests(MockPrinter):
+
+    def test_gcodes_M122(self):
+        self.printer.send_message.reset_mock()
+        self.printer.reactor.get_stats.return_value = {
+            "USB": {"messages": 12, "writes": 5, "dropped": 0, "queued": 0}}
+        self.execute_gcode("M122")
+        lines = [call[0][1] for call in self.printer.send_message.call_args_list]
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(lines[1].startswith("motion: 0/10 queued, high water 0"))
+        self.assertEqual(lines[3], "USB: 12 replies in 5 writes, 0 dropped, 0 bytes queued")
+
+    def test_gcodes_M122_reset(self):
+        with mock.patch.object(self.printer.scheduler, "reset_stats") as reset_stats:
+            self.execute_gcode("M122 R")
+        reset_stats.assert_called_once_with()
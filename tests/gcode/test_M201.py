@@ -7,10 +7,16 @@ from random import random
 class M201_Tests(MockPrinter):
 
     def setUp(self):
-        self.printer.path_planner.native_planner.setAcceleration = mock.Mock()
+        self.old_acceleration = self.printer.acceleration
+        self.old_unit_factor = self.printer.unit_factor
+        self.printer.path_planner.reconfigure = mock.Mock()
         self.printer.axis_config = self.printer.AXIS_CONFIG_XY
         self.printer.speed_factor = 1.0
 
+    def tearDown(self):
+        self.printer.acceleration = self.old_acceleration
+        self.printer.unit_factor = self.old_unit_factor
+
     def exercise(self):
         values = {}
         gcode = "M201"
@@ -19,21 +25,30 @@ class M201_Tests(MockPrinter):
             values[axis] = round(random() * 9000.0, 0)
             gcode += " {:s}{:.0f}".format(axis, values[axis])
 
+        self.printer.path_planner.reconfigure.reset_mock()
         self.execute_gcode(gcode) 
-        return {"values": values, "call_args": self.printer.path_planner.native_planner.setAcceleration.call_args[0][0]}
+        self.printer.path_planner.reconfigure.assert_called_once_with()
+        return {"values": values, "call_args": self.printer.acceleration}
+
+    def test_gcodes_M201_replaces_acceleration(self):
+        old = list(self.old_acceleration)
+        self.exercise()
+        self.assertIsNot(self.printer.acceleration, self.old_acceleration)
+        self.assertEqual(self.old_acceleration, old)
 
     def test_gcodes_M201_all_axes_G21_mm(self):
+        self.printer.unit_factor = 1.0
         test_data = self.exercise()
         for i, axis in enumerate(self.printer.AXES):
-          expected = round(test_data["values"][axis] * self.printer.factor / 3600.0, 4)
+          expected = round(test_data["values"][axis] * self.printer.unit_factor / 3600.0, 4)
           result = test_data["call_args"][i]
           self.assertEqual(expected, result, axis+": expected {:.0f} but got {:.0f}".format(expected, result))
 
     def test_gcodes_M201_all_axes_G20_inches(self):
-        self.printer.factor = 25.4
+        self.printer.unit_factor = 25.4
         test_data = self.exercise()
         for i, axis in enumerate(self.printer.AXES):
-          expected = round(test_data["values"][axis] * self.printer.factor / 3600.0, 4)
+          expected = round(test_data["values"][axis] * self.printer.unit_factor / 3600.0, 4)
           result = test_data["call_args"][i]
           self.assertEqual(expected, result, axis+": expected {:.0f} but got {:.0f}".format(expected, result))
     
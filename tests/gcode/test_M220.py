@@ -0,0 +1,21 @@
+from __future__ import absolute_import
+
+from .MockPrinter import MockPrinter
+import mock
+
+class M220_Tests(MockPrinter):
+
+    def setUp(self):
+        self.printer.path_planner.native_planner.setSpeedFactor = mock.Mock()
+
+    def tearDown(self):
+        self.printer.speed_factor = 1.0
+
+    def test_gcodes_M220_sets_live_speed_factor(self):
+        self.execute_gcode("M220 S150")
+        self.assertEqual(self.printer.speed_factor, 1.5)
+        self.printer.path_planner.native_planner.setSpeedFactor.assert_called_with(1.5)
+
+    def test_gcodes_M220_default_is_100_percent(self):
+        self.execute_gcode("M220")
+        self.printer.path_planner.native_planner.setSpeedFactor.assert_called_with(1.0)
@@ -0,0 +1,22 @@
+from __future__ import absolute_import
+
+from .MockPrinter import MockPrinter
+import mock
+
+class M290_Tests(MockPrinter):
+
+    def setUp(self):
+        self.printer.path_planner.native_planner.queueBabystep = mock.Mock()
+        self.printer.offset_z = 0.0
+
+    def tearDown(self):
+        self.printer.offset_z = 0.0
+
+    def test_gcodes_M290_steps_queued_moves(self):
+        self.execute_gcode("M290 S0.05")
+        self.assertAlmostEqual(self.printer.offset_z, 0.00005)
+        self.printer.path_planner.native_planner.queueBabystep.assert_called_with(0.00005)
+
+    def test_gcodes_M290_report_only(self):
+        self.execute_gcode("M290")
+        self.printer.path_planner.native_planner.queueBabystep.assert_not_called()
@@ -0,0 +1,21 @@
+from __future__ import absolute_import
+
+from .MockPrinter import MockPrinter
+import mock
+
+class M92_Tests(MockPrinter):
+
+    def setUp(self):
+        self.old_steps_pr_mm = self.printer.steppers["X"].get_steps_pr_meter() / 1000.0
+        self.printer.path_planner.restart = mock.Mock()
+        self.printer.path_planner.reconfigure = mock.Mock()
+
+    def tearDown(self):
+        self.execute_gcode("M92 X{}".format(self.old_steps_pr_mm))
+
+    def test_gcodes_M92_reconfigures_without_restart(self):
+        self.execute_gcode("M92 X100")
+        self.printer.path_planner.restart.assert_not_called()
+        self.printer.path_planner.reconfigure.assert_called_once_with()
+        self.assertAlmostEqual(self.printer.steps_pr_meter[0], 100000.0)
+        self.assertAlmostEqual(self.printer.steppers["X"].get_steps_pr_meter(), 100000.0)
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+"""
+Converts a G-code file for a channel with [System] binary_gcode on. The
+commands that have a binary form, and are shorter in it, become records,
+the others stay ASCII lines. The records are unnumbered.
+
+Run from the redeem directory:
+
+    python ../tools/gcode_to_binary.py print.gcode print.bin
+"""
+
+import sys
+import logging
+
+sys.path.insert(0, ".")
+from Gcode import Gcode
+import BinaryGcode
+
+
+def convert(line):
+    gcode = Gcode({"message": line})
+    if not gcode.is_valid():
+        return None
+    code = gcode.code()
+    if code[0] not in "GMT" or not code[1:].isdigit() or code == "M117":
+        return line + "\n"
+    values = {}
+    for token in gcode.get_tokens():
+        if token[0] not in BinaryGcode.LETTERS or len(token) < 2 or token[0] in values:
+            return line + "\n"
+        try:
+            values[token[0]] = float(token[1:])
+        except ValueError:
+            return line + "\n"
+    record = BinaryGcode.encode(code, values)
+    # Short commands like G28 are shorter as text
+    return record if len(record) <= len(line) + 1 else line + "\n"
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print("usage: gcode_to_binary.py <in.gcode> <out.bin>")
+        sys.exit(1)
+    logging.disable(logging.CRITICAL)  # Gcode logs the lines it can't parse
+    size_in = size_out = records = 0
+    with open(sys.argv[1]) as src, open(sys.argv[2], "wb") as dst:
+        for line in src:
+            size_in += len(line)
+            line = line.split(";")[0].strip()
+            if len(line) == 0:
+                continue
+            out = convert(line)
+            if out is None:
+                continue
+            if out[0] == BinaryGcode.MAGIC:
+                records += 1
+            dst.write(out)
+            size_out += len(out)
+    print("{} bytes in, {} bytes out, {} records".format(size_in, size_out, records))
@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+"""
+Measures how long G-codes take to reach their executor with the Scheduler,
+and with the queue threads it replaced (modelled below as they were).
+
+  dispatch     a command arriving at an idle lane, until it starts
+  after moves  the planner's sync event, until the command waiting for
+               the moves before it starts
+
+Run from the redeem directory:
+
+    python ../tools/scheduler_latency.py
+"""
+
+import sys
+import time
+import threading
+import Queue
+
+sys.path.insert(0, ".")
+from Scheduler import Scheduler, MOTION, BUFFERED, UNBUFFERED
+
+ROUNDS = 200
+
+
+class Command(object):
+
+    def __init__(self, message, run=None):
+        self.message = message
+        self.run = run
+        self.started = None
+
+    def code(self):
+        return self.message.split()[0]
+
+
+class FakePlanner(object):
+    """ Sync events come from the test instead of the PRU, without the
+    polling a timeout would add, as the native wait doesn't poll """
+
+    def __init__(self):
+        self.fired = threading.Semaphore(0)
+        self.queued = threading.Semaphore(0)
+
+    def queue_sync_event(self, is_blocking):
+        self.queued.release()
+        return True
+
+    def wait_until_sync_event(self):
+        self.fired.acquire()
+        return True
+
+    def fire(self):
+        self.queued.acquire()  # once the sync event is in the planner
+        fired = time.time()
+        self.fired.release()
+        return fired
+
+
+class Printer(object):
+    realtime = False
+
+    def __init__(self):
+        self.path_planner = FakePlanner()
+
+    def reply(self, gcode):
+        pass
+
+
+def execute(gcode):
+    gcode.started = time.time()
+    if gcode.run:
+        gcode.run(gcode)
+
+
+def synchronize(gcode):
+    if hasattr(gcode, "on_sync"):
+        gcode.on_sync(gcode)
+
+
+class QueueThreads(object):
+    """ The queue threads as they were: one per queue, polling with a one second
+    timeout, and SyncState events to hold the buffered queue for the moves """
+
+    def __init__(self, printer):
+        self.printer = printer
+        self.commands = Queue.Queue(10)
+        self.unbuffered_commands = Queue.Queue(10)
+        self.async_commands = Queue.Queue(10)
+        self.sync_commands = Queue.Queue()
+        self.running = True
+        for queue in (self.commands, self.unbuffered_commands, self.async_commands):
+            self._start(self.loop, queue)
+        self._start(self.eventloop, self.sync_commands)
+
+    def _start(self, target, queue):
+        thread = threading.Thread(target=target, args=(queue,))
+        thread.daemon = True
+        thread.start()
+
+    def loop(self, queue):
+        while self.running:
+            try:
+                gcode = queue.get(block=True, timeout=1)
+            except Queue.Empty:
+                continue
+            execute(gcode)
+            self.printer.reply(gcode)
+            queue.task_done()
+
+    def eventloop(self, queue):
+        while self.running:
+            if self.printer.path_planner.wait_until_sync_event():
+                try:
+                    gcode = queue.get(block=True, timeout=1)
+                except Queue.Empty:
+                    continue
+                synchronize(gcode)
+                queue.task_done()
+
+    def unbuffered(self, gcode):
+        self.unbuffered_commands.put(gcode)
+
+    def after_moves(self, gcode):
+        ready = threading.Event()
+        buffered = Command("SyncBufferedToAsync_Buffered", lambda g: ready.wait())
+        async = Command("SyncBufferedToAsync_Async",
+                        lambda g: self.printer.path_planner.queue_sync_event(False))
+        async.on_sync = lambda g: ready.set()
+        self.commands.put(buffered)
+        self.sync_commands.put(async)
+        self.async_commands.put(async)
+        self.commands.put(gcode)
+
+    def stop(self):
+        self.running = False
+
+
+class Scheduled(object):
+
+    def __init__(self, printer):
+        self.scheduler = Scheduler(printer, execute, synchronize)
+        self.scheduler.start()
+
+    def unbuffered(self, gcode):
+        self.scheduler.submit(gcode, UNBUFFERED)
+
+    def after_moves(self, gcode):
+        sync_point = Command("SyncPoint", self.scheduler.queue_sync_event)
+        moves_done = self.scheduler.submit(sync_point, MOTION)
+        self.scheduler.submit(gcode, BUFFERED, after=[moves_done])
+
+    def stop(self):
+        self.scheduler.stop()
+
+
+def wait_started(gcode):
+    while gcode.started is None:
+        time.sleep(0.0005)
+
+
+def measure(design):
+    printer = Printer()
+    runner = design(printer)
+    time.sleep(0.1)
+    dispatch = []
+    after_moves = []
+    for i in range(ROUNDS):
+        gcode = Command("M105")
+        queued = time.time()
+        runner.unbuffered(gcode)
+        wait_started(gcode)
+        dispatch.append(gcode.started - queued)
+        time.sleep(0.002)
+
+        gcode = Command("M104 S200")
+        runner.after_moves(gcode)
+        fired = printer.path_planner.fire()
+        wait_started(gcode)
+        after_moves.append(gcode.started - fired)
+        time.sleep(0.002)
+    runner.stop()
+    return dispatch, after_moves
+
+
+def summary(latencies):
+    latencies = sorted(latencies)
+    return "mean {:7.3f} ms  p99 {:7.3f} ms  max {:7.3f} ms".format(
+        1000 * sum(latencies) / len(latencies),
+        1000 * latencies[int(len(latencies) * 0.99) - 1],
+        1000 * latencies[-1])
+
+
+if __name__ == '__main__':
+    for name, design in (("queue threads", QueueThreads), ("scheduler", Scheduled)):
+        dispatch, after_moves = measure(design)
+        print("{:<14} dispatch     {}".format(name, summary(dispatch)))
+        print("{:<14} after moves  {}".format("", summary(after_moves)))